@@ -1,8 +1,18 @@
+import logging
 import os
-import time
 import re
-import boto3
+import sqlite3
 import streamlit as st
+from aws_clients import get_client, pool_stats
+from s3_upload import content_sha256, upload_buffer
+from upload_manifest import DIGEST_METADATA_KEY, SKIP, UPLOAD, UploadManifest, plan_upload
+from ingestion_scheduler import COMPLETE, FINISHED_STATES, IngestionScheduler
+from job_tracker import LATEST_JOB, NO_JOB, JobTracker
+from index_pipeline import LOCAL_INDEX_DIR, TitanEmbedder, build_index, upload_index
+from response_cache import ResponseCache, normalize_subject
+from tracing import current_trace, init_tracing, new_trace_id, set_trace, span, trace_stats
+
+logger = logging.getLogger(__name__)
 
 # AWS Configuration
 BUCKET_NAME = os.getenv("BUCKET_NAME")
@@ -16,85 +26,279 @@ if not BUCKET_NAME:
     st.stop()
 
 # AWS Clients
-s3_client = boto3.client("s3", region_name=AWS_REGION)
-bedrock_agent_client = boto3.client("bedrock-agent", region_name=AWS_REGION)
+s3_client = get_client("s3", region_name=AWS_REGION)
+bedrock_agent_client = get_client("bedrock-agent", region_name=AWS_REGION)
 
-# Temp folder
-FOLDER_PATH = "/tmp/"
+# Response cache shared with the User app (mount the same volume in both containers)
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "/tmp/au_ai_response_cache.db")
 
-# Save uploaded file locally
-def save_uploaded_file(uploaded_file, save_path):
-    try:
-        with open(save_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return True
-    except Exception as e:
-        st.error(f"❌ Error saving file: {e}")
-        return False
+# Batch ingestion
+BATCH_UPLOAD_WORKERS = int(os.getenv("BATCH_UPLOAD_WORKERS", "4"))
+BATCH_REFRESH_SECONDS = 3
 
-# Upload to S3
-def upload_file_to_s3(local_path, s3_key):
-    try:
-        if not os.path.exists(local_path):
-            st.error("❌ Local file not found for upload.")
+# Longest an ingestion job is waited on or tracked before it is reported as failed
+INGESTION_TIMEOUT_SECONDS = int(os.getenv("INGESTION_TIMEOUT_SECONDS", "3600"))
+
+# Show connection pool and timing diagnostics in the sidebar
+SHOW_DIAGNOSTICS = os.getenv("SHOW_DIAGNOSTICS", "false").lower() in ("1", "true", "yes")
+
+# Also chunk, embed and index uploads locally for the User app's local retrieval backend
+BUILD_LOCAL_INDEX = os.getenv("BUILD_LOCAL_INDEX", "false").lower() in ("1", "true", "yes")
+
+# Content hashes of uploaded and ingested files, shared by every admin session
+@st.cache_resource
+def get_upload_manifest():
+    return UploadManifest()
+
+# Upload bytes to S3 unless S3 already holds identical content, tagging the object
+# with its SHA-256. Returns False when the file is unchanged and already ingested.
+def upload_if_changed(s3_key, data, on_progress=None):
+    manifest = get_upload_manifest()
+    with span("s3.upload", key=s3_key, bytes=len(data)) as upload:
+        digest = content_sha256(data)
+        plan = plan_upload(manifest, s3_client, BUCKET_NAME, s3_key, digest)
+        upload.set("plan", plan)
+        if plan == SKIP:
             return False
+        if plan == UPLOAD:
+            upload_buffer(
+                s3_client, data, BUCKET_NAME, s3_key,
+                on_progress=on_progress,
+                metadata={DIGEST_METADATA_KEY: digest},
+                digest=digest
+            )
+            manifest.record_upload(s3_key, digest)
+    return True
 
-        s3_client.upload_file(Filename=local_path, Bucket=BUCKET_NAME, Key=s3_key)
+# Upload to S3 straight from the uploaded file's in-memory buffer.
+# Returns None if the file is byte-identical to the one already ingested.
+def upload_file_to_s3(uploaded_file, s3_key):
+    try:
+        progress = st.progress(0.0, text="Uploading to S3...")
+        changed = upload_if_changed(
+            s3_key,
+            uploaded_file.getbuffer(),
+            on_progress=lambda done, total: progress.progress(done / total, text=f"Uploaded {done // (1024 * 1024)} / {total // (1024 * 1024)} MB")
+        )
+        progress.empty()
+        if not changed:
+            st.info(f"♻️ `s3://{BUCKET_NAME}/{s3_key}` is unchanged and already ingested. Nothing to do.")
+            return None
         st.success(f"✅ File uploaded to S3 at: `s3://{BUCKET_NAME}/{s3_key}`")
         return True
     except Exception as e:
-        st.error(f"❌ Error uploading file to S3: {e}")
+        st.error(f"❌ Error uploading file to S3 (re-upload to resume): {e}")
         return False
 
+# One poll of the shared job tracker; each poll is a tracing span
+def fetch_ingestion_status(job_id):
+    with span("bedrock.ingestion_poll", job=job_id) as poll:
+        if job_id != LATEST_JOB:
+            status = get_ingestion_job_status(job_id)
+        else:
+            response = bedrock_agent_client.list_ingestion_jobs(
+                knowledgeBaseId=KNOWLEDGE_BASE_ID,
+                dataSourceId=DATA_SOURCE_ID,
+                maxResults=1
+            )
+            jobs = response.get("ingestionJobSummaries", [])
+            status = jobs[0].get("status") if jobs else NO_JOB
+        poll.set("status", status)
+        return status
+
+# Ingestion status poller shared by every admin session in this process
+@st.cache_resource
+def get_job_tracker():
+    return JobTracker(fetch_ingestion_status)
+
 # Wait for ongoing job to complete
 def wait_for_ongoing_job_to_complete():
-    while True:
-        response = bedrock_agent_client.list_ingestion_jobs(
+    try:
+        for status in get_job_tracker().events(LATEST_JOB, timeout=INGESTION_TIMEOUT_SECONDS):
+            if status in ["COMPLETE", "FAILED", NO_JOB]:
+                return True
+            elif status not in ["IN_PROGRESS", "STARTING"]:
+                return False
+    except TimeoutError:
+        return False
+    return False
+
+def start_ingestion_job():
+    with span("bedrock.start_ingestion_job"):
+        response = bedrock_agent_client.start_ingestion_job(
             knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            dataSourceId=DATA_SOURCE_ID,
-            maxResults=1
+            dataSourceId=DATA_SOURCE_ID
         )
-        jobs = response.get("ingestionJobSummaries", [])
-        if not jobs:
-            return True
-
-        status = jobs[0].get("status")
-        if status in ["COMPLETE", "FAILED"]:
-            return True
-        elif status in ["IN_PROGRESS", "STARTING"]:
-            time.sleep(10)
-        else:
-            return False
+    return response["ingestionJob"]["ingestionJobId"]
+
+def get_ingestion_job_status(job_id):
+    response = bedrock_agent_client.get_ingestion_job(
+        knowledgeBaseId=KNOWLEDGE_BASE_ID,
+        dataSourceId=DATA_SOURCE_ID,
+        ingestionJobId=job_id
+    )
+    return response["ingestionJob"]["status"]
 
 # Start ingestion
 def sync_knowledge_base():
     if wait_for_ongoing_job_to_complete():
-        response = bedrock_agent_client.start_ingestion_job(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            dataSourceId=DATA_SOURCE_ID
-        )
-        return response["ingestionJob"]["ingestionJobId"]
+        return start_ingestion_job()
     else:
         return None
 
-# Track ingestion job
+# Track ingestion job; yields each status change pushed by the shared tracker
 def track_ingestion_job(job_id):
-    while True:
-        response = bedrock_agent_client.get_ingestion_job(
-            knowledgeBaseId=KNOWLEDGE_BASE_ID,
-            dataSourceId=DATA_SOURCE_ID,
-            ingestionJobId=job_id
+    yield from get_job_tracker().events(job_id, timeout=INGESTION_TIMEOUT_SECONDS)
+
+# The User app's response cache file, shared by every admin session in this process
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(RESPONSE_CACHE_PATH)
+
+# Invalidate cached User-app responses for a freshly ingested subject. Also runs
+# on the batch scheduler's thread, so failures are logged rather than shown.
+def record_ingestion_complete(subject_name, s3_key=None):
+    if s3_key is not None:
+        get_upload_manifest().mark_ingested(s3_key)
+    try:
+        get_response_cache().invalidate_subject(subject_name)
+    except sqlite3.Error:
+        logger.exception("Could not invalidate cached responses for %s", subject_name)
+
+# Build the subject's FAISS index from PDF bytes and publish it to S3.
+# Returns the pipeline stats; on_progress(stats) is called after each batch.
+def publish_local_index(data, filename, subject_name, on_progress=None):
+    embedder = TitanEmbedder(get_client("bedrock-runtime", region_name=AWS_REGION))
+    # The User app looks indexes up by the normalized subject name
+    index_subject = normalize_subject(subject_name)
+    output_dir = os.path.join(LOCAL_INDEX_DIR, index_subject)
+    stats = build_index(data, filename, embedder, output_dir, on_progress=on_progress)
+    upload_index(s3_client, BUCKET_NAME, index_subject, output_dir)
+    return stats.as_dict()
+
+def build_local_index(uploaded_file, subject_name):
+    try:
+        progress = st.empty()
+        summary = publish_local_index(
+            uploaded_file.getbuffer(),
+            uploaded_file.name,
+            subject_name,
+            on_progress=lambda s: progress.text(f"📑 {s.pages} pages, {s.chunks} chunks embedded...")
         )
-        status = response["ingestionJob"]["status"]
-        yield status
-        if status in ["COMPLETE", "FAILED"]:
-            break
-        time.sleep(10)
+        progress.empty()
+        st.success(
+            f"✅ Local index built: {summary['pages']} pages, {summary['chunks']} chunks "
+            f"({summary['pages_per_second']:.1f} pages/sec, {summary['chunks_per_second']:.1f} chunks/sec)"
+        )
+    except Exception as e:
+        st.error(f"❌ Error building local index: {e}")
+
+# Batch mode's local index build, on the scheduler's upload thread while the
+# file is ingested, so failures are logged rather than shown
+def build_batch_local_index(batch_file, data):
+    summary = publish_local_index(data, os.path.basename(batch_file.s3_key), batch_file.subject)
+    logger.info(
+        "Local index built for %s: %d pages, %d chunks (%.1f pages/sec, %.1f chunks/sec)",
+        batch_file.subject, summary["pages"], summary["chunks"],
+        summary["pages_per_second"], summary["chunks_per_second"]
+    )
+
+# Batch ingestion scheduler shared by every admin session in this process
+@st.cache_resource
+def get_ingestion_scheduler():
+    return IngestionScheduler(
+        upload=upload_if_changed,
+        wait_until_idle=wait_for_ongoing_job_to_complete,
+        start_job=start_ingestion_job,
+        track_job=track_ingestion_job,
+        on_file_complete=lambda batch_file: record_ingestion_complete(batch_file.subject, batch_file.s3_key),
+        on_file_uploaded=build_batch_local_index if BUILD_LOCAL_INDEX else None,
+        upload_workers=BATCH_UPLOAD_WORKERS
+    )
+
+def subject_from_filename(filename):
+    return re.sub(r"[^a-zA-Z0-9_-]", "_", os.path.splitext(filename)[0].strip())
+
+# Batch mode: every PDF becomes its own subject, named after the file
+def batch_upload_ui():
+    uploaded_files = st.file_uploader("📚 Upload Syllabus PDFs (one subject per file)", type="pdf", accept_multiple_files=True)
+    scheduler = get_ingestion_scheduler()
+
+    if uploaded_files:
+        subjects = [subject_from_filename(f.name) for f in uploaded_files]
+        st.caption("Subjects: " + ", ".join(f"`{s}`" for s in subjects))
+        if st.button("📡 Upload & Queue for Ingestion"):
+            for uploaded_file, subject_name in zip(uploaded_files, subjects):
+                s3_key = f"knowledgebase/{subject_name}/{subject_name}.pdf"
+                scheduler.submit(subject_name, s3_key, uploaded_file.getvalue())
+            st.success(f"✅ Queued {len(uploaded_files)} file(s). They will be ingested together.")
+
+    if scheduler.is_busy():
+        batch_progress()
+    else:
+        show_batch_snapshot(scheduler.snapshot())
+
+def show_batch_snapshot(snapshot):
+    if snapshot["files"]:
+        st.subheader("Ingestion Progress")
+        done = sum(1 for f in snapshot["files"] if f["state"] in FINISHED_STATES)
+        st.progress(done / len(snapshot["files"]), text=f"{done} / {len(snapshot['files'])} files finished")
+        if snapshot["batches"]:
+            st.dataframe(snapshot["batches"], use_container_width=True)
+        st.dataframe(snapshot["files"], use_container_width=True)
+
+# Batch progress, refreshed every BATCH_REFRESH_SECONDS without rerunning the
+# page or holding the script thread; the page reruns once every file has finished
+@st.fragment(run_every=BATCH_REFRESH_SECONDS)
+def batch_progress():
+    scheduler = get_ingestion_scheduler()
+    if not scheduler.is_busy():
+        st.rerun()
+    show_batch_snapshot(scheduler.snapshot())
+
+# Single mode: the session's file as the shared scheduler ingests it
+def ingestion_status_ui():
+    ingestion = st.session_state.get("ingestion")
+    if not ingestion:
+        return
+    status = get_ingestion_scheduler().file_status(ingestion["file"])
+    if status["state"] not in FINISHED_STATES:
+        ingestion_progress(ingestion["file"])
+        return
+    if status["state"] == COMPLETE:
+        st.success("✅ Ingestion Complete!")
+    else:
+        st.error(f"❌ Ingestion Failed: {status['error']}")
+
+# Refreshed every BATCH_REFRESH_SECONDS like batch_progress; the page reruns
+# once the file's ingestion has finished
+@st.fragment(run_every=BATCH_REFRESH_SECONDS)
+def ingestion_progress(batch_file):
+    status = get_ingestion_scheduler().file_status(batch_file)
+    if status["state"] in FINISHED_STATES:
+        st.rerun()
+    st.info(f"🔄 Syncing with Bedrock... Ingestion Status: `{status['state']}`")
 
 # Streamlit UI
 def main():
     st.set_page_config(page_title="Syllabus Uploader", layout="centered")
     st.title("📂 Admin Panel - Upload & Sync Syllabus with Bedrock")
+    init_tracing("admin")
+    if "trace_id" not in st.session_state:
+        st.session_state.trace_id = new_trace_id()
+    set_trace(st.session_state.trace_id)
+
+    if SHOW_DIAGNOSTICS:
+        with st.sidebar.expander("AWS connection pool"):
+            st.json(pool_stats())
+        with st.sidebar.expander("Latency spans"):
+            st.caption(f"Trace ID: {current_trace()}")
+            st.json(trace_stats())
+
+    mode = st.radio("Upload mode", ["Single subject", "Batch (multiple subjects)"], horizontal=True)
+    if mode != "Single subject":
+        batch_upload_ui()
+        return
 
     uploaded_file = st.file_uploader("📄 Upload Syllabus PDF", type="pdf")
     subject_name_input = st.text_input("📘 Enter Subject Name (no spaces)", "")
@@ -108,29 +312,27 @@ def main():
             return
 
         syllabus_filename = f"{subject_name}.pdf"
-        local_path = os.path.join(FOLDER_PATH, syllabus_filename)
         s3_key = f"knowledgebase/{subject_name}/{syllabus_filename}"
 
-        with st.spinner("🔄 Saving and uploading file..."):
-            if save_uploaded_file(uploaded_file, local_path):
-                if upload_file_to_s3(local_path, s3_key):
-                    # Clean up local file
-                    if os.path.exists(local_path):
-                        os.remove(local_path)
-
-                    st.info("📡 Starting ingestion with Bedrock Knowledge Base...")
-                    job_id = sync_knowledge_base()
-
-                    if job_id:
-                        with st.status("🔄 Syncing with Bedrock...", expanded=True) as status_box:
-                            for state in track_ingestion_job(job_id):
-                                status_box.update(label=f"📡 Ingestion Status: `{state}`", state="running")
-                            if state == "COMPLETE":
-                                status_box.update(label="✅ Ingestion Complete!", state="complete")
-                            else:
-                                status_box.update(label=f"❌ Ingestion Failed (Status: {state})", state="error")
-                    else:
-                        st.error("❌ Could not start ingestion. Another job might still be running. Please try again shortly.")
+        # Reruns while an ingestion is shown must not upload and ingest the same file again
+        upload_id = (s3_key, uploaded_file.name, uploaded_file.size)
+        ingestion = st.session_state.get("ingestion")
+        if ingestion and ingestion["upload_id"] == upload_id:
+            ingestion_status_ui()
+            return
+
+        with st.spinner("🔄 Uploading file..."):
+            if upload_file_to_s3(uploaded_file, s3_key):
+                if BUILD_LOCAL_INDEX:
+                    build_local_index(uploaded_file, subject_name)
+
+                # Ingested by the shared scheduler, so it never overlaps a batch's ingestion job
+                st.info("📡 Queued for ingestion with Bedrock Knowledge Base...")
+                st.session_state.ingestion = {
+                    "upload_id": upload_id,
+                    "file": get_ingestion_scheduler().submit_uploaded(subject_name, s3_key),
+                }
+                st.rerun()
 
 # Entry point
 if __name__ == "__main__":
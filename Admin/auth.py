@@ -1,11 +1,11 @@
 # main.py (runs on port 8080)
 import streamlit as st
-import boto3
 from botocore.exceptions import ClientError
+from aws_clients import get_resource
 import hashlib
 
 # Initialize DynamoDB
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')  # Update region if needed
+dynamodb = get_resource('dynamodb', region_name='us-east-1')  # Update region if needed
 users_table = dynamodb.Table('users')
 
 def hash_password(password):
@@ -0,0 +1,83 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+# ---------- Shared AWS Clients ----------
+# Streamlit re-runs the app script on every interaction, but imported modules
+# stay loaded, so clients cached here are built once per process and shared by
+# every session, keeping their connection pools warm.
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50"))
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "adaptive")
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "5"))
+AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "120"))
+AWS_TCP_KEEPALIVE = os.getenv("AWS_TCP_KEEPALIVE", "true").lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_create_lock = threading.Lock()
+_session = boto3.session.Session()
+_clients = {}
+_resources = {}
+_stats = {}
+
+def client_config(max_attempts=None):
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        retries={"mode": AWS_RETRY_MODE, "max_attempts": AWS_MAX_ATTEMPTS if max_attempts is None else max_attempts},
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        tcp_keepalive=AWS_TCP_KEEPALIVE,
+    )
+
+# Count requests on the wire per client so the pool size can be checked
+# against the observed peak concurrency.
+def _instrument(name, client):
+    stats = _stats.setdefault(name, {"requests": 0, "in_flight": 0, "peak_in_flight": 0, "retries": 0})
+
+    def before_send(**kwargs):
+        with _lock:
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+
+    def after_attempt(attempts=None, **kwargs):
+        with _lock:
+            stats["in_flight"] = max(0, stats["in_flight"] - 1)
+            if attempts and attempts > 1:
+                stats["retries"] += 1
+
+    client.meta.events.register("before-send", before_send)
+    client.meta.events.register("needs-retry", after_attempt)
+
+# boto3 sessions are not thread-safe, so clients are created under one lock.
+# max_attempts overrides AWS_MAX_ATTEMPTS for callers that retry on their own
+# (1 makes a single attempt).
+def get_client(service, region_name=AWS_REGION, max_attempts=None):
+    key = (service, region_name, max_attempts)
+    with _create_lock:
+        if key not in _clients:
+            client = _session.client(service, region_name=region_name, config=client_config(max_attempts))
+            suffix = f":attempts={max_attempts}" if max_attempts is not None else ""
+            _instrument(f"{service}:{region_name}{suffix}", client)
+            _clients[key] = client
+        return _clients[key]
+
+def get_resource(service, region_name=AWS_REGION):
+    key = (service, region_name)
+    with _create_lock:
+        if key not in _resources:
+            resource = _session.resource(service, region_name=region_name, config=client_config())
+            _instrument(f"{service}-resource:{region_name}", resource.meta.client)
+            _resources[key] = resource
+        return _resources[key]
+
+# Per-client request counters plus the configured pool size
+def pool_stats():
+    with _lock:
+        return {
+            "max_pool_connections": AWS_MAX_POOL_CONNECTIONS,
+            "clients": {name: dict(stats) for name, stats in _stats.items()},
+        }
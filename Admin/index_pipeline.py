@@ -0,0 +1,247 @@
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------- Index Pipeline Configuration ----------
+# Layout must match what the User app's local retrieval backend reads
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "/tmp/au_ai_faiss")
+LOCAL_INDEX_S3_PREFIX = "faiss_index"
+INDEX_FILE = "index.faiss"
+MANIFEST_FILE = "index.json"
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "chunks.offsets"
+
+EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v1")
+CHUNK_SIZE = int(os.getenv("INDEX_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("INDEX_CHUNK_OVERLAP", "200"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "16"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Vectors per index shard; only the shard being filled is held in memory
+INDEX_SHARD_VECTORS = int(os.getenv("INDEX_SHARD_VECTORS", "8192"))
+
+# ---------- Embedders ----------
+# max_batch is the most texts one embed() request can carry. Titan text
+# embeddings take a single inputText, so each request embeds one text.
+class TitanEmbedder:
+    max_batch = 1
+
+    def __init__(self, client, model_id=EMBEDDING_MODEL_ID):
+        self.client = client
+        self.model_id = model_id
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            response = self.client.invoke_model(modelId=self.model_id, body=json.dumps({"inputText": text}))
+            vectors.append(json.loads(response["body"].read())["embedding"])
+        return vectors
+
+# Deterministic bag-of-words embedder for offline benchmarks (same as the User app's)
+class HashingEmbedder:
+    max_batch = None
+
+    def __init__(self, dimension=256):
+        self.dimension = dimension
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimension
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimension
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+# ---------- PDF Text Extraction ----------
+# Yield (page_number, text) one page at a time, preferring PyMuPDF and falling back to pypdf
+def iter_pdf_pages(data):
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with fitz.open(stream=bytes(data), filetype="pdf") as document:
+            for number, page in enumerate(document, start=1):
+                yield number, page.get_text()
+        return
+
+    from io import BytesIO
+    from pypdf import PdfReader
+    reader = PdfReader(BytesIO(bytes(data)))
+    for number, page in enumerate(reader.pages, start=1):
+        yield number, page.extract_text() or ""
+
+# Split pages into overlapping character windows, breaking on whitespace where possible
+def iter_chunks(pages, source, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    step = max(1, chunk_size - overlap)
+    for number, text in pages:
+        text = re.sub(r"\s+", " ", text).strip()
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + chunk_size)
+            if end < len(text):
+                space = text.rfind(" ", start + step, end)
+                end = space if space > start else end
+            yield {"text": text[start:end].strip(), "source": source, "page": number}
+            if end >= len(text):
+                break
+            start = max(start + 1, end - overlap)
+
+# ---------- Pipeline Stats ----------
+class PipelineStats:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.pages = 0
+        self.chunks = 0
+        self.finished_at = None
+
+    @property
+    def seconds(self):
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def as_dict(self):
+        seconds = self.seconds or 1e-9
+        return {
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "seconds": self.seconds,
+            "pages_per_second": self.pages / seconds,
+            "chunks_per_second": self.chunks / seconds,
+        }
+
+# ---------- Index Build ----------
+SHARD_FILE_RE = re.compile(r"index\.\d{4}\.faiss")
+
+def shard_file_name(number):
+    return f"index.{number:04d}.faiss"
+
+def read_manifest(output_dir):
+    with open(os.path.join(output_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# Stream a PDF into a sharded FAISS index in output_dir. Pages are read lazily
+# and chunks are grouped into batches. Each batch is split into embedder requests
+# of at most embedder.max_batch texts, which run on a bounded thread pool, so at
+# most `concurrency` requests run at once. Batches are appended to chunks.jsonl
+# and to the current shard in document order as soon as they are ready. A shard
+# is written to disk and dropped once it holds `shard_vectors` vectors. At most
+# one shard plus `concurrency * 2` pending batches of vectors are held in memory.
+# index.json, listing the shards, is written last.
+# on_progress(stats) is called from the calling thread after each batch.
+def build_index(data, source, embedder, output_dir, batch_size=EMBED_BATCH_SIZE,
+                concurrency=EMBED_CONCURRENCY, on_progress=None, shard_vectors=INDEX_SHARD_VECTORS):
+    import faiss
+    import numpy as np
+
+    os.makedirs(output_dir, exist_ok=True)
+    stats = PipelineStats()
+    request_size = getattr(embedder, "max_batch", None) or batch_size
+
+    def counted_pages():
+        for page in iter_pdf_pages(data):
+            stats.pages += 1
+            yield page
+
+    def batches():
+        batch = []
+        for chunk in iter_chunks(counted_pages(), source):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    shard = None
+    shards = []
+    dimension = None
+    offset = 0
+    tmp_chunks = os.path.join(output_dir, f"{CHUNKS_FILE}.tmp")
+    tmp_offsets = os.path.join(output_dir, f"{OFFSETS_FILE}.tmp")
+
+    def flush_shard():
+        nonlocal shard
+        if shard is None or shard.ntotal == 0:
+            return
+        name = shard_file_name(len(shards))
+        faiss.write_index(shard, os.path.join(output_dir, f"{name}.tmp"))
+        shards.append({"file": name, "count": int(shard.ntotal)})
+        shard = None
+
+    with open(tmp_chunks, "wb") as chunks_file, open(tmp_offsets, "wb") as offsets_file, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        in_flight = deque()
+
+        def drain_one():
+            nonlocal shard, dimension, offset
+            batch, futures = in_flight.popleft()
+            vectors = np.asarray([vector for future in futures for vector in future.result()], dtype="float32")
+            faiss.normalize_L2(vectors)
+            dimension = vectors.shape[1]
+            start = 0
+            while start < len(vectors):
+                if shard is None:
+                    shard = faiss.IndexFlatIP(dimension)
+                take = min(len(vectors) - start, shard_vectors - shard.ntotal)
+                shard.add(vectors[start:start + take])
+                start += take
+                if shard.ntotal >= shard_vectors:
+                    flush_shard()
+            for chunk in batch:
+                line = (json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8")
+                offsets_file.write(struct.pack("<Q", offset))
+                chunks_file.write(line)
+                offset += len(line)
+            stats.chunks += len(batch)
+            if on_progress is not None:
+                on_progress(stats)
+
+        for batch in batches():
+            texts = [c["text"] for c in batch]
+            futures = [
+                executor.submit(embedder.embed, texts[i:i + request_size])
+                for i in range(0, len(texts), request_size)
+            ]
+            in_flight.append((batch, futures))
+            if len(in_flight) >= concurrency * 2:
+                drain_one()
+        while in_flight:
+            drain_one()
+        flush_shard()
+
+    if not shards:
+        os.remove(tmp_chunks)
+        os.remove(tmp_offsets)
+        raise ValueError("No extractable text found in the PDF.")
+
+    for entry in shards:
+        os.replace(os.path.join(output_dir, f"{entry['file']}.tmp"), os.path.join(output_dir, entry["file"]))
+    os.replace(tmp_chunks, os.path.join(output_dir, CHUNKS_FILE))
+    os.replace(tmp_offsets, os.path.join(output_dir, OFFSETS_FILE))
+    manifest = {"version": os.urandom(8).hex(), "dimension": dimension, "chunks": stats.chunks, "shards": shards}
+    with open(os.path.join(output_dir, f"{MANIFEST_FILE}.tmp"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(output_dir, f"{MANIFEST_FILE}.tmp"), os.path.join(output_dir, MANIFEST_FILE))
+    # Shards of a previous, larger build and the single-file layout are no longer referenced
+    current = {entry["file"] for entry in shards}
+    for name in os.listdir(output_dir):
+        if (name == INDEX_FILE or SHARD_FILE_RE.fullmatch(name)) and name not in current:
+            os.remove(os.path.join(output_dir, name))
+    stats.finished_at = time.perf_counter()
+    return stats
+
+# The manifest goes last, so readers never see it before the files it lists
+def upload_index(s3_client, bucket, subject, output_dir):
+    shards = [entry["file"] for entry in read_manifest(output_dir)["shards"]]
+    for name in shards + [CHUNKS_FILE, OFFSETS_FILE, MANIFEST_FILE]:
+        s3_client.upload_file(os.path.join(output_dir, name), bucket, f"{LOCAL_INDEX_S3_PREFIX}/{subject}/{name}")
@@ -0,0 +1,223 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# File states, in the order a file moves through them
+QUEUED = "QUEUED"
+UPLOADING = "UPLOADING"
+UPLOADED = "UPLOADED"
+INGESTING = "INGESTING"
+COMPLETE = "COMPLETE"
+FAILED = "FAILED"
+# Byte-identical to what is already ingested; needs neither upload nor ingestion
+UNCHANGED = "UNCHANGED"
+
+FINISHED_STATES = (COMPLETE, FAILED, UNCHANGED)
+
+# Finished files and batches are kept for display this long, and at most this many
+HISTORY_SECONDS = 24 * 3600
+MAX_HISTORY = 500
+
+class BatchFile:
+    def __init__(self, subject, s3_key):
+        self.subject = subject
+        self.s3_key = s3_key
+        self.state = QUEUED
+        self.batch_id = None
+        self.error = None
+        self.updated_at = time.time()
+
+    def as_dict(self):
+        return {
+            "subject": self.subject,
+            "s3_key": self.s3_key,
+            "state": self.state,
+            "batch": self.batch_id,
+            "error": self.error,
+        }
+
+class IngestionBatch:
+    def __init__(self, batch_id, files):
+        self.batch_id = batch_id
+        self.files = files
+        self.job_id = None
+        self.status = "STARTING"
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def as_dict(self):
+        return {
+            "batch": self.batch_id,
+            "job_id": self.job_id,
+            "status": self.status,
+            "files": len(self.files),
+            "seconds": (self.finished_at or time.time()) - self.started_at,
+        }
+
+# Uploads queued files in parallel and folds every file that finished uploading
+# into a single ingestion job. Files that finish while a job is running wait for
+# the next job, so a department's worth of PDFs costs one or two ingestions
+# instead of one each. Every ingestion job the app starts goes through here, so
+# no two of them run at once.
+#
+#   upload(s3_key, data)      -> uploads the bytes to S3; returns False if the file
+#                                is unchanged and needs no ingestion
+#   wait_until_idle()         -> returns True once no other ingestion job is running
+#   start_job()               -> starts an ingestion job and returns its id
+#   track_job(job_id)         -> iterable of the job's status changes, ending at a final status
+#   on_file_complete(file)    -> called with each BatchFile of a completed job
+#   on_file_uploaded(file, data) -> called on the upload thread with each submitted
+#                                file whose content changed, while it is ingested
+class IngestionScheduler:
+    def __init__(self, upload, wait_until_idle, start_job, track_job, on_file_complete=None,
+                 on_file_uploaded=None, upload_workers=4, history_seconds=HISTORY_SECONDS, max_history=MAX_HISTORY):
+        self.upload = upload
+        self.wait_until_idle = wait_until_idle
+        self.start_job = start_job
+        self.track_job = track_job
+        self.on_file_complete = on_file_complete
+        self.on_file_uploaded = on_file_uploaded
+        self.history_seconds = history_seconds
+        self.max_history = max_history
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._files = []
+        self._batches = []
+        self._batch_count = 0
+        self._uploader = ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix="kb-upload")
+        self._thread = threading.Thread(target=self._run, name="kb-ingestion-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, subject, s3_key, data):
+        batch_file = BatchFile(subject, s3_key)
+        with self._lock:
+            self._prune()
+            self._files.append(batch_file)
+        self._uploader.submit(self._upload_file, batch_file, data)
+        return batch_file
+
+    # A file the caller has already uploaded; it joins the next ingestion job
+    def submit_uploaded(self, subject, s3_key):
+        batch_file = BatchFile(subject, s3_key)
+        batch_file.state = UPLOADED
+        with self._lock:
+            self._prune()
+            self._files.append(batch_file)
+        self._wakeup.set()
+        return batch_file
+
+    # Drop finished files and batches past the history window, then the oldest
+    # beyond max_history. Called with the lock held.
+    def _prune(self):
+        cutoff = time.time() - self.history_seconds
+        finished = sorted(
+            (f for f in self._files if f.state in FINISHED_STATES and f.updated_at >= cutoff),
+            key=lambda f: f.updated_at
+        )
+        kept = {id(f) for f in finished[-self.max_history:]} if self.max_history > 0 else set()
+        self._files = [f for f in self._files if f.state not in FINISHED_STATES or id(f) in kept]
+
+        done = [b for b in self._batches if b.finished_at is not None and b.finished_at >= cutoff]
+        kept = {id(b) for b in done[-self.max_history:]} if self.max_history > 0 else set()
+        self._batches = [b for b in self._batches if b.finished_at is None or id(b) in kept]
+
+    def _set_state(self, batch_file, state, error=None):
+        with self._lock:
+            batch_file.state = state
+            batch_file.error = error
+            batch_file.updated_at = time.time()
+
+    def _upload_file(self, batch_file, data):
+        self._set_state(batch_file, UPLOADING)
+        try:
+            needs_ingestion = self.upload(batch_file.s3_key, data)
+            self._set_state(batch_file, UPLOADED if needs_ingestion is not False else UNCHANGED)
+        except Exception as e:
+            logger.exception("Upload failed for %s", batch_file.s3_key)
+            self._set_state(batch_file, FAILED, str(e))
+            needs_ingestion = False
+        self._wakeup.set()
+        if needs_ingestion is not False and self.on_file_uploaded is not None:
+            try:
+                self.on_file_uploaded(batch_file, data)
+            except Exception:
+                logger.exception("on_file_uploaded failed for %s", batch_file.subject)
+
+    def _uploads_in_flight(self):
+        return any(f.state in (QUEUED, UPLOADING) for f in self._files)
+
+    def _next_batch(self):
+        with self._lock:
+            ready = [f for f in self._files if f.state == UPLOADED]
+            # Let a burst of uploads land before starting, so they share one job
+            if not ready or self._uploads_in_flight():
+                return None
+            self._batch_count += 1
+            batch = IngestionBatch(self._batch_count, ready)
+            for batch_file in ready:
+                batch_file.state = INGESTING
+                batch_file.batch_id = batch.batch_id
+            self._batches.append(batch)
+            return batch
+
+    def _finish_batch(self, batch, status, error=None):
+        with self._lock:
+            batch.status = status
+            batch.finished_at = time.time()
+            for batch_file in batch.files:
+                batch_file.state = COMPLETE if status == "COMPLETE" else FAILED
+                batch_file.error = error if status != "COMPLETE" else None
+                batch_file.updated_at = time.time()
+        if status == "COMPLETE" and self.on_file_complete is not None:
+            for batch_file in batch.files:
+                try:
+                    self.on_file_complete(batch_file)
+                except Exception:
+                    logger.exception("on_file_complete failed for %s", batch_file.subject)
+
+    def _run_batch(self, batch):
+        try:
+            if not self.wait_until_idle():
+                self._finish_batch(batch, "FAILED", "Another ingestion job is in an unknown state")
+                return
+            job_id = self.start_job()
+            with self._lock:
+                batch.job_id = job_id
+                batch.status = "STARTING"
+            status = "FAILED"
+            for status in self.track_job(job_id):
+                with self._lock:
+                    batch.status = status
+            self._finish_batch(batch, status, None if status == "COMPLETE" else f"Ingestion {status}")
+        except Exception as e:
+            logger.exception("Ingestion batch %d failed", batch.batch_id)
+            self._finish_batch(batch, "FAILED", str(e))
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=1.0)
+            self._wakeup.clear()
+            batch = self._next_batch()
+            if batch is not None:
+                self._run_batch(batch)
+                # Anything that finished uploading during the job goes next
+                self._wakeup.set()
+
+    def is_busy(self):
+        with self._lock:
+            return any(f.state not in FINISHED_STATES for f in self._files)
+
+    def file_status(self, batch_file):
+        with self._lock:
+            return batch_file.as_dict()
+
+    def snapshot(self):
+        with self._lock:
+            self._prune()
+            files = [f.as_dict() for f in self._files]
+            batches = [b.as_dict() for b in self._batches]
+        return {"files": files, "batches": batches}
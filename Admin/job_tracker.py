@@ -0,0 +1,176 @@
+import logging
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Pseudo job id that tracks whatever the most recent ingestion job is
+LATEST_JOB = "__latest__"
+# Status reported for LATEST_JOB when the data source has never been ingested
+NO_JOB = "NONE"
+
+ACTIVE_STATES = ("STARTING", "IN_PROGRESS")
+# Final status published when the job's status could not be fetched
+# MAX_POLL_FAILURES times in a row
+POLL_FAILED = "POLL_FAILED"
+
+# ---------- Tracker Configuration ----------
+MIN_POLL_SECONDS = 1.0
+MAX_POLL_SECONDS = 15.0
+BACKOFF_FACTOR = 1.6
+JITTER = 0.2
+RECENT_JOBS_KEPT = 100
+MAX_POLL_FAILURES = 5
+# How long a job keeps being polled after its last status() call
+STATUS_LEASE_SECONDS = 30.0
+
+class _Watch:
+    def __init__(self, key, now):
+        self.key = key
+        self.subscribers = set()
+        self.status = None
+        self.interval = MIN_POLL_SECONDS
+        self.next_poll = now
+        self.failures = 0
+        self.lease_until = 0.0
+
+# Polls ingestion job status on one background thread and pushes status changes
+# to subscribers. However many admin sessions watch a job, it is polled once per
+# interval. The interval starts short, grows while the status is unchanged and
+# resets when it changes; each wait is jittered so restarts do not align.
+# After max_failures failed polls in a row the job ends with POLL_FAILED.
+#
+#   fetch_status(key) -> status string for a job id, or for LATEST_JOB
+class JobTracker:
+    def __init__(self, fetch_status, min_interval=MIN_POLL_SECONDS, max_interval=MAX_POLL_SECONDS,
+                 backoff=BACKOFF_FACTOR, jitter=JITTER, max_failures=MAX_POLL_FAILURES,
+                 status_lease=STATUS_LEASE_SECONDS):
+        self.fetch_status = fetch_status
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_failures = max_failures
+        self.status_lease = status_lease
+        self.polls = 0
+
+        self._cond = threading.Condition()
+        self._watches = {}
+        self._recent = {}
+        self._thread = threading.Thread(target=self._run, name="kb-job-tracker", daemon=True)
+        self._thread.start()
+
+    def _watch(self, key):
+        watch = self._watches.get(key)
+        if watch is None:
+            watch = _Watch(key, time.monotonic())
+            watch.interval = self.min_interval
+            self._watches[key] = watch
+            self._cond.notify()
+        return watch
+
+    def subscribe(self, key):
+        events = queue.Queue()
+        with self._cond:
+            finished = self._recent.get(key)
+            if finished is not None:
+                events.put(finished)
+                return events
+            watch = self._watch(key)
+            if watch.status is not None:
+                events.put(watch.status)
+            watch.subscribers.add(events)
+        return events
+
+    def unsubscribe(self, key, events):
+        with self._cond:
+            watch = self._watches.get(key)
+            if watch is not None:
+                watch.subscribers.discard(events)
+
+    # Yield each status change of a job until it leaves ACTIVE_STATES. Raises
+    # TimeoutError if the job is still active after timeout seconds.
+    def events(self, key, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        events = self.subscribe(key)
+        try:
+            while True:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                try:
+                    status = events.get(timeout=max(0.0, remaining) if remaining is not None else None)
+                except queue.Empty:
+                    raise TimeoutError(f"Ingestion job {key} did not finish within {timeout:.0f}s") from None
+                yield status
+                if status not in ACTIVE_STATES:
+                    return
+        finally:
+            self.unsubscribe(key, events)
+
+    # Latest known status of a job without waiting for it to change (None until
+    # the first poll). The job is polled for status_lease seconds after each call,
+    # so a page that reruns to show progress keeps it watched.
+    def status(self, key):
+        with self._cond:
+            finished = self._recent.get(key)
+            if finished is not None:
+                return finished
+            watch = self._watch(key)
+            watch.lease_until = time.monotonic() + self.status_lease
+            return watch.status
+
+    def _jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _publish(self, watch, status):
+        for events in watch.subscribers:
+            events.put(status)
+
+    def _poll(self, watch):
+        try:
+            status = self.fetch_status(watch.key)
+        except Exception:
+            logger.exception("Polling ingestion job %s failed", watch.key)
+            status = None
+        self.polls += 1
+
+        with self._cond:
+            now = time.monotonic()
+            if status is None:
+                watch.failures += 1
+                if watch.failures >= self.max_failures:
+                    status = POLL_FAILED
+            else:
+                watch.failures = 0
+            if status is None or status == watch.status:
+                watch.interval = min(self.max_interval, watch.interval * self.backoff)
+            else:
+                watch.status = status
+                watch.interval = self.min_interval
+                self._publish(watch, status)
+            watch.next_poll = now + self._jittered(watch.interval)
+
+            if watch.status is not None and watch.status not in ACTIVE_STATES:
+                del self._watches[watch.key]
+                # The most recent job changes over time, so its final status is not
+                # remembered; nor is POLL_FAILED, so a later watch polls again
+                if watch.key != LATEST_JOB and watch.status != POLL_FAILED:
+                    self._recent[watch.key] = watch.status
+                    while len(self._recent) > RECENT_JOBS_KEPT:
+                        self._recent.pop(next(iter(self._recent)))
+            elif not watch.subscribers and watch.lease_until <= now:
+                del self._watches[watch.key]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = [w for w in self._watches.values() if w.next_poll <= now]
+                    if due:
+                        break
+                    upcoming = [w.next_poll for w in self._watches.values()]
+                    self._cond.wait(timeout=(min(upcoming) - now) if upcoming else None)
+            for watch in due:
+                self._poll(watch)
@@ -0,0 +1,170 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError
+
+# ---------- Upload Configuration ----------
+S3_PART_SIZE_MB = int(os.getenv("S3_PART_SIZE_MB", "16"))
+S3_UPLOAD_THREADS = int(os.getenv("S3_UPLOAD_THREADS", "8"))
+UPLOAD_STATE_DIR = os.getenv("UPLOAD_STATE_DIR", "/tmp/au_ai_uploads")
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part except the last
+
+def content_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _md5_b64(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+# Multipart state persisted between attempts so an interrupted upload only
+# re-sends the parts S3 does not already have.
+class UploadState:
+    def __init__(self, state_dir, bucket, key, digest, part_size):
+        os.makedirs(state_dir, exist_ok=True)
+        self.bucket = bucket
+        self.key = key
+        name = hashlib.sha256(f"{bucket}/{key}/{digest}/{part_size}".encode()).hexdigest()
+        self.path = os.path.join(state_dir, f"{name}.json")
+        self.upload_id = None
+        self.parts = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    saved = json.load(f)
+                self.upload_id = saved.get("upload_id")
+                self.parts = {int(number): etag for number, etag in saved.get("parts", {}).items()}
+            except (OSError, ValueError):
+                self.upload_id, self.parts = None, {}
+
+    def save(self):
+        with self._lock:
+            payload = {
+                "bucket": self.bucket,
+                "key": self.key,
+                "upload_id": self.upload_id,
+                "parts": {str(n): e for n, e in self.parts.items()},
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.path)
+
+    def record_part(self, number, etag):
+        with self._lock:
+            self.parts[number] = etag
+        self.save()
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+# Drop parts from the saved state that S3 no longer has (or the whole upload
+# if it was aborted or expired). Returns False when a new upload is needed.
+def _reconcile_with_s3(s3_client, bucket, key, state):
+    if not state.upload_id:
+        return False
+    try:
+        remote = {}
+        kwargs = {"Bucket": bucket, "Key": key, "UploadId": state.upload_id}
+        while True:
+            response = s3_client.list_parts(**kwargs)
+            for part in response.get("Parts", []):
+                remote[part["PartNumber"]] = part["ETag"]
+            if not response.get("IsTruncated"):
+                break
+            kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+    except ClientError:
+        state.upload_id, state.parts = None, {}
+        return False
+    state.parts = {n: e for n, e in state.parts.items() if remote.get(n) == e}
+    return True
+
+# Abort the multipart uploads of saved states for the same object that a new
+# upload replaces (different content or part size), so their parts stop being
+# stored, and drop those states. keep_path is the current upload's state file.
+def _abort_replaced_uploads(s3_client, state_dir, bucket, key, keep_path=None):
+    if not os.path.isdir(state_dir):
+        return
+    for name in os.listdir(state_dir):
+        path = os.path.join(state_dir, name)
+        if not name.endswith(".json") or path == keep_path:
+            continue
+        try:
+            with open(path, "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if saved.get("bucket") != bucket or saved.get("key") != key:
+            continue
+        if saved.get("upload_id"):
+            try:
+                s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=saved["upload_id"])
+            except ClientError:
+                pass  # already completed, aborted or expired
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+# Upload an in-memory buffer (bytes, bytearray or memoryview) to S3.
+# Buffers smaller than one part go up in a single put_object; larger ones use
+# parallel multipart upload, with each part checked by S3 against its Content-MD5.
+# on_progress(done_bytes, total_bytes) is called from the calling thread.
+# metadata is stored as S3 user metadata; digest is the content SHA-256 if the
+# caller already computed it.
+def upload_buffer(s3_client, data, bucket, key, part_size_mb=S3_PART_SIZE_MB,
+                  max_workers=S3_UPLOAD_THREADS, state_dir=UPLOAD_STATE_DIR, on_progress=None,
+                  metadata=None, digest=None):
+    view = memoryview(data)
+    total = len(view)
+    part_size = max(MIN_PART_SIZE, part_size_mb * 1024 * 1024)
+
+    if total <= part_size:
+        body = view.tobytes()
+        s3_client.put_object(Bucket=bucket, Key=key, Body=body, ContentMD5=_md5_b64(body), Metadata=metadata or {})
+        _abort_replaced_uploads(s3_client, state_dir, bucket, key)
+        if on_progress is not None:
+            on_progress(total, total)
+        return
+
+    state = UploadState(state_dir, bucket, key, digest or content_sha256(view), part_size)
+    if not _reconcile_with_s3(s3_client, bucket, key, state):
+        _abort_replaced_uploads(s3_client, state_dir, bucket, key, keep_path=state.path)
+        response = s3_client.create_multipart_upload(Bucket=bucket, Key=key, Metadata=metadata or {})
+        state.upload_id = response["UploadId"]
+        state.parts = {}
+    state.save()
+
+    offsets = {number: start for number, start in enumerate(range(0, total, part_size), start=1)}
+    done_bytes = sum(min(part_size, total - offsets[n]) for n in state.parts if n in offsets)
+    if on_progress is not None:
+        on_progress(done_bytes, total)
+
+    def upload_part(number):
+        start = offsets[number]
+        body = view[start:start + part_size].tobytes()
+        response = s3_client.upload_part(
+            Bucket=bucket, Key=key, UploadId=state.upload_id,
+            PartNumber=number, Body=body, ContentMD5=_md5_b64(body)
+        )
+        state.record_part(number, response["ETag"])
+        return len(body)
+
+    missing = [number for number in offsets if number not in state.parts]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(upload_part, number) for number in missing]
+        for future in as_completed(futures):
+            done_bytes += future.result()
+            if on_progress is not None:
+                on_progress(done_bytes, total)
+
+    s3_client.complete_multipart_upload(
+        Bucket=bucket, Key=key, UploadId=state.upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": n, "ETag": state.parts[n]} for n in sorted(state.parts)]}
+    )
+    state.clear()
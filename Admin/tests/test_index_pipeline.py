@@ -0,0 +1,61 @@
+import json
+import os
+
+import pytest
+
+import index_pipeline
+from index_pipeline import (CHUNKS_FILE, MANIFEST_FILE, OFFSETS_FILE, HashingEmbedder, build_index, iter_chunks,
+                            upload_index)
+
+def test_chunks_overlap_and_break_on_whitespace():
+    text = " ".join(f"word{i:03d}" for i in range(100))
+    chunks = list(iter_chunks([(1, text)], "notes.pdf", chunk_size=100, overlap=20))
+    assert all(len(c["text"]) <= 100 for c in chunks)
+    words = set(text.split())
+    # Every chunk ends on a whole word and the next one starts before it
+    for first, second in zip(chunks, chunks[1:]):
+        assert first["text"].split()[-1] in words
+        assert first["text"].split()[-1] in second["text"]
+    assert chunks[-1]["text"].endswith("word099")
+
+def test_chunks_record_their_source_and_page():
+    chunks = list(iter_chunks([(1, "first page"), (2, ""), (3, "third  \n page")], "notes.pdf"))
+    assert chunks == [
+        {"text": "first page", "source": "notes.pdf", "page": 1},
+        {"text": "third page", "source": "notes.pdf", "page": 3},
+    ]
+
+class RecordingS3:
+    def __init__(self):
+        self.uploaded = []
+
+    def upload_file(self, path, bucket, key):
+        assert os.path.exists(path)
+        self.uploaded.append(key)
+
+def test_manifest_is_uploaded_after_the_files_it_lists(tmp_path):
+    manifest = {"version": "v1", "shards": [{"file": "index.0000.faiss", "count": 2}]}
+    for name in ("index.0000.faiss", CHUNKS_FILE, OFFSETS_FILE):
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest))
+    s3 = RecordingS3()
+    upload_index(s3, "bucket", "maths", str(tmp_path))
+    assert s3.uploaded == [
+        f"faiss_index/maths/{name}" for name in ("index.0000.faiss", CHUNKS_FILE, OFFSETS_FILE, MANIFEST_FILE)
+    ]
+
+def test_build_writes_shards_and_chunks_in_document_order(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    pytest.importorskip("numpy")
+    pages = [(n, f"page {n} covers topic{n} in detail") for n in range(1, 6)]
+    monkeypatch.setattr(index_pipeline, "iter_pdf_pages", lambda data: iter(pages))
+    stats = build_index(b"", "notes.pdf", HashingEmbedder(dimension=16), str(tmp_path),
+                        batch_size=2, concurrency=2, shard_vectors=2)
+    assert (stats.pages, stats.chunks) == (5, 5)
+
+    manifest = index_pipeline.read_manifest(str(tmp_path))
+    assert [entry["count"] for entry in manifest["shards"]] == [2, 2, 1]
+    assert all((tmp_path / entry["file"]).exists() for entry in manifest["shards"])
+    with open(tmp_path / CHUNKS_FILE, encoding="utf-8") as f:
+        assert [json.loads(line)["page"] for line in f] == [1, 2, 3, 4, 5]
+    assert (tmp_path / OFFSETS_FILE).stat().st_size == 5 * 8
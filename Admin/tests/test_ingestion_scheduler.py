@@ -0,0 +1,86 @@
+import threading
+import time
+
+from ingestion_scheduler import COMPLETE, FINISHED_STATES, IngestionScheduler
+
+class FakeIngestion:
+    def __init__(self):
+        self.jobs = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def start_job(self):
+        with self._lock:
+            self.jobs.append(f"job-{len(self.jobs) + 1}")
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            return self.jobs[-1]
+
+    def track_job(self, job_id):
+        time.sleep(0.05)
+        with self._lock:
+            self.running -= 1
+        yield "COMPLETE"
+
+def make_scheduler(ingestion, **kwargs):
+    return IngestionScheduler(
+        upload=lambda s3_key, data: True,
+        wait_until_idle=lambda: True,
+        start_job=ingestion.start_job,
+        track_job=ingestion.track_job,
+        **kwargs
+    )
+
+def wait_until_finished(scheduler, files, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(scheduler.file_status(f)["state"] in FINISHED_STATES for f in files):
+            return
+        time.sleep(0.01)
+    raise AssertionError("files did not finish")
+
+def test_single_and_batch_files_share_ingestion_jobs():
+    ingestion = FakeIngestion()
+    scheduler = make_scheduler(ingestion)
+    files = [scheduler.submit(f"subject_{i}", f"knowledgebase/subject_{i}.pdf", b"pdf") for i in range(3)]
+    files.append(scheduler.submit_uploaded("single", "knowledgebase/single/single.pdf"))
+    wait_until_finished(scheduler, files)
+    assert all(scheduler.file_status(f)["state"] == COMPLETE for f in files)
+    assert ingestion.max_running == 1
+    assert len(ingestion.jobs) <= 2
+
+def test_finished_history_is_capped():
+    ingestion = FakeIngestion()
+    scheduler = make_scheduler(ingestion, max_history=2)
+    files = []
+    for i in range(4):
+        files.append(scheduler.submit_uploaded(f"subject_{i}", f"knowledgebase/subject_{i}.pdf"))
+        wait_until_finished(scheduler, files)
+    snapshot = scheduler.snapshot()
+    assert [f["subject"] for f in snapshot["files"]] == ["subject_2", "subject_3"]
+    assert [b["batch"] for b in snapshot["batches"]] == [3, 4]
+
+def test_finished_history_expires():
+    ingestion = FakeIngestion()
+    scheduler = make_scheduler(ingestion, history_seconds=0.1)
+    batch_file = scheduler.submit_uploaded("old", "knowledgebase/old/old.pdf")
+    wait_until_finished(scheduler, [batch_file])
+    time.sleep(0.15)
+    assert scheduler.snapshot() == {"files": [], "batches": []}
+    assert scheduler.file_status(batch_file)["state"] == COMPLETE
+
+def test_changed_uploads_are_handed_on_while_ingesting():
+    ingestion = FakeIngestion()
+    uploaded = []
+    scheduler = IngestionScheduler(
+        upload=lambda s3_key, data: data != b"same",
+        wait_until_idle=lambda: True,
+        start_job=ingestion.start_job,
+        track_job=ingestion.track_job,
+        on_file_uploaded=lambda batch_file, data: uploaded.append((batch_file.subject, data)),
+    )
+    files = [scheduler.submit("new", "knowledgebase/new/new.pdf", b"new"),
+             scheduler.submit("same", "knowledgebase/same/same.pdf", b"same")]
+    wait_until_finished(scheduler, files)
+    assert uploaded == [("new", b"new")]
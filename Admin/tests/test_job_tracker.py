@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from job_tracker import POLL_FAILED, JobTracker
+
+def make_tracker(fetch_status, **kwargs):
+    return JobTracker(fetch_status, min_interval=0.01, max_interval=0.02, jitter=0.0, **kwargs)
+
+def test_events_end_at_final_status():
+    statuses = iter(["STARTING", "IN_PROGRESS", "IN_PROGRESS", "COMPLETE"])
+    tracker = make_tracker(lambda key: next(statuses))
+    assert list(tracker.events("job-1", timeout=5)) == ["STARTING", "IN_PROGRESS", "COMPLETE"]
+
+def test_repeated_poll_failures_publish_poll_failed():
+    def fetch_status(key):
+        raise RuntimeError("throttled")
+
+    tracker = make_tracker(fetch_status, max_failures=3)
+    assert list(tracker.events("job-1", timeout=5)) == [POLL_FAILED]
+    assert tracker.polls == 3
+
+def test_failures_reset_after_a_successful_poll():
+    results = iter([RuntimeError(), RuntimeError(), "IN_PROGRESS", RuntimeError(), RuntimeError(), "COMPLETE"])
+
+    def fetch_status(key):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    tracker = make_tracker(fetch_status, max_failures=3)
+    assert list(tracker.events("job-1", timeout=5)) == ["IN_PROGRESS", "COMPLETE"]
+
+def test_events_time_out_while_job_is_active():
+    tracker = make_tracker(lambda key: "IN_PROGRESS")
+    events = tracker.events("job-1", timeout=0.2)
+    assert next(events) == "IN_PROGRESS"
+    with pytest.raises(TimeoutError):
+        next(events)
+
+def test_status_snapshot_keeps_job_watched_without_subscribers():
+    statuses = iter(["IN_PROGRESS"] * 5 + ["COMPLETE"] * 100)
+    tracker = make_tracker(lambda key: next(statuses), status_lease=5)
+    assert tracker.status("job-1") is None
+    deadline = time.monotonic() + 5
+    while tracker.status("job-1") != "COMPLETE" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert tracker.status("job-1") == "COMPLETE"
@@ -0,0 +1,19 @@
+import os
+
+from response_cache import ResponseCache, make_cache_key
+
+ADMIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_copy_matches_the_user_apps_response_cache():
+    with open(os.path.join(ADMIN_DIR, "response_cache.py"), "rb") as f:
+        copy = f.read()
+    with open(os.path.join(os.path.dirname(ADMIN_DIR), "User", "response_cache.py"), "rb") as f:
+        assert f.read() == copy
+
+def test_completed_ingestion_invalidates_the_subjects_responses(tmp_path):
+    path = str(tmp_path / "cache.db")
+    user_cache = ResponseCache(path)
+    key = make_cache_key("Operating Systems", "kb", "model", "prompt")
+    user_cache.set(key, "Operating Systems", "units")
+    ResponseCache(path).invalidate_subject("operating systems")
+    assert user_cache.get(key) is None
@@ -0,0 +1,123 @@
+import base64
+import hashlib
+import json
+import os
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+from botocore.exceptions import ClientError
+
+from s3_upload import UploadState, content_sha256, upload_buffer
+
+BUCKET = "syllabus-test"
+KEY = "knowledgebase/maths/maths.pdf"
+PART_SIZE_MB = 5
+# Three parts: two full 5 MB parts and a short last one
+DATA = os.urandom(2 * PART_SIZE_MB * 1024 * 1024 + 1024)
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+# Passes calls through to the real client, recording upload_part calls and
+# failing the given part numbers on their first attempt with the given error
+class RecordingClient:
+    def __init__(self, client, fail_parts=(), error=None):
+        self.client = client
+        self.fail_parts = set(fail_parts)
+        self.error = error or ConnectionError("connection reset")
+        self.uploaded_parts = []
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def upload_part(self, **kwargs):
+        assert kwargs["ContentMD5"] == base64.b64encode(hashlib.md5(kwargs["Body"]).digest()).decode()
+        if kwargs["PartNumber"] in self.fail_parts:
+            self.fail_parts.discard(kwargs["PartNumber"])
+            raise self.error
+        self.uploaded_parts.append(kwargs["PartNumber"])
+        return self.client.upload_part(**kwargs)
+
+def upload(client, state_dir):
+    upload_buffer(client, DATA, BUCKET, KEY, part_size_mb=PART_SIZE_MB, max_workers=2, state_dir=str(state_dir))
+
+def stored_object(s3):
+    return s3.get_object(Bucket=BUCKET, Key=KEY)["Body"].read()
+
+def saved_state(state_dir):
+    return UploadState(str(state_dir), BUCKET, KEY, content_sha256(DATA), PART_SIZE_MB * 1024 * 1024)
+
+def test_small_buffer_is_a_single_put(s3, tmp_path):
+    upload_buffer(s3, b"%PDF-1.4 small", BUCKET, KEY, state_dir=str(tmp_path))
+    assert stored_object(s3) == b"%PDF-1.4 small"
+
+def test_resume_sends_only_missing_parts(s3, tmp_path):
+    with pytest.raises(ConnectionError):
+        upload(RecordingClient(s3, fail_parts=[2]), tmp_path)
+    assert sorted(saved_state(tmp_path).parts) == [1, 3]
+
+    retry = RecordingClient(s3)
+    upload(retry, tmp_path)
+    assert retry.uploaded_parts == [2]
+    assert stored_object(s3) == DATA
+    assert not os.path.exists(saved_state(tmp_path).path)
+
+def test_parts_s3_does_not_have_are_sent_again(s3, tmp_path):
+    with pytest.raises(ConnectionError):
+        upload(RecordingClient(s3, fail_parts=[3]), tmp_path)
+    state = saved_state(tmp_path)
+    # A part recorded locally whose ETag S3 does not list is not trusted
+    with open(state.path) as f:
+        saved = json.load(f)
+    saved["parts"]["1"] = '"0123456789abcdef0123456789abcdef"'
+    with open(state.path, "w") as f:
+        json.dump(saved, f)
+
+    retry = RecordingClient(s3)
+    upload(retry, tmp_path)
+    assert sorted(retry.uploaded_parts) == [1, 3]
+    assert stored_object(s3) == DATA
+
+def test_aborted_upload_starts_over(s3, tmp_path):
+    with pytest.raises(ConnectionError):
+        upload(RecordingClient(s3, fail_parts=[2]), tmp_path)
+    s3.abort_multipart_upload(Bucket=BUCKET, Key=KEY, UploadId=saved_state(tmp_path).upload_id)
+
+    retry = RecordingClient(s3)
+    upload(retry, tmp_path)
+    assert sorted(retry.uploaded_parts) == [1, 2, 3]
+    assert stored_object(s3) == DATA
+
+def test_rejected_content_md5_fails_the_upload_and_resumes(s3, tmp_path):
+    bad_digest = ClientError(
+        {"Error": {"Code": "BadDigest", "Message": "The Content-MD5 you specified did not match what we received."}},
+        "UploadPart"
+    )
+    with pytest.raises(ClientError) as error:
+        upload(RecordingClient(s3, fail_parts=[1], error=bad_digest), tmp_path)
+    assert error.value.response["Error"]["Code"] == "BadDigest"
+
+    retry = RecordingClient(s3)
+    upload(retry, tmp_path)
+    assert retry.uploaded_parts == [1]
+    assert stored_object(s3) == DATA
+
+def test_new_content_aborts_the_upload_it_replaces(s3, tmp_path):
+    with pytest.raises(ConnectionError):
+        upload(RecordingClient(s3, fail_parts=[2]), tmp_path)
+    old_upload_id = saved_state(tmp_path).upload_id
+
+    new_data = os.urandom(len(DATA))
+    upload_buffer(s3, new_data, BUCKET, KEY, part_size_mb=PART_SIZE_MB, max_workers=2, state_dir=str(tmp_path))
+    assert stored_object(s3) == new_data
+    assert old_upload_id not in [u["UploadId"] for u in s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", [])]
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+
+from botocore.exceptions import ClientError
+
+# ---------- Manifest Configuration ----------
+MANIFEST_PATH = os.getenv("UPLOAD_MANIFEST_PATH", "/tmp/au_ai_upload_manifest.json")
+# S3 user metadata key holding the SHA-256 of the uploaded content
+DIGEST_METADATA_KEY = "sha256"
+
+# What a re-upload needs: nothing, just an ingestion, or an upload and an ingestion
+SKIP = "SKIP"
+INGEST = "INGEST"
+UPLOAD = "UPLOAD"
+
+# Local record of the content hash last uploaded to each S3 key and whether an
+# ingestion job has completed since. Writes go to a temp file and are renamed
+# into place so a crash never leaves a half-written manifest.
+class UploadManifest:
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def get(self, s3_key):
+        with self._lock:
+            entry = self._entries.get(s3_key)
+            return dict(entry) if entry else None
+
+    def record_upload(self, s3_key, digest):
+        with self._lock:
+            self._entries[s3_key] = {DIGEST_METADATA_KEY: digest, "ingested": False}
+            self._save()
+
+    def mark_ingested(self, s3_key):
+        with self._lock:
+            entry = self._entries.get(s3_key)
+            if entry is not None:
+                entry["ingested"] = True
+                self._save()
+
+def remote_digest(s3_client, bucket, s3_key):
+    try:
+        response = s3_client.head_object(Bucket=bucket, Key=s3_key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return response.get("Metadata", {}).get(DIGEST_METADATA_KEY)
+
+# Decide what an upload of content with this digest requires. The local manifest
+# is checked first; without a local entry the digest stored on the S3 object
+# tells us the bytes are already there, but not whether they were ingested.
+def plan_upload(manifest, s3_client, bucket, s3_key, digest):
+    entry = manifest.get(s3_key)
+    if entry and entry.get(DIGEST_METADATA_KEY) == digest:
+        return SKIP if entry.get("ingested") else INGEST
+    if remote_digest(s3_client, bucket, s3_key) == digest:
+        manifest.record_upload(s3_key, digest)
+        return INGEST
+    return UPLOAD
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from paper_format import PART_MARKS, PART_ORDER, part_header, parse_paper
+
+logger = logging.getLogger(__name__)
+
+# ---------- Answer Pipeline Configuration ----------
+ANSWER_CONCURRENCY = int(os.getenv("ANSWER_CONCURRENCY", "4"))
+ANSWER_RETRIES = int(os.getenv("ANSWER_RETRIES", "2"))
+ANSWER_TIMEOUT_SECONDS = float(os.getenv("ANSWER_TIMEOUT_SECONDS", "90"))
+
+# One numbered question from the paper, e.g. Part B question 3
+class PaperQuestion:
+    def __init__(self, part, number, text):
+        self.part = part
+        self.number = number
+        self.text = text
+
+    @property
+    def marks(self):
+        return PART_MARKS[self.part]
+
+    def __repr__(self):
+        return f"PaperQuestion(part={self.part!r}, number={self.number}, text={self.text[:40]!r})"
+
+def parse_questions(paper_text):
+    parts = parse_paper(paper_text)
+    return [
+        PaperQuestion(part, number, text)
+        for part in PART_ORDER
+        for number, text in enumerate(parts.get(part, []), start=1)
+    ]
+
+# Rebuild the answer key in Part/number order. Questions without an answer yet
+# are left out, so this also renders partial keys while answers stream in.
+def format_answer_key(questions, answers):
+    parts = {}
+    for question, answer in zip(questions, answers):
+        if answer is not None:
+            parts.setdefault(question.part, []).append(f"{question.number}. {answer.strip()}")
+    return "\n\n".join(
+        f"{part_header(part)}\n" + "\n\n".join(parts[part])
+        for part in PART_ORDER
+        if part in parts
+    )
+
+# Answer every question with answer_question(question) on a bounded thread pool.
+# Each attempt gets `timeout` seconds once it starts running; timed-out questions
+# are retried up to `retries` times and then marked unavailable. Errors are not
+# retried here: answer_question already retries throttling and transient errors
+# (call_with_limiter), so a question that raises is marked unavailable. A timed-out
+# call cannot be interrupted, so it keeps its worker until the underlying request returns.
+# on_progress, if given, is called from the calling thread with the partial key.
+def answer_questions_in_parallel(answer_question, questions, max_workers=ANSWER_CONCURRENCY,
+                                 retries=ANSWER_RETRIES, timeout=ANSWER_TIMEOUT_SECONDS, on_progress=None):
+    answers = [None] * len(questions)
+    if not questions:
+        return ""
+
+    started = {}
+    started_lock = threading.Lock()
+
+    def run(index, attempt):
+        with started_lock:
+            started[(index, attempt)] = time.monotonic()
+        return answer_question(questions[index])
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(questions))))
+    pending = {}
+    attempts = [0] * len(questions)
+
+    def submit(index):
+        attempts[index] += 1
+        pending[executor.submit(run, index, attempts[index])] = (index, attempts[index])
+
+    def retry_or_fail(index, reason):
+        if attempts[index] <= retries:
+            logger.warning("Retrying Part %s Q%d after %s", questions[index].part, questions[index].number, reason)
+            submit(index)
+        else:
+            answers[index] = f"[Answer unavailable: {reason}]"
+
+    try:
+        for index in range(len(questions)):
+            submit(index)
+
+        while pending:
+            done, _ = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            progressed = False
+            for future in done:
+                index, _attempt = pending.pop(future)
+                try:
+                    answers[index] = future.result()
+                except Exception as e:
+                    answers[index] = f"[Answer unavailable: {e}]"
+                progressed = progressed or answers[index] is not None
+
+            if timeout and timeout > 0:
+                now = time.monotonic()
+                for future, (index, attempt) in list(pending.items()):
+                    with started_lock:
+                        start = started.get((index, attempt))
+                    if start is not None and now - start > timeout:
+                        pending.pop(future)
+                        retry_or_fail(index, f"timed out after {timeout:g}s")
+                        progressed = progressed or answers[index] is not None
+
+            if progressed and on_progress is not None:
+                on_progress(format_answer_key(questions, answers))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return format_answer_key(questions, answers)
@@ -1,48 +1,309 @@
 import streamlit as st
-import boto3
 import os
-from fpdf import FPDF
-from io import BytesIO
-import re
+import logging
+import threading
+import time
+from collections import Counter
+from aws_clients import get_client, pool_stats
+from pdf_render import render_pdf_cached
+from response_cache import ResponseCache, make_cache_key
+from streaming import BedrockStreamBackend, estimate_tokens, stream_generation
+from paper_format import (
+    BLOOM_LEVELS, PART_MARKS, PART_ORDER, format_paper, parse_bloom_distribution, parse_paper, part_header,
+    split_numbered_questions
+)
+from parallel_generation import PartSlice, generate_parts_in_parallel, plan_slices
+from paper_cache import PaperCache, PaperRequest, describe_match, paper_fits, reuse_paper
+from answer_pipeline import answer_questions_in_parallel, parse_questions
+from rate_limiter import BATCH, INTERACTIVE, LimiterRegistry, call_with_limiter, is_throttling
+from retrieval import (
+    RETRIEVAL_BACKEND, KnowledgeBaseRetriever, LocalFaissRetriever, LocalRetrievalBackend, PrefetchedContextBackend,
+    TitanEmbedder
+)
+from context_prefetch import CONTEXT_PREFETCH, PREFETCH_TOP_K, UnitContextCache, make_prefetch_executor
+from structured_output import (
+    QUESTIONS_SCHEMA, STRUCTURED_OUTPUT, STRUCTURED_REPAIR_ATTEMPTS, UNITS_SCHEMA,
+    extract_json, parse_units, validate_paper, validate_section
+)
+from question_bank import BANK_QUESTIONS_PER_LEVEL, QUESTION_BANK_ENABLED, BankWarmer, QuestionBank, parse_tagged_questions
+from job_queue import BACKGROUND_JOBS, DONE, FAILED, FINISHED_STATES, JOB_POLL_SECONDS, JobQueue, JobStore
+from single_flight import SINGLE_FLIGHT, SingleFlight
+from tracing import current_trace, init_tracing, new_trace_id, propagate, set_trace, span, trace_stats
+from model_router import (
+    ANSWER_TOKENS, QUESTION_TOKENS, ROUTING_ENABLED, UNIT_LIST_TOKENS, ModelProfile, ModelRouter,
+    expected_answer_tokens, expected_question_tokens, log_decision
+)
 
 # ---------- AWS Configuration ----------
 aws_region = "us-east-1"
 knowledge_base_id = "NRQ5XMNDMI"
 model_arn = "arn:aws:bedrock:us-east-1::foundation-model/anthropic.claude-3-sonnet-20240229-v1:0"
 model_arn2 = "arn:aws:bedrock:us-east-1::foundation-model/anthropic.claude-3-haiku-20240307-v1:0"
-bedrock_agent_runtime = boto3.client("bedrock-agent-runtime", region_name=aws_region)
-
-# ---------- PDF Generator ----------
-class PDF(FPDF):
-    def header(self):
-        self.set_font("Arial", 'B', 14)
-        self.cell(0, 10, self.title, align="C", ln=True)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Arial", "I", 8)
-        self.cell(0, 10, f"Page {self.page_no()}", align="C")
-
-def convert_text_to_pdf(subject, text, title="Document"):
-    pdf = PDF()
-    pdf.set_title(title)
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.set_font("Arial", size=12)
-    for line in text.split("\n"):
-        clean = line.replace("•", "-").replace("–", "-").replace("“", "\"").replace("”", "\"").replace("’", "'")
-        pdf.multi_cell(0, 10, clean)
-    pdf_output = BytesIO()
+bedrock_agent_runtime = get_client("bedrock-agent-runtime", region_name=aws_region)
+# Model calls are retried only by call_with_limiter, so their clients make one
+# attempt and every throttle reaches the limiter
+generation_agent_runtime = get_client("bedrock-agent-runtime", region_name=aws_region, max_attempts=1)
+
+# Stream question papers and answer keys token by token (set STREAM_OUTPUT=false to disable).
+# With BACKGROUND_JOBS streamed text is shown as the job's progress.
+STREAM_OUTPUT = os.getenv("STREAM_OUTPUT", "true").lower() in ("1", "true", "yes")
+# Only single-request generations stream, so the parallel modes below are off
+# by default while streaming is on; with them the page fills in as each part
+# or answer completes.
+_PARALLEL_DEFAULT = "false" if STREAM_OUTPUT else "true"
+# Generate Part A, B and C as concurrent requests instead of one long generation
+PARALLEL_PARTS = os.getenv("PARALLEL_PARTS", _PARALLEL_DEFAULT).lower() in ("1", "true", "yes")
+# Answer each question as its own request instead of one long answer key
+PARALLEL_ANSWERS = os.getenv("PARALLEL_ANSWERS", _PARALLEL_DEFAULT).lower() in ("1", "true", "yes")
+
+# Show connection pool and timing diagnostics in the sidebar
+SHOW_DIAGNOSTICS = os.getenv("SHOW_DIAGNOSTICS", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+# ---------- Response Cache ----------
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+# Question papers keyed by normalized request, for exact and near-duplicate reuse
+@st.cache_resource
+def get_paper_cache():
+    return PaperCache()
+
+# Tagged questions per (subject, unit, part, Bloom's level), filled in the background
+@st.cache_resource
+def get_question_bank():
+    return QuestionBank()
+
+@st.cache_resource
+def get_bank_warmer():
+    return BankWarmer(get_question_bank(), generate_bank_questions, fetch_units)
+
+# Paper and answer generation off the script thread, results kept per user and job
+@st.cache_resource
+def get_job_queue():
+    return JobQueue(JobStore())
+
+# Identical requests in flight at once, from any session, share one generation
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight()
+
+# Run fn once for all identical concurrent requests (SINGLE_FLIGHT=false to disable)
+def coalesce(kind, key, fn, recheck=None):
+    if not SINGLE_FLIGHT:
+        return fn()
+    return get_single_flight().do(kind, key, fn, recheck)
+
+# ---------- Generation Backend ----------
+@st.cache_resource
+def get_stream_backend():
+    return BedrockStreamBackend(generation_agent_runtime)
+
+# Embedding requests keep the client's own retries; model calls use the single-attempt client
+@st.cache_resource
+def get_bedrock_runtime():
+    return get_client("bedrock-runtime", region_name=aws_region)
+
+@st.cache_resource
+def get_generation_runtime():
+    return get_client("bedrock-runtime", region_name=aws_region, max_attempts=1)
+
+# Local FAISS retrieval with Bedrock generation (RETRIEVAL_BACKEND=local)
+@st.cache_resource
+def get_local_backend():
+    bucket = os.getenv("BUCKET_NAME")
+    retriever = LocalFaissRetriever(
+        TitanEmbedder(get_bedrock_runtime()),
+        s3_client=get_client("s3", region_name=aws_region) if bucket else None,
+        bucket=bucket
+    )
+    return LocalRetrievalBackend(retriever, get_generation_runtime())
+
+# ---------- Context Prefetch ----------
+# Retrieve-only queries for ticked units (CONTEXT_PREFETCH=true), shared by all sessions
+@st.cache_resource
+def get_prefetch_executor():
+    return make_prefetch_executor()
+
+def retrieve_unit_passages(subject, unit):
+    if RETRIEVAL_BACKEND == "local":
+        retriever = get_local_backend().retriever
+    else:
+        retriever = KnowledgeBaseRetriever(bedrock_agent_runtime, knowledge_base_id)
+    return retriever.search(subject, f"{subject}: {unit}", PREFETCH_TOP_K)
+
+# This session's retrieved passages per (subject, unit)
+def unit_contexts():
+    if "unit_contexts" not in st.session_state:
+        st.session_state.unit_contexts = UnitContextCache(retrieve_unit_passages, get_prefetch_executor())
+    return st.session_state.unit_contexts
+
+# Generate from already retrieved passages instead of retrieve_and_generate
+def context_backend(context):
+    if not context:
+        return None
+    return PrefetchedContextBackend(context, get_generation_runtime())
+
+# Estimated token usage of every model call made by this process
+generation_usage = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+_usage_lock = threading.Lock()
+
+def record_usage(prompt, output):
+    with _usage_lock:
+        generation_usage["calls"] += 1
+        generation_usage["prompt_tokens"] += estimate_tokens(prompt)
+        generation_usage["output_tokens"] += estimate_tokens(output)
+
+# Per-model token buckets shared by every session; interactive calls go ahead of batch work
+@st.cache_resource
+def get_model_limiters():
+    return LimiterRegistry()
+
+# Priority of model calls made by this process (the batch runner lowers it)
+call_priority = INTERACTIVE
+
+# Routes each call between Haiku and Sonnet against the latency SLO (MODEL_ROUTING=false to disable)
+@st.cache_resource
+def get_model_router():
+    return ModelRouter([
+        ModelProfile("haiku", model_arn2, first_token_seconds=0.8, tokens_per_second=120.0),
+        ModelProfile("sonnet", model_arn, first_token_seconds=2.0, tokens_per_second=45.0),
+    ])
+
+def model_of(query):
+    return query["retrieveAndGenerateConfiguration"]["knowledgeBaseConfiguration"]["modelArn"]
+
+def with_model(query, arn):
+    config = query["retrieveAndGenerateConfiguration"]
+    return dict(query, retrieveAndGenerateConfiguration=dict(
+        config, knowledgeBaseConfiguration=dict(config["knowledgeBaseConfiguration"], modelArn=arn)
+    ))
+
+# Run a retrieve-and-generate query. When a placeholder is given and streaming is on,
+# the text is rendered into it as it arrives. subject and retrieval_text are used by
+# the local retrieval backend to pick the index and the search text.
+# Calls wait for capacity on the model's limiter and throttled calls are retried.
+# With a task name and expected output size, the router may swap the query's model
+# for a faster one, and a call that stays throttled is retried once on the fallback.
+# priority overrides the process-wide call_priority for this call.
+def run_generation(query, placeholder=None, backend=None, subject=None, retrieval_text=None, task=None, output_tokens=0, priority=None):
+    return generate_with_model(query, placeholder, backend, subject, retrieval_text, task, output_tokens, priority)[0]
+
+# As run_generation, returning (text, ARN of the model that generated it)
+def generate_with_model(query, placeholder=None, backend=None, subject=None, retrieval_text=None, task=None, output_tokens=0, priority=None):
+    priority = call_priority if priority is None else priority
+    prompt_tokens = estimate_tokens(query["input"]["text"])
+    if not (ROUTING_ENABLED and task):
+        return _run_on_model(query, placeholder, backend, subject, retrieval_text, priority)[0], model_of(query)
+
+    router = get_model_router()
+    decision = router.choose(task, model_of(query), prompt_tokens, output_tokens)
     try:
-        pdf_bytes = pdf.output(dest='S').encode('latin-1')
-    except UnicodeEncodeError:
-        pdf_bytes = pdf.output(dest='S').encode('utf-8', errors='replace')
-    pdf_output.write(pdf_bytes)
-    pdf_output.seek(0)
-    return pdf_output
+        text, seconds = _run_on_model(with_model(query, decision.model), placeholder, backend, subject, retrieval_text, priority)
+    except Exception as e:
+        if not is_throttling(e):
+            raise
+        router.record(decision.model, 0.0, prompt_tokens, 0, throttled=True)
+        if decision.fallback is None:
+            raise
+        log_decision(decision)
+        decision.reason = f"throttled on {decision.model.rsplit('/', 1)[-1]}, falling back"
+        decision.model, decision.fallback = decision.fallback, None
+        text, seconds = _run_on_model(with_model(query, decision.model), placeholder, backend, subject, retrieval_text, priority)
+
+    router.record(decision.model, seconds, prompt_tokens, estimate_tokens(text))
+    log_decision(decision, seconds)
+    return text, decision.model
+
+# Returns the text and how long the successful model call took, leaving out
+# the wait for limiter capacity and any throttling backoff before it
+def _run_on_model(query, placeholder, backend, subject, retrieval_text, priority):
+    timing = {}
+
+    def attempt():
+        started = time.perf_counter()
+        text = _generate(query, placeholder, backend, subject, retrieval_text)
+        timing["seconds"] = time.perf_counter() - started
+        return text
+
+    text = call_with_limiter(get_model_limiters().get(model_of(query)), attempt, priority=priority)
+    record_usage(query["input"]["text"], text)
+    return text, timing["seconds"]
+
+# Models a call for preferred_arn may be served by, preferred first. Cached
+# responses are keyed by the model that generated them.
+def candidate_models(preferred_arn):
+    if not ROUTING_ENABLED:
+        return [preferred_arn]
+    return [preferred_arn] + [arn for arn in get_model_router().profiles if arn != preferred_arn]
+
+# Each call is one tracing span. Token counts are estimated unless the backend
+# reported real usage. A backend, when given, always serves the call; one that
+# can only stream is read to the end when there is nothing to stream to.
+def _generate(query, placeholder, backend, subject, retrieval_text):
+    local = RETRIEVAL_BACKEND == "local" and backend is None
+    streaming = placeholder is not None and STREAM_OUTPUT
+    if isinstance(backend, PrefetchedContextBackend):
+        name = "bedrock.invoke_model"
+    elif backend is not None:
+        name = "backend.generate"
+    else:
+        name = "local.generate" if local else "bedrock.retrieve_and_generate"
+    name += "_stream" if streaming else ""
+    with span(name, model=model_of(query).rsplit("/", 1)[-1], subject=subject or "") as generation:
+        if streaming:
+            if local:
+                backend = get_local_backend().bind(subject, retrieval_text)
+            text, stats = stream_generation(backend or get_stream_backend(), query, placeholder.text)
+            record_stats = getattr(placeholder, "record_stats", None)
+            if record_stats is not None:
+                # A background job's progress, which has no session to write to
+                record_stats(stats.as_dict())
+            else:
+                st.session_state.last_stream_stats = stats.as_dict()
+            if stats.time_to_first_token is not None:
+                generation.set("time_to_first_token", round(stats.time_to_first_token, 4))
+        elif backend is not None:
+            generate = getattr(backend, "generate", None)
+            text = generate(query) if generate is not None else "".join(backend.stream(query))
+        elif local:
+            text = get_local_backend().generate(query, subject, retrieval_text)
+        else:
+            response = generation_agent_runtime.retrieve_and_generate(**query)
+            text = response.get('output', {}).get('text', "")
+            generation.set("citations", sum(len(c.get("retrievedReferences", [])) for c in response.get("citations", [])))
+        generation.attributes.setdefault("prompt_tokens", estimate_tokens(query["input"]["text"]))
+        generation.attributes.setdefault("output_tokens", estimate_tokens(text))
+        return text
 
 # ---------- Unit Extractor ----------
 def extract_units_from_knowledge_base(subject):
+    try:
+        return fetch_units(subject)
+    except Exception as e:
+        if is_throttling(e):
+            st.warning("The model service is busy right now. Please try again in a minute.")
+        else:
+            st.error(f"Error extracting units: {str(e)}")
+        return []
+
+# Extract the subject's units, raising on failure; also used off the script thread
+def fetch_units(subject):
+    if STRUCTURED_OUTPUT:
+        output_rules = f"""4. The output must be a single JSON object and contain **no explanations** or commentary.
+
+Output format (JSON only, no code fences):
+{UNITS_SCHEMA}"""
+    else:
+        output_rules = """4. The output must be a **plain numbered list** and contain **no explanations** or commentary.
+
+Output format:
+1. [Exact title as written in the source]
+2. [Exact title as written in the source]
+3. [Exact title as written in the source]
+..."""
     input_query = {
     "text": f"""
 You are an academic assistant. Your task is to extract the **exact chapter or units** from a textbook for the subject "{subject}".
@@ -66,13 +327,7 @@ Extraction rules:
 1. Do not modify, paraphrase, or rephrase any chapter titles.
 2. Return titles exactly as written — including numbering, punctuation, special characters, and formatting (e.g., capitalization).
 3. Include ALL chapters or units, even if there are more than 16.
-4. The output must be a **plain numbered list** and contain **no explanations** or commentary.
-
-Output format:
-1. [Exact title as written in the source]
-2. [Exact title as written in the source]
-3. [Exact title as written in the source]
-...
+{output_rules}
 
 Important:
 - Do not guess or infer missing titles.
@@ -94,17 +349,59 @@ Begin extraction below:
         }
     }
 
+    cache = get_response_cache()
+    cache_keys = [make_cache_key(subject, knowledge_base_id, arn, input_query["text"]) for arn in candidate_models(model_arn)]
+
+    def generate_units():
+        text, served_by = generate_with_model(
+            query, subject=subject, retrieval_text=f"{subject} table of contents chapters units",
+            task="units", output_tokens=UNIT_LIST_TOKENS
+        )
+        if text.strip():
+            cache.set(make_cache_key(subject, knowledge_base_id, served_by, input_query["text"]), subject, text)
+        return text
+
+    full_text = cache.get_any(cache_keys)
+    if full_text is None:
+        full_text = coalesce("units", cache_keys[0], generate_units, recheck=lambda: cache.get_any(cache_keys))
+    return parse_units(full_text)
+
+# ---------- Question Generator ----------
+def generate_exam_questions(subject, selected_units, part_a_count, part_b_count, part_c_count, bloom_distribution_text, placeholder=None, context=None, provenance=None):
     try:
-        response = bedrock_agent_runtime.retrieve_and_generate(**query)
-        full_text = response.get('output', {}).get('text', "")
-        raw_units = re.findall(r"\d+\.\s+.+", full_text)
-        return [unit.strip() for unit in raw_units if unit.strip()]
+        return build_exam_questions(
+            subject, selected_units, part_a_count, part_b_count, part_c_count, bloom_distribution_text, placeholder, context, provenance
+        )
     except Exception as e:
-        st.error(f"Error extracting units: {str(e)}")
-        return []
+        if is_throttling(e):
+            st.warning("The model service is busy right now. Please try again in a minute.")
+        else:
+            st.error(f"Error generating questions: {str(e)}")
+        return ""
 
-# ---------- Question Generator ----------
-def generate_exam_questions(subject, selected_units, part_a_count, part_b_count, part_c_count, bloom_distribution_text):
+# Generate a question paper, raising on failure; also used off the script thread.
+# Concurrent identical requests share one generation, and only its caller streams.
+# context holds prefetched passages to generate from instead of retrieve_and_generate.
+# provenance, when given, gets "context": True if this call generated the whole
+# paper from those passages (not when it came from the bank or another caller).
+def build_exam_questions(subject, selected_units, part_a_count, part_b_count, part_c_count, bloom_distribution_text, placeholder=None, context=None, provenance=None):
+    request = PaperRequest.from_inputs(subject, selected_units, part_a_count, part_b_count, part_c_count, bloom_distribution_text)
+    return coalesce(
+        "paper", request.cache_key,
+        lambda: _build_exam_questions(
+            subject, selected_units, part_a_count, part_b_count, part_c_count, bloom_distribution_text, placeholder, context, provenance
+        ),
+        recheck=lambda: cached_paper(request)
+    )
+
+# An exact cached hit, re-checked against the requested part counts
+def cached_paper(request):
+    match = get_paper_cache().lookup(request)
+    if match is None or not match.exact or not paper_fits(match.paper, request.part_counts):
+        return None
+    return match.paper
+
+def _build_exam_questions(subject, selected_units, part_a_count, part_b_count, part_c_count, bloom_distribution_text, placeholder=None, context=None, provenance=None):
     input_query = {
     "text": f'''
 You are an expert academic assistant.
@@ -170,15 +467,243 @@ Return only the formatted question paper as plain text. Do **not** include expla
         }
     }
 
+    part_counts = {"A": part_a_count, "B": part_b_count, "C": part_c_count}
+    from_bank = QUESTION_BANK_ENABLED and get_question_bank().has_subject(subject)
+    if from_bank:
+        # Assemble from the bank and generate only what it cannot supply
+        parts, missing = get_question_bank().assemble(
+            subject, selected_units, part_counts, parse_bloom_distribution(bloom_distribution_text)
+        )
+        paper = fill_missing_questions(subject, selected_units, parts, missing, bloom_distribution_text, placeholder, context)
+    elif PARALLEL_PARTS:
+        slices = plan_slices(part_counts, selected_units)
+        on_progress = placeholder.text if placeholder is not None else None
+        paper = generate_parts_in_parallel(
+            propagate(lambda part_slice: generate_part_slice(subject, part_slice, bloom_distribution_text, context=context)),
+            slices,
+            on_progress=on_progress
+        ).strip()
+    else:
+        paper = run_generation(
+            query, placeholder, backend=context_backend(context), subject=subject, retrieval_text=f"{subject}: {', '.join(selected_units)}",
+            task="questions", output_tokens=expected_question_tokens(part_counts)
+        ).strip()
+    paper = repair_paper(subject, selected_units, paper, part_counts, bloom_distribution_text, context)
+    if paper:
+        request = PaperRequest.from_inputs(subject, selected_units, part_a_count, part_b_count, part_c_count, bloom_distribution_text)
+        get_paper_cache().set(request, paper)
+        if provenance is not None and context and not from_bank:
+            provenance["context"] = True
+    return paper
+
+# Generate one slice of one part; runs on a worker thread, so no Streamlit calls here.
+# avoid lists questions the paper already has, when topping up a cached paper.
+# In structured mode the section comes back as JSON, is validated, and only the
+# questions still missing are requested again (up to repair_attempts times).
+def generate_part_slice(subject, part_slice, bloom_distribution_text, avoid=None, repair_attempts=STRUCTURED_REPAIR_ATTEMPTS, context=None):
+    marks = PART_MARKS[part_slice.part]
+    avoid_text = ""
+    if avoid:
+        existing = "\n".join(f"  • {question}" for question in avoid)
+        avoid_text = f"\n- Do not repeat or rephrase any of these existing questions:\n{existing}\n"
+    if STRUCTURED_OUTPUT:
+        format_rules = f'''Return a single JSON object (no code fences) in this form, with "marks" set to {marks}:
+{QUESTIONS_SCHEMA}
+
+Important:
+- "unit" must be copied from the selected chapters/units above.
+- "bloom" must be one of the Bloom’s Taxonomy levels above.
+- Use LaTeX formatting for any mathematical expressions, doubling every backslash inside JSON strings (write `\\\\frac{{1}}{{2}}`, not `\\frac{{1}}{{2}}`).
+
+---
+Return only the JSON object. Do **not** include other parts, explanations, context, or additional instructions.'''
+    else:
+        format_rules = f'''{part_header(part_slice.part)}  
+1. Question one text  
+2. Question two text  
+...
+
+Important:
+- Begin **exactly** with the header: `{part_header(part_slice.part)}`
+- Each question must appear on its own line and be clearly numbered.
+- Add **one empty line between questions** for readability.
+- Do **not** merge questions into paragraphs.
+- Use LaTeX formatting for any mathematical expressions.
+
+---
+Return only this section as plain text. Do **not** include other parts, explanations, context, or additional instructions.'''
+    input_query = {
+    "text": f'''
+You are an expert academic assistant.
+
+Generate questions for **one section** of a university-level question paper on the subject: "{subject}".
+
+Follow **Anna University exam format**, strictly adhering to these rules:
+
+---
+**INSTRUCTIONS:**
+- Use ONLY these selected chapters/units:
+{', '.join(part_slice.units)}
+
+- Write exactly {part_slice.count} questions for Part {part_slice.part}, {marks} marks each.
+
+- Spread the questions evenly across the selected units.
+{avoid_text}
+- Use this Bloom’s Taxonomy distribution:
+{bloom_distribution_text}
+
+---
+**FORMATTING RULES (STRICT):**
+
+{format_rules}
+'''
+}
+
+    query = {
+        "input": input_query,
+        "retrieveAndGenerateConfiguration": {
+            "type": "KNOWLEDGE_BASE",
+            "knowledgeBaseConfiguration": {
+                "knowledgeBaseId": knowledge_base_id,
+                "modelArn": model_arn2
+            }
+        }
+    }
+    text = run_generation(
+        query, backend=context_backend(context), subject=subject, retrieval_text=f"{subject}: {', '.join(part_slice.units)}",
+        task=f"questions_part_{part_slice.part}", output_tokens=expected_question_tokens({part_slice.part: part_slice.count})
+    )
+    if not STRUCTURED_OUTPUT:
+        return text
+
+    section = validate_section(extract_json(text), part_slice.part, part_slice.count, part_slice.units, avoid or ())
+    for question, reason in section.invalid:
+        logger.info("Dropped Part %s question (%s): %s", part_slice.part, reason, question)
+    questions = section.questions
+    if section.missing and repair_attempts > 0:
+        # Re-request only the shortfall, steered towards units not yet covered
+        repair = PartSlice(part_slice.part, part_slice.index, section.missing, section.uncovered_units or part_slice.units)
+        logger.info("Repairing Part %s: requesting %d missing question(s)", part_slice.part, section.missing)
+        repaired = generate_part_slice(
+            subject, repair, bloom_distribution_text, avoid=list(avoid or []) + questions, repair_attempts=repair_attempts - 1,
+            context=context
+        )
+        questions += split_numbered_questions(repaired)[:section.missing]
+    return format_paper({part_slice.part: questions})
+
+# Generate the questions each part is short of and merge them after the existing ones
+def fill_missing_questions(subject, selected_units, parts, missing, bloom_distribution_text, placeholder=None, context=None):
+    slices = [PartSlice(part, 0, missing[part], selected_units) for part in PART_ORDER if missing[part] > 0]
+    if slices:
+        on_progress = placeholder.text if placeholder is not None else None
+        extra = parse_paper(generate_parts_in_parallel(
+            propagate(lambda part_slice: generate_part_slice(
+                subject, part_slice, bloom_distribution_text, avoid=parts[part_slice.part], context=context
+            )),
+            slices,
+            on_progress=on_progress
+        ))
+        for part_slice in slices:
+            parts[part_slice.part] += extra.get(part_slice.part, [])[:part_slice.count]
+    return format_paper(parts)
+
+# Check the assembled paper against the requested part counts. Extra questions
+# are trimmed and only the parts that came back short are generated again.
+def repair_paper(subject, selected_units, paper, part_counts, bloom_distribution_text, context=None):
+    parts = parse_paper(paper)
+    validation = validate_paper(parts, part_counts)
+    if validation.ok:
+        return paper
+    logger.info("Repairing question paper: %s", validation.summary())
+    parts = {part: parts.get(part, [])[:int(part_counts.get(part, 0))] for part in PART_ORDER}
+    return fill_missing_questions(subject, selected_units, parts, validation.missing, bloom_distribution_text, context=context)
+
+# Build a paper from a near-hit cached paper: keep up to the requested number of
+# questions per part and generate only the questions still missing.
+def top_up_paper(subject, selected_units, match, part_counts, bloom_distribution_text, placeholder=None, context=None):
     try:
-        response = bedrock_agent_runtime.retrieve_and_generate(**query)
-        return response.get('output', {}).get('text', "").strip()
+        return build_topped_up_paper(subject, selected_units, match, part_counts, bloom_distribution_text, placeholder, context)
     except Exception as e:
-        st.error(f"Error generating questions: {str(e)}")
+        if is_throttling(e):
+            st.warning("The model service is busy right now. Please try again in a minute.")
+        else:
+            st.error(f"Error topping up questions: {str(e)}")
         return ""
 
+def build_topped_up_paper(subject, selected_units, match, part_counts, bloom_distribution_text, placeholder=None, context=None):
+    parts, missing = reuse_paper(match.paper, part_counts)
+    paper = fill_missing_questions(subject, selected_units, parts, missing, bloom_distribution_text, placeholder, context)
+    if paper:
+        request = PaperRequest.from_inputs(
+            subject, selected_units, part_counts["A"], part_counts["B"], part_counts["C"], bloom_distribution_text
+        )
+        get_paper_cache().record_reuse(topped_up=any(missing.values()))
+        get_paper_cache().set(request, paper)
+    return paper
+
+# Question bank warm-up: a few questions per Bloom's level for one unit and part,
+# at batch priority so interactive requests go first
+def generate_bank_questions(subject, unit, part):
+    marks = PART_MARKS[part]
+    input_query = {
+    "text": f'''
+You are an expert academic assistant.
+
+Write exam questions on the subject "{subject}" for the chapter/unit: {unit}
+
+---
+**INSTRUCTIONS:**
+- Write exactly {BANK_QUESTIONS_PER_LEVEL} questions for each Bloom’s Taxonomy level: {', '.join(BLOOM_LEVELS)}.
+- Each question is worth {marks} marks (Part {part} of an Anna University paper) and must be answerable in that many marks.
+- Use LaTeX formatting for any mathematical expressions.
+
+---
+**FORMATTING RULES (STRICT):**
+- One question per line, starting with its level in square brackets, for example:
+[Remember] Question text
+[Apply] Question text
+- Do not number the questions and do not add headings, explanations or blank lines.
+'''
+}
+
+    query = {
+        "input": input_query,
+        "retrieveAndGenerateConfiguration": {
+            "type": "KNOWLEDGE_BASE",
+            "knowledgeBaseConfiguration": {
+                "knowledgeBaseId": knowledge_base_id,
+                "modelArn": model_arn2
+            }
+        }
+    }
+    text = run_generation(
+        query, subject=subject, retrieval_text=f"{subject}: {unit}",
+        task=f"bank_part_{part}", output_tokens=QUESTION_TOKENS[part] * BANK_QUESTIONS_PER_LEVEL * len(BLOOM_LEVELS),
+        priority=BATCH
+    )
+    return parse_tagged_questions(text)
+
 # ---------- Answer Generator ----------
-def generate_answers_for_questions(subject, questions_text, knowledge_base_id, model_arn):
+def generate_answers_for_questions(subject, questions_text, knowledge_base_id, model_arn, placeholder=None, context=None):
+    try:
+        return build_answer_key(subject, questions_text, knowledge_base_id, model_arn, placeholder, context)
+    except Exception as e:
+        if is_throttling(e):
+            st.warning("The model service is busy right now. Please try again in a minute.")
+        else:
+            st.error(f"Error generating answers: {str(e)}")
+        return ""
+
+# Generate the answer key for a question paper, raising on failure; also used off the script thread.
+# Keys for the same paper (e.g. a shared cached paper) requested at once are generated once.
+# With context, answers are grounded in the same prefetched passages as the questions.
+def build_answer_key(subject, questions_text, knowledge_base_id, model_arn, placeholder=None, context=None):
+    key = make_cache_key(subject, knowledge_base_id, model_arn, questions_text)
+    return coalesce(
+        "answers", key, lambda: _build_answer_key(subject, questions_text, knowledge_base_id, model_arn, placeholder, context)
+    )
+
+def _build_answer_key(subject, questions_text, knowledge_base_id, model_arn, placeholder=None, context=None):
     input_query = {
         "text": f'''
 You are an expert academician.
@@ -210,16 +735,227 @@ Output:
         }
     }
 
-    try:
-        response = bedrock_agent_runtime.retrieve_and_generate(**query)
-        return response.get('output', {}).get('text', "").strip()
-    except Exception as e:
-        st.error(f"Error generating answers: {str(e)}")
-        return ""
+    questions = parse_questions(questions_text)
+    if PARALLEL_ANSWERS and questions:
+        on_progress = placeholder.text if placeholder is not None else None
+        return answer_questions_in_parallel(
+            propagate(lambda question: generate_answer_for_question(subject, question, knowledge_base_id, model_arn, context)),
+            questions,
+            on_progress=on_progress
+        ).strip()
+    if questions:
+        output_tokens = expected_answer_tokens(Counter(question.part for question in questions))
+    else:
+        # The paper did not parse into questions, so size the key from the paper itself
+        output_tokens = estimate_tokens(questions_text) * 5
+    return run_generation(
+        query, placeholder, backend=context_backend(context), subject=subject, retrieval_text=questions_text,
+        task="answer_key", output_tokens=output_tokens
+    ).strip()
+
+# Answer a single question; runs on a worker thread, so no Streamlit calls here
+def generate_answer_for_question(subject, question, knowledge_base_id, model_arn, context=None):
+    input_query = {
+        "text": f'''
+You are an expert academician.
+
+Using the uploaded textbook material for "{subject}", write the answer key entry for this exam question.
+
+Question (Part {question.part}, {question.marks} marks):
+{question.text}
+
+Instructions:
+- Keep the answer clear, precise, and concise, sized for {question.marks} marks.
+- Use LaTeX formatting where needed.
+
+Output:
+- ONLY the answer text, without repeating the question or its number.
+'''
+    }
+
+    query = {
+        "input": input_query,
+        "retrieveAndGenerateConfiguration": {
+            "type": "KNOWLEDGE_BASE",
+            "knowledgeBaseConfiguration": {
+                "knowledgeBaseId": knowledge_base_id,
+                "modelArn": model_arn
+            }
+        }
+    }
+    return run_generation(
+        query, backend=context_backend(context), subject=subject, retrieval_text=question.text,
+        task=f"answer_part_{question.part}", output_tokens=ANSWER_TOKENS[question.part]
+    ).strip()
 
 # ---------- Streamlit App ----------
+# PDFs are only rendered once the user asks for one, and rendered bytes are
+# cached, so reruns while the download button is on screen cost nothing.
+def pdf_download(subject, text, label, file_suffix):
+    request_key = f"pdf_requested_{file_suffix}"
+    if st.button(f"Download {label} as PDF", key=f"prepare_{file_suffix}"):
+        st.session_state[request_key] = True
+    if st.session_state.get(request_key):
+        st.download_button(
+            label=f"Download {label} PDF",
+            data=render_pdf_cached(subject, text, title=label),
+            file_name=f"{subject}_{file_suffix}.pdf",
+            mime="application/pdf",
+            key=f"download_{file_suffix}"
+        )
+
+def show_stream_stats():
+    stats = st.session_state.pop("last_stream_stats", None)
+    if stats and stats["time_to_first_token"] is not None:
+        st.caption(
+            f"First token after {stats['time_to_first_token']:.1f}s · "
+            f"{stats['tokens']} tokens at {stats['tokens_per_second']:.0f} tokens/sec"
+        )
+
+def accept_paper(questions, part_counts, subject, selected_units, from_context=False):
+    validation = validate_paper(parse_paper(questions), part_counts)
+    if not validation.ok:
+        st.warning(f"The question paper is incomplete: {validation.summary()}.")
+    set_paper(questions, subject, selected_units, from_context)
+
+# A paper generated from prefetched passages gets its answer key grounded in the
+# same passages; papers from the bank, the cache or another request do not.
+def set_paper(questions, subject, selected_units, from_context=False):
+    st.session_state.paper = questions
+    st.session_state.paper_context = (subject, list(selected_units)) if from_context else None
+
+# This session's prefetched passages for the units, or None when prefetch is off.
+# Waits for retrievals still running, so jobs call it on their worker thread.
+def prefetched_context(contexts, subject, selected_units):
+    return contexts.passages(subject, selected_units) if contexts is not None else None
+
+# Paper job body; records in the job's metadata whether the paper came from prefetched context
+def run_paper_job(progress, contexts, subject, selected_units, part_a, part_b, part_c, bloom_distribution_text):
+    provenance = {}
+    paper = build_exam_questions(
+        subject, selected_units, part_a, part_b, part_c, bloom_distribution_text, placeholder=progress,
+        context=prefetched_context(contexts, subject, selected_units), provenance=provenance
+    )
+    progress.metadata["from_context"] = provenance.get("context", False)
+    return paper
+
+def generate_new_paper(subject, selected_units, part_a, part_b, part_c, bloom_distribution_text):
+    part_counts = {"A": part_a, "B": part_b, "C": part_c}
+    contexts = unit_contexts() if CONTEXT_PREFETCH else None
+    if BACKGROUND_JOBS:
+        submit_job("paper", {"subject": subject, "units": selected_units, "part_counts": part_counts}, propagate(
+            lambda progress: run_paper_job(
+                progress, contexts, subject, selected_units, part_a, part_b, part_c, bloom_distribution_text
+            )
+        ))
+        return
+    with st.spinner("Generating question paper..."):
+        live_output = st.empty()
+        provenance = {}
+        questions = generate_exam_questions(
+            subject, selected_units, part_a, part_b, part_c, bloom_distribution_text, placeholder=live_output,
+            context=prefetched_context(contexts, subject, selected_units), provenance=provenance
+        )
+        live_output.empty()
+        show_stream_stats()
+        if questions:
+            accept_paper(questions, part_counts, subject, selected_units, provenance.get("context", False))
+
+# ---------- Background Jobs ----------
+# Jobs belong to the logged-in user, or to an anonymous ID kept in the URL so
+# that a refreshed page finds its jobs again
+def job_user():
+    username = st.session_state.get("username")
+    if username:
+        return username
+    if "uid" not in st.query_params:
+        st.query_params["uid"] = new_trace_id()[:16]
+    return st.query_params["uid"]
+
+# The session's running job of this kind ("paper" or "answers"), also kept in
+# the URL so a refresh resumes it
+def active_job(kind):
+    key = f"{kind}_job"
+    if key not in st.session_state and key in st.query_params:
+        st.session_state[key] = st.query_params[key]
+    return st.session_state.get(key)
+
+def submit_job(kind, params, fn):
+    job_id = get_job_queue().submit(job_user(), kind, params, fn)
+    st.session_state[f"{kind}_job"] = job_id
+    st.query_params[f"{kind}_job"] = job_id
+
+def clear_job(kind):
+    key = f"{kind}_job"
+    st.session_state.pop(key, None)
+    if key in st.query_params:
+        del st.query_params[key]
+
+# Show the session's job of this kind while it runs. Returns the job once it
+# has finished successfully; a failed job is reported and forgotten.
+def poll_job(kind, label):
+    job_id = active_job(kind)
+    if not job_id:
+        return None
+    job = get_job_queue().get(job_id, job_user())
+    if job is None:
+        clear_job(kind)
+        return None
+    if job["status"] not in FINISHED_STATES:
+        job_progress(job_id, label)
+        return None
+    clear_job(kind)
+    if job["status"] == FAILED:
+        if job["throttled"]:
+            st.warning("The model service is busy right now. Please try again in a minute.")
+        else:
+            st.error(f"Error {label.lower()}: {job['error']}")
+        return None
+    if job["stats"]:
+        st.session_state.last_stream_stats = job["stats"]
+    return job
+
+# A running job's progress, refreshed every JOB_POLL_SECONDS without rerunning
+# the page or holding the script thread; the page reruns once the job finishes
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id, label):
+    job = get_job_queue().get(job_id, job_user())
+    if job is None or job["status"] in FINISHED_STATES:
+        st.rerun()
+    st.info(
+        f"{label}... ({job['status']}, {time.time() - job['created_at']:.0f}s). "
+        "The result is kept if you refresh or change settings meanwhile."
+    )
+    if job["progress"]:
+        st.text(job["progress"])
+
+def recent_jobs():
+    jobs = get_job_queue().list_jobs(job_user())
+    if not jobs:
+        return
+    with st.expander("Recent jobs"):
+        for job in jobs:
+            info_col, open_col = st.columns([5, 1])
+            created = time.strftime("%d %b %H:%M", time.localtime(job["created_at"]))
+            label = "Question paper" if job["kind"] == "paper" else "Answer key"
+            info_col.markdown(f"{label} · {job['params'].get('subject', '')} · {created} · `{job['status']}`")
+            if job["status"] == DONE and open_col.button("Open", key=f"open_job_{job['job_id']}"):
+                if job["kind"] == "paper":
+                    set_paper(job["result"], job["params"]["subject"], job["params"]["units"], job["metadata"].get("from_context", False))
+                else:
+                    st.session_state.answers = job["result"]
+                st.rerun()
+
 def main():
     st.set_page_config(page_title="Question Paper and Answer Key Generator", layout="wide")
+    init_tracing("user")
+    # One trace per browser session; every span started on this rerun joins it
+    if "trace_id" not in st.session_state:
+        st.session_state.trace_id = new_trace_id()
+    set_trace(st.session_state.trace_id)
+    if QUESTION_BANK_ENABLED:
+        # Starts the background warmer, which also picks up newly ingested subjects
+        get_bank_warmer()
 
     st.markdown("""
         <style>
@@ -264,6 +1000,8 @@ def main():
                         st.session_state.units = units
                         st.session_state.units_fetched = True
                         st.success("Units extracted successfully.")
+                        if QUESTION_BANK_ENABLED:
+                            get_bank_warmer().submit(subject, units)
                     else:
                         st.warning("No units found.")
 
@@ -275,6 +1013,9 @@ def main():
                 col1.markdown(f'<div class="unit-box">{unit}</div>', unsafe_allow_html=True)
                 if col2.checkbox("Select", key=f"unit_{i}", label_visibility="collapsed"):
                     selected_units.append(unit)
+            if CONTEXT_PREFETCH and selected_units:
+                # Retrieval for newly ticked units starts now, while the rest of the form is filled in
+                unit_contexts().prefetch(subject, selected_units)
 
             st.subheader("Define Question Structure")
             part_a = st.number_input("Part A (2 marks)", 1, 20, 10)
@@ -282,15 +1023,14 @@ def main():
             part_c = st.number_input("Part C (10 marks)", 0, 10, 2)
 
             st.subheader("Bloom’s Taxonomy Distribution (%)")
-            bloom_levels = ["Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create"]
             bloom_distribution = {}
             total_percentage = 0
 
-            for level in bloom_levels:
+            for level in BLOOM_LEVELS:
                 bloom_distribution[level] = st.number_input(f"{level} (%)", min_value=0, max_value=100, value=0)
                 total_percentage += bloom_distribution[level]
 
-            generate = st.button("Generate Question Paper")
+            generate = st.button("Generate Question Paper", disabled=bool(active_job("paper")))
 
     with right_col:
         st.header("Generated Output")
@@ -302,44 +1042,141 @@ def main():
                 st.error("Bloom's percentages must total 100%.")
             else:
                 bloom_distribution_text = "\n".join([f"{level}: {percentage}%" for level, percentage in bloom_distribution.items()])
-                with st.spinner("Generating question paper..."):
-                    questions = generate_exam_questions(subject, selected_units, part_a, part_b, part_c, bloom_distribution_text)
-                    if questions:
-                        if not questions.strip().startswith("Part A"):
-                            st.warning("Output may not follow standard format.")
-                        st.session_state.paper = questions
+                request = PaperRequest.from_inputs(subject, selected_units, part_a, part_b, part_c, bloom_distribution_text)
+                match = get_paper_cache().lookup(request)
+                st.session_state.paper_offer = None
+                st.session_state.paper_exact = None
+                if match is not None and match.exact and paper_fits(match.paper, request.part_counts):
+                    set_paper(match.paper, subject, selected_units)
+                    st.session_state.paper_exact = (request, selected_units, bloom_distribution_text)
+                elif match is not None:
+                    st.session_state.paper_offer = (request, match, selected_units, bloom_distribution_text)
+                else:
+                    generate_new_paper(subject, selected_units, part_a, part_b, part_c, bloom_distribution_text)
+
+        # An exact repeat of a recent request is served from the cache unless a new paper is asked for
+        exact = st.session_state.get("paper_exact")
+        if exact:
+            request, exact_units, exact_bloom_text = exact
+            info_col, new_col = st.columns([2, 1])
+            info_col.info("Served from cache: the same paper was generated recently.")
+            if new_col.button("Generate a new paper", key="regenerate_exact"):
+                st.session_state.paper_exact = None
+                counts = request.part_counts
+                generate_new_paper(subject, exact_units, counts["A"], counts["B"], counts["C"], exact_bloom_text)
+
+        # A near-duplicate of a recent request: reuse (and top up) its questions or start over
+        offer = st.session_state.get("paper_offer")
+        if offer:
+            request, match, offer_units, offer_bloom_text = offer
+            st.info(f"A similar paper was generated recently ({describe_match(match, request)}).")
+            reuse_col, new_col = st.columns(2)
+            reuse_label = "Reuse and top up cached questions" if any(match.missing.values()) else "Reuse cached questions"
+            if reuse_col.button(reuse_label):
+                contexts = unit_contexts() if CONTEXT_PREFETCH else None
+                if BACKGROUND_JOBS:
+                    st.session_state.paper_offer = None
+                    submit_job("paper", {"subject": subject, "units": offer_units, "part_counts": request.part_counts}, propagate(
+                        lambda progress: build_topped_up_paper(
+                            subject, offer_units, match, request.part_counts, offer_bloom_text, progress,
+                            context=prefetched_context(contexts, subject, offer_units)
+                        )
+                    ))
+                else:
+                    with st.spinner("Topping up question paper..."):
+                        live_output = st.empty()
+                        questions = top_up_paper(
+                            subject, offer_units, match, request.part_counts, offer_bloom_text, placeholder=live_output,
+                            context=prefetched_context(contexts, subject, offer_units)
+                        )
+                        live_output.empty()
+                        if questions:
+                            set_paper(questions, subject, offer_units)
+                            st.session_state.paper_offer = None
+            elif new_col.button("Generate a new paper"):
+                st.session_state.paper_offer = None
+                counts = request.part_counts
+                generate_new_paper(subject, offer_units, counts["A"], counts["B"], counts["C"], offer_bloom_text)
+
+        paper_job = poll_job("paper", "Generating question paper")
+        if paper_job is not None:
+            show_stream_stats()
+            if paper_job["result"]:
+                params = paper_job["params"]
+                accept_paper(
+                    paper_job["result"], params["part_counts"], params["subject"], params["units"],
+                    paper_job["metadata"].get("from_context", False)
+                )
 
         if st.session_state.paper:
             st.subheader("Question Paper")
             st.text_area("Question Paper", st.session_state.paper, height=400, max_chars=3000)
 
-            if st.button("Download Question Paper as PDF"):
-                st.download_button(
-                    label="Download PDF",
-                    data=convert_text_to_pdf(subject, st.session_state.paper),
-                    file_name=f"{subject}_Question_Paper.pdf",
-                    mime="application/pdf"
-                )
+            pdf_download(subject, st.session_state.paper, "Question Paper", "Question_Paper")
 
         if st.session_state.paper:
-            if st.button("Generate Answer Key"):
-                with st.spinner("Generating answers..."):
-                    answers = generate_answers_for_questions(subject, st.session_state.paper, knowledge_base_id, model_arn)
-                    st.session_state.answers = answers
+            if st.button("Generate Answer Key", disabled=bool(active_job("answers"))):
+                paper_context = st.session_state.get("paper_context")
+                contexts = unit_contexts() if CONTEXT_PREFETCH and paper_context else None
+                if BACKGROUND_JOBS:
+                    paper = st.session_state.paper
+                    submit_job("answers", {"subject": subject}, propagate(
+                        lambda progress: build_answer_key(
+                            subject, paper, knowledge_base_id, model_arn, placeholder=progress,
+                            context=prefetched_context(contexts, *paper_context) if contexts else None
+                        )
+                    ))
+                else:
+                    with st.spinner("Generating answers..."):
+                        live_output = st.empty()
+                        answers = generate_answers_for_questions(
+                            subject, st.session_state.paper, knowledge_base_id, model_arn, placeholder=live_output,
+                            context=prefetched_context(contexts, *paper_context) if contexts else None
+                        )
+                        live_output.empty()
+                        show_stream_stats()
+                        st.session_state.answers = answers
+
+        answers_job = poll_job("answers", "Generating answers")
+        if answers_job is not None:
+            show_stream_stats()
+            st.session_state.answers = answers_job["result"]
 
         if st.session_state.answers:
             st.subheader("Answer Key")
             st.text_area("Answer Key", st.session_state.answers, height=400)
 
-            st.download_button(
-                label="Download Answer Key PDF",
-                data=convert_text_to_pdf(subject, st.session_state.answers),
-                file_name=f"{subject}_Answer_Key.pdf",
-                mime="application/pdf"
-            )
+            pdf_download(subject, st.session_state.answers, "Answer Key", "Answer_Key")
+
+        if BACKGROUND_JOBS:
+            recent_jobs()
 
     st.markdown("---")
     st.markdown("Make sure you have valid AWS credentials configured.")
 
+    if SHOW_DIAGNOSTICS:
+        with st.sidebar.expander("AWS connection pool"):
+            st.json(pool_stats())
+        with st.sidebar.expander("Model rate limiters"):
+            st.json(get_model_limiters().snapshot())
+        with st.sidebar.expander("Model routing"):
+            st.json(get_model_router().snapshot())
+        with st.sidebar.expander("Question paper cache"):
+            st.json(get_paper_cache().stats())
+        with st.sidebar.expander("Question bank"):
+            st.json(get_question_bank().stats())
+        if BACKGROUND_JOBS:
+            with st.sidebar.expander("Generation jobs"):
+                st.json(get_job_queue().store.stats())
+        if CONTEXT_PREFETCH:
+            with st.sidebar.expander("Prefetched unit context"):
+                st.json(unit_contexts().stats())
+        if SINGLE_FLIGHT:
+            with st.sidebar.expander("Coalesced requests"):
+                st.json(get_single_flight().stats())
+        with st.sidebar.expander("Latency spans"):
+            st.caption(f"Trace ID: {current_trace()}")
+            st.json(trace_stats())
+
 if __name__ == "__main__":
     main()
@@ -1,37 +1,20 @@
 import streamlit as st
-import json
-import os
+from auth_service import BUSY, AuthService, plain_matches
+from user_store import SqliteUserStore, migrate_json
 
 CREDENTIALS_FILE = "credentials.json"
 
-# Load users from file
-def load_users():
-    if not os.path.exists(CREDENTIALS_FILE):
-        # Create empty file if it doesn't exist
-        with open(CREDENTIALS_FILE, "w") as f:
-            json.dump({}, f)
-        return {}
+# Users live in SQLite; the first start imports any existing credentials.json
+@st.cache_resource
+def get_user_store():
+    store = SqliteUserStore()
+    if store.count() == 0:
+        migrate_json(CREDENTIALS_FILE, store)
+    return store
 
-    try:
-        with open(CREDENTIALS_FILE, "r") as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            return json.loads(content)
-    except json.JSONDecodeError:
-        # Corrupt or invalid JSON – reset to empty
-        with open(CREDENTIALS_FILE, "w") as f:
-            json.dump({}, f)
-        return {}
-
-# Save users to file
-def save_users(users):
-    with open(CREDENTIALS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
-
-# Initialize users in session state from file
-if "users" not in st.session_state:
-    st.session_state.users = load_users()
+@st.cache_resource
+def get_auth_service():
+    return AuthService(get_user_store().get, matches=plain_matches)
 
 def register():
     st.subheader("👤 Register")
@@ -45,11 +28,10 @@ def register():
             st.warning("⚠️ Please fill all fields.")
         elif password != confirm_password:
             st.error("❌ Passwords do not match.")
-        elif username in st.session_state.users:
+        elif not get_user_store().create({"username": username, "password": password, "role": role}):
             st.error("❌ Username already exists.")
         else:
-            st.session_state.users[username] = {"password": password, "role": role}
-            save_users(st.session_state.users)
+            get_auth_service().invalidate(username)
             st.success("✅ Registered successfully. Please login.")
 
 def login():
@@ -58,9 +40,10 @@ def login():
     password = st.text_input("Password", type="password", key="login_password")
 
     if st.button("Login", key="login_button"):
-        users = load_users()
-        user = users.get(username)
-        if user and user["password"] == password:
+        user = get_auth_service().authenticate(username, password)
+        if user == BUSY:
+            st.warning("⏳ Too many logins right now. Please try again in a moment.")
+        elif user:
             st.session_state.logged_in = True
             st.session_state.username = username
             st.session_state.role = user["role"]
@@ -0,0 +1,185 @@
+# Headless bulk question-paper generation.
+#
+#   python batch_runner.py manifest.csv --out papers/ --jobs 4 --rpm 60
+#
+# The manifest is CSV or JSON (a list of objects) with one job per row:
+#   subject   - subject name as ingested by the Admin app (required)
+#   units     - units to cover, separated by ";" (JSON: a list); empty means all extracted units
+#   part_a, part_b, part_c - question counts (defaults 10, 5, 2)
+#   bloom     - e.g. "Remember:20;Understand:30;Apply:30;Analyze:20" (default 20/20/20/20/10/10)
+#   answers   - "false" to skip the answer key (default true)
+#   id        - optional job id; defaults to a hash of the row
+#
+# Finished jobs are appended to a checkpoint file, so re-running the same
+# command after an interruption only runs what is left.
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import app
+from paper_cache import PaperRequest
+from paper_format import BLOOM_LEVELS
+from pdf_render import render_pdf
+from rate_limiter import BATCH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOOM = "Remember:20;Understand:20;Apply:20;Analyze:20;Evaluate:10;Create:10"
+
+# ---------- Manifest ----------
+def load_manifest(path):
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+        else:
+            rows = list(csv.DictReader(f))
+    return [normalize_job(row) for row in rows]
+
+def normalize_job(row):
+    units = row.get("units") or []
+    if isinstance(units, str):
+        units = [u.strip() for u in units.split(";") if u.strip()]
+    bloom = row.get("bloom") or DEFAULT_BLOOM
+    if isinstance(bloom, str):
+        bloom = {k.strip(): int(v) for k, v in (item.split(":") for item in bloom.split(";") if item.strip())}
+    job = {
+        "subject": row["subject"].strip(),
+        "units": units,
+        "part_a": int(row.get("part_a") or 10),
+        "part_b": int(row.get("part_b") or 5),
+        "part_c": int(row.get("part_c") or 2),
+        "bloom": {level: int(bloom.get(level, 0)) for level in BLOOM_LEVELS},
+        "answers": str(row.get("answers", "true")).strip().lower() not in ("0", "false", "no"),
+    }
+    if sum(job["bloom"].values()) != 100:
+        raise ValueError(f"Bloom's percentages for {job['subject']} must total 100%.")
+    job["id"] = str(row.get("id") or hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()[:12])
+    return job
+
+# ---------- Checkpoint ----------
+def load_checkpoint(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("status") == "ok":
+                        done[record["id"]] = record
+    return done
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, result):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+# ---------- Jobs ----------
+# The app's raising build_* functions are used, so a failed step fails the job
+# with its error instead of returning an empty result
+def write_pdf(out_dir, job, text, label, suffix):
+    safe_subject = re.sub(r"[^a-zA-Z0-9_-]", "_", job["subject"])
+    path = os.path.join(out_dir, f"{job['id']}_{safe_subject}_{suffix}.pdf")
+    with open(path, "wb") as f:
+        f.write(render_pdf(text, title=f"{job['subject']} - {label}"))
+    return path
+
+def run_job(job, out_dir):
+    started = time.perf_counter()
+    units = job["units"] or app.fetch_units(job["subject"])
+    if not units:
+        raise RuntimeError("No units found")
+
+    bloom_text = "\n".join(f"{level}: {pct}%" for level, pct in job["bloom"].items())
+    request = PaperRequest.from_inputs(job["subject"], units, job["part_a"], job["part_b"], job["part_c"], bloom_text)
+    paper = app.cached_paper(request)
+    if not paper:
+        paper = app.build_exam_questions(job["subject"], units, job["part_a"], job["part_b"], job["part_c"], bloom_text)
+    if not paper:
+        raise RuntimeError("Question paper generation failed")
+    result = {"paper_pdf": write_pdf(out_dir, job, paper, "Question Paper", "Question_Paper")}
+
+    if job["answers"]:
+        answers = app.build_answer_key(job["subject"], paper, app.knowledge_base_id, app.model_arn)
+        if not answers:
+            raise RuntimeError("Answer key generation failed")
+        result["answers_pdf"] = write_pdf(out_dir, job, answers, "Answer Key", "Answer_Key")
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+def run_batch(jobs, out_dir, max_jobs=4, per_minute=60, checkpoint_path=None):
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint_path = checkpoint_path or os.path.join(out_dir, "checkpoint.jsonl")
+    done = load_checkpoint(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+    pending = [job for job in jobs if job["id"] not in done]
+    # The app's per-model limiters, at batch priority so interactive sessions in
+    # the same process go first
+    if per_minute > 0:
+        rate = per_minute / 60.0
+        app.get_model_limiters().configure(rate, max(1, int(rate)))
+    app.call_priority = BATCH
+
+    print(f"{len(jobs)} job(s): {len(done)} already done, {len(pending)} to run")
+    started = time.perf_counter()
+    usage_before = dict(app.generation_usage)
+    papers = failures = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as executor:
+        futures = {executor.submit(run_job, job, out_dir): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = dict(future.result(), id=job["id"], subject=job["subject"], status="ok")
+                papers += 1
+                print(f"[ok]     {job['id']} {job['subject']} ({result['seconds']:.1f}s)")
+            except Exception as e:
+                result = {"id": job["id"], "subject": job["subject"], "status": "failed", "error": str(e)}
+                failures += 1
+                print(f"[failed] {job['id']} {job['subject']}: {e}")
+            checkpoint.record(result)
+
+    elapsed = time.perf_counter() - started
+    usage = {k: app.generation_usage[k] - usage_before.get(k, 0) for k in app.generation_usage}
+    summary = {
+        "papers": papers,
+        "failures": failures,
+        "seconds": elapsed,
+        "papers_per_minute": papers / (elapsed / 60) if elapsed > 0 else 0.0,
+        "model_calls": usage["calls"],
+        "estimated_prompt_tokens": usage["prompt_tokens"],
+        "estimated_output_tokens": usage["output_tokens"],
+    }
+    print(
+        f"Done: {papers} paper(s), {failures} failure(s) in {elapsed:.0f}s "
+        f"({summary['papers_per_minute']:.2f} papers/min, {usage['calls']} model calls, "
+        f"~{usage['prompt_tokens']} prompt / ~{usage['output_tokens']} output tokens)"
+    )
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate question papers and answer keys in bulk")
+    parser.add_argument("manifest", help="CSV or JSON job manifest")
+    parser.add_argument("--out", default="papers", help="output directory for PDFs and the checkpoint")
+    parser.add_argument("--jobs", type=int, default=4, help="jobs to run concurrently")
+    parser.add_argument("--rpm", type=int, default=60, help="maximum model calls per minute to each model, across all jobs")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <out>/checkpoint.jsonl)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    summary = run_batch(load_manifest(args.manifest), args.out, args.jobs, args.rpm, args.checkpoint)
+    raise SystemExit(1 if summary["failures"] else 0)
+
+if __name__ == "__main__":
+    main()
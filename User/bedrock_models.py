@@ -0,0 +1,40 @@
+import json
+
+# ---------- Direct Model Invocation ----------
+# Used when retrieval happens outside the managed knowledge base, so only the
+# generation step goes to Bedrock.
+DEFAULT_MAX_TOKENS = 4096
+
+def build_claude_body(prompt, max_tokens=DEFAULT_MAX_TOKENS, temperature=0.2):
+    return json.dumps({
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": [{"role": "user", "content": [{"type": "text", "text": prompt}]}],
+    })
+
+# Returns the generated text and the usage block ({"input_tokens", "output_tokens"})
+def invoke_claude(client, model_arn, prompt, max_tokens=DEFAULT_MAX_TOKENS):
+    response = client.invoke_model(modelId=model_arn, body=build_claude_body(prompt, max_tokens))
+    payload = json.loads(response["body"].read())
+    text = "".join(block.get("text", "") for block in payload.get("content", []) if block.get("type") == "text")
+    return text, payload.get("usage", {})
+
+def stream_claude(client, model_arn, prompt, max_tokens=DEFAULT_MAX_TOKENS):
+    response = client.invoke_model_with_response_stream(modelId=model_arn, body=build_claude_body(prompt, max_tokens))
+    for event in response["body"]:
+        chunk = json.loads(event["chunk"]["bytes"])
+        if chunk.get("type") == "content_block_delta":
+            text = chunk.get("delta", {}).get("text")
+            if text:
+                yield text
+
+# Prepend retrieved passages to a prompt, numbered so answers can cite them
+def prompt_with_context(prompt, passages):
+    if not passages:
+        return prompt
+    context = "\n\n".join(f"[{i}] {p['text']}" for i, p in enumerate(passages, start=1))
+    return (
+        "Use the following passages from the uploaded textbook material as your only source.\n\n"
+        f"<passages>\n{context}\n</passages>\n\n{prompt}"
+    )
@@ -0,0 +1,75 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+# ---------- Context Prefetch Configuration ----------
+# Retrieve each selected unit's passages once, as soon as it is ticked, and
+# generate questions and answers from them with direct model calls instead of
+# retrieve_and_generate
+CONTEXT_PREFETCH = os.getenv("CONTEXT_PREFETCH", "false").lower() in ("1", "true", "yes")
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "5"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# Longest a generation waits for its units' retrievals, all together, before falling back
+PREFETCH_TIMEOUT_SECONDS = float(os.getenv("PREFETCH_TIMEOUT_SECONDS", "30"))
+
+def make_prefetch_executor(workers=PREFETCH_WORKERS):
+    return ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="context-prefetch")
+
+# Retrieved passages per (subject, unit), one per session. retrieve(subject, unit)
+# returns [{"text", "source", "page", "score"}, ...] and runs on the executor.
+class UnitContextCache:
+    def __init__(self, retrieve, executor, timeout=PREFETCH_TIMEOUT_SECONDS):
+        self.retrieve = retrieve
+        self.executor = executor
+        self.timeout = timeout
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    # Start retrieval for units not fetched yet; returns immediately
+    def prefetch(self, subject, units):
+        with self._lock:
+            for unit in units:
+                if (subject, unit) not in self._futures:
+                    self._futures[(subject, unit)] = self.executor.submit(self.retrieve, subject, unit)
+
+    # The passages for a selection of units, grouped by unit in selection order,
+    # best first, each passage once. None if any unit's retrieval failed, so the
+    # caller falls back to retrieve_and_generate; the unit is retried next time.
+    # All units share one deadline of `timeout` seconds.
+    def passages(self, subject, units):
+        self.prefetch(subject, units)
+        with self._lock:
+            futures = [(unit, self._futures[(subject, unit)]) for unit in units]
+        deadline = time.monotonic() + self.timeout
+        merged, seen = [], set()
+        for unit, future in futures:
+            try:
+                results = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                logger.warning("Context retrieval for %s / %s is still running; not using prefetched context", subject, unit)
+                return None
+            except Exception:
+                logger.exception("Context retrieval failed for %s / %s", subject, unit)
+                with self._lock:
+                    if self._futures.get((subject, unit)) is future:
+                        del self._futures[(subject, unit)]
+                return None
+            for passage in sorted(results, key=lambda p: p.get("score", 0.0), reverse=True):
+                if passage["text"] not in seen:
+                    seen.add(passage["text"])
+                    merged.append(dict(passage, unit=unit))
+        return merged
+
+    def stats(self):
+        with self._lock:
+            futures = list(self._futures.values())
+        done = [future for future in futures if future.done()]
+        return {
+            "units": len(futures),
+            "pending": len(futures) - len(done),
+            "passages": sum(len(future.result()) for future in done if future.exception() is None),
+        }
@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limiter import is_throttling
+
+logger = logging.getLogger(__name__)
+
+# ---------- Job Queue Configuration ----------
+# Run paper and answer generation on a worker pool instead of the Streamlit script thread
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "true").lower() in ("1", "true", "yes")
+# May be shared by several server processes
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "/tmp/au_ai_jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+# How often the page refreshes a running job's progress
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# A process renews its unfinished jobs' heartbeat every JOB_LEASE_SECONDS / 4;
+# unfinished jobs whose heartbeat is older than the lease are marked failed
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+# Progress text is written to the store at most this often
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    stats TEXT,
+    error TEXT,
+    throttled INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    heartbeat REAL,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user, created_at);
+"""
+
+COLUMNS = ("job_id", "user", "kind", "params", "status", "progress", "result", "stats", "error", "throttled",
+           "created_at", "started_at", "finished_at", "metadata")
+
+def _row_to_job(row):
+    job = dict(zip(COLUMNS, row))
+    job["params"] = json.loads(job["params"])
+    job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+    job["metadata"] = json.loads(job["metadata"]) if job["metadata"] else {}
+    job["throttled"] = bool(job["throttled"])
+    return job
+
+# Jobs and their results, keyed by user and job ID, so results outlive the session.
+# Each store owns the jobs it creates and keeps them leased with heartbeat();
+# expire() fails unfinished jobs, of any process, whose lease has run out.
+class JobStore:
+    def __init__(self, path=JOB_DB_PATH, retention_seconds=JOB_RETENTION_SECONDS, lease_seconds=JOB_LEASE_SECONDS):
+        self.retention_seconds = retention_seconds
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{os.urandom(4).hex()}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.expire()
+        if retention_seconds > 0:
+            with self._conn:
+                self._conn.execute("DELETE FROM jobs WHERE created_at < ?", (time.time() - retention_seconds,))
+
+    def create(self, user, kind, params):
+        job_id = os.urandom(8).hex()
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, user, kind, params, status, created_at, owner, heartbeat) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user, kind, json.dumps(params), QUEUED, now, self.owner, now)
+            )
+        return job_id
+
+    def heartbeat(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+                (time.time(), self.owner, QUEUED, RUNNING)
+            )
+
+    # Their worker threads died with the process that owned them. Returns the
+    # number of jobs marked failed.
+    def expire(self):
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = 'Interrupted: the server process running it stopped', "
+                "finished_at = ? WHERE status IN (?, ?) AND COALESCE(heartbeat, created_at) < ?",
+                (FAILED, now, QUEUED, RUNNING, now - self.lease_seconds)
+            )
+        return cursor.rowcount
+
+    def start(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE job_id = ?", (RUNNING, time.time(), job_id))
+
+    def progress(self, job_id, text):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET progress = ? WHERE job_id = ?", (text, job_id))
+
+    def finish(self, job_id, result, stats=None, metadata=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, stats = ?, metadata = ?, finished_at = ? WHERE job_id = ?",
+                (DONE, result, json.dumps(stats) if stats else None, json.dumps(metadata) if metadata else None,
+                 time.time(), job_id)
+            )
+
+    def fail(self, job_id, error, throttled=False):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, throttled = ?, finished_at = ? WHERE job_id = ?",
+                (FAILED, error, int(throttled), time.time(), job_id)
+            )
+
+    # None unless the job exists and belongs to user
+    def get(self, job_id, user):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE job_id = ? AND user = ?", (job_id, user)
+            ).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list_jobs(self, user, limit=10):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE user = ? ORDER BY created_at DESC LIMIT ?", (user, limit)
+            ).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            seconds = self._conn.execute(
+                "SELECT AVG(started_at - created_at), AVG(finished_at - started_at) FROM jobs WHERE status = ?", (DONE,)
+            ).fetchone()
+        return {
+            **{status: count for status, count in rows},
+            "mean_queue_seconds": seconds[0] or 0.0,
+            "mean_run_seconds": seconds[1] or 0.0,
+        }
+
+# Stands in for a Streamlit placeholder on the worker thread: streamed text and
+# progress messages become the job's progress, written at most every interval.
+# The job may add facts about its result to metadata, stored with the result.
+class JobProgress:
+    def __init__(self, store, job_id, interval=PROGRESS_INTERVAL_SECONDS):
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self.stats = None
+        self.metadata = {}
+        self._last_write = 0.0
+
+    def text(self, value):
+        now = time.monotonic()
+        if now - self._last_write >= self.interval:
+            self._last_write = now
+            self.store.progress(self.job_id, str(value))
+
+    def record_stats(self, stats):
+        self.stats = stats
+
+# Runs fn(progress) for each submitted job on a shared worker pool. The result
+# (a string) or the error is written to the store, which sessions poll. A
+# background thread keeps this process's jobs leased and expires abandoned ones.
+class JobQueue:
+    def __init__(self, store, workers=JOB_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="generation-job")
+        self._lease_thread = threading.Thread(target=self._renew_leases, name="generation-job-lease", daemon=True)
+        self._lease_thread.start()
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self.store.lease_seconds / 4)
+            try:
+                self.store.heartbeat()
+                self.store.expire()
+            except Exception:
+                logger.exception("Renewing job leases failed")
+
+    def submit(self, user, kind, params, fn):
+        job_id = self.store.create(user, kind, params)
+        self._executor.submit(self._run, job_id, kind, fn)
+        return job_id
+
+    def _run(self, job_id, kind, fn):
+        progress = JobProgress(self.store, job_id)
+        self.store.start(job_id)
+        try:
+            result = fn(progress)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            self.store.fail(job_id, str(e), throttled=is_throttling(e))
+        else:
+            self.store.finish(job_id, result or "", progress.stats, progress.metadata)
+
+    def get(self, job_id, user):
+        return self.store.get(job_id, user)
+
+    def list_jobs(self, user, limit=10):
+        return self.store.list_jobs(user, limit)
@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------- Routing Configuration ----------
+ROUTING_ENABLED = os.getenv("MODEL_ROUTING", "true").lower() in ("1", "true", "yes")
+LATENCY_SLO_SECONDS = float(os.getenv("LATENCY_SLO_SECONDS", "30"))
+# How long a throttle or SLO miss keeps a model out of rotation
+PENALTY_SECONDS = float(os.getenv("ROUTING_PENALTY_SECONDS", "60"))
+EWMA_WEIGHT = 0.3
+
+# Rough output sizes in tokens, used to estimate how long a generation will take
+QUESTION_TOKENS = {"A": 40, "B": 80, "C": 120}
+ANSWER_TOKENS = {"A": 150, "B": 450, "C": 800}
+UNIT_LIST_TOKENS = 400
+
+def expected_question_tokens(part_counts):
+    return sum(QUESTION_TOKENS[part] * int(count) for part, count in part_counts.items())
+
+def expected_answer_tokens(part_counts):
+    return sum(ANSWER_TOKENS[part] * int(count) for part, count in part_counts.items())
+
+# Latency model for one model: time to first token plus output at a steady rate.
+# Starts from the priors and follows observed calls with an EWMA.
+class ModelProfile:
+    def __init__(self, name, arn, first_token_seconds, tokens_per_second, prompt_tokens_per_second=2000.0):
+        self.name = name
+        self.arn = arn
+        self.first_token_seconds = first_token_seconds
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.penalised_until = 0.0
+        self.calls = 0
+
+    def estimate_seconds(self, prompt_tokens, output_tokens):
+        return (self.first_token_seconds
+                + prompt_tokens / self.prompt_tokens_per_second
+                + output_tokens / self.tokens_per_second)
+
+class RoutingDecision:
+    def __init__(self, task, model, fallback, estimate_seconds, reason):
+        self.task = task
+        self.model = model
+        self.fallback = fallback
+        self.estimate_seconds = estimate_seconds
+        self.reason = reason
+
+# Picks a model per call. The preferred (usually higher-quality) model is used
+# when its estimated latency fits the SLO and it has not recently been throttled
+# or slow; otherwise the fastest healthy model is used. profiles are ordered
+# fastest first.
+class ModelRouter:
+    def __init__(self, profiles, latency_slo=LATENCY_SLO_SECONDS, penalty_seconds=PENALTY_SECONDS):
+        self.profiles = {p.arn: p for p in profiles}
+        self.fastest_first = list(profiles)
+        self.latency_slo = latency_slo
+        self.penalty_seconds = penalty_seconds
+        self._lock = threading.Lock()
+
+    def choose(self, task, preferred_arn, prompt_tokens, output_tokens):
+        now = time.monotonic()
+        with self._lock:
+            preferred = self.profiles.get(preferred_arn)
+            if preferred is None:
+                return RoutingDecision(task, preferred_arn, None, None, "unknown model, not routed")
+
+            estimate = preferred.estimate_seconds(prompt_tokens, output_tokens)
+            healthy = [p for p in self.fastest_first if p.penalised_until <= now]
+            if preferred.penalised_until > now:
+                reason = "preferred model recently throttled or slow"
+            elif estimate > self.latency_slo:
+                reason = f"estimated {estimate:.1f}s exceeds {self.latency_slo:.0f}s SLO"
+            else:
+                fallback = next((p.arn for p in healthy if p.arn != preferred.arn), None)
+                return RoutingDecision(task, preferred.arn, fallback, estimate, "within SLO")
+
+            chosen = healthy[0] if healthy else self.fastest_first[0]
+            fallback = preferred.arn if chosen.arn != preferred.arn else None
+            return RoutingDecision(task, chosen.arn, fallback, chosen.estimate_seconds(prompt_tokens, output_tokens), reason)
+
+    def record(self, arn, seconds, prompt_tokens, output_tokens, throttled=False):
+        with self._lock:
+            profile = self.profiles.get(arn)
+            if profile is None:
+                return
+            profile.calls += 1
+            if throttled:
+                profile.penalised_until = time.monotonic() + self.penalty_seconds
+                return
+            generation_seconds = seconds - profile.first_token_seconds - prompt_tokens / profile.prompt_tokens_per_second
+            if output_tokens > 0 and generation_seconds > 0:
+                observed_rate = output_tokens / generation_seconds
+                profile.tokens_per_second += EWMA_WEIGHT * (observed_rate - profile.tokens_per_second)
+            if seconds > self.latency_slo:
+                profile.penalised_until = time.monotonic() + self.penalty_seconds
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                p.name: {
+                    "calls": p.calls,
+                    "tokens_per_second": round(p.tokens_per_second, 1),
+                    "penalised_for_seconds": round(max(0.0, p.penalised_until - now), 1),
+                }
+                for p in self.fastest_first
+            }
+
+def log_decision(decision, seconds=None):
+    logger.info(
+        "route task=%s model=%s estimate=%s observed=%s reason=%s",
+        decision.task, decision.model.rsplit("/", 1)[-1],
+        f"{decision.estimate_seconds:.1f}s" if decision.estimate_seconds is not None else "n/a",
+        f"{seconds:.1f}s" if seconds is not None else "n/a",
+        decision.reason
+    )
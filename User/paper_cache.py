@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from paper_format import PART_ORDER, parse_bloom_distribution, parse_paper
+from response_cache import CACHE_DB_PATH, normalize_subject
+from structured_output import validate_paper
+
+# ---------- Paper Cache Configuration ----------
+# Lives in the response cache file, so ingestions recorded there invalidate papers too
+PAPER_CACHE_TTL_SECONDS = int(os.getenv("PAPER_CACHE_TTL_SECONDS", str(24 * 3600)))
+PAPER_CACHE_MAX_BYTES = int(os.getenv("PAPER_CACHE_MAX_MB", "64")) * 1024 * 1024
+# Largest total difference in Bloom's percentage points that still counts as a near hit
+PAPER_CACHE_BLOOM_TOLERANCE = int(os.getenv("PAPER_CACHE_BLOOM_TOLERANCE", "20"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    cache_key TEXT PRIMARY KEY,
+    group_key TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    part_counts TEXT NOT NULL,
+    bloom TEXT NOT NULL,
+    paper TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_papers_group ON papers(group_key);
+CREATE INDEX IF NOT EXISTS idx_papers_last_access ON papers(last_access);
+CREATE TABLE IF NOT EXISTS ingestions (
+    subject TEXT PRIMARY KEY,
+    completed_at REAL NOT NULL
+);
+"""
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+# The parameters of a question paper request in canonical form: unit order,
+# whitespace and subject case do not change the key.
+class PaperRequest:
+    def __init__(self, subject, units, part_counts, bloom):
+        self.subject = normalize_subject(subject)
+        self.units = sorted({" ".join(unit.split()) for unit in units})
+        self.part_counts = {part: int(part_counts.get(part, 0)) for part in PART_ORDER}
+        self.bloom = list(bloom)
+
+    @classmethod
+    def from_inputs(cls, subject, units, part_a_count, part_b_count, part_c_count, bloom_distribution_text):
+        part_counts = {"A": part_a_count, "B": part_b_count, "C": part_c_count}
+        return cls(subject, units, part_counts, parse_bloom_distribution(bloom_distribution_text))
+
+    # Requests for the same subject and units are near-hit candidates for each other
+    @property
+    def group_key(self):
+        return _digest([self.subject, self.units])
+
+    @property
+    def cache_key(self):
+        return _digest([self.subject, self.units, self.part_counts, self.bloom])
+
+class PaperMatch:
+    def __init__(self, paper, part_counts, bloom, bloom_distance, missing, exact=False):
+        self.paper = paper
+        self.part_counts = part_counts
+        self.bloom = bloom
+        self.bloom_distance = bloom_distance
+        # Questions per part the cached paper is short of the request
+        self.missing = missing
+        self.exact = exact
+
+# Trim a cached paper to the requested counts. Returns the kept questions per
+# part and how many more each part still needs.
+def reuse_paper(paper, part_counts):
+    parsed = parse_paper(paper)
+    parts, missing = {}, {}
+    for part in PART_ORDER:
+        wanted = int(part_counts.get(part, 0))
+        parts[part] = parsed.get(part, [])[:wanted]
+        missing[part] = wanted - len(parts[part])
+    return parts, missing
+
+# Whether a paper has exactly the requested number of questions in every part
+def paper_fits(paper, part_counts):
+    return validate_paper(parse_paper(paper), part_counts).ok
+
+class PaperCache:
+    def __init__(self, path=CACHE_DB_PATH, ttl_seconds=PAPER_CACHE_TTL_SECONDS,
+                 max_bytes=PAPER_CACHE_MAX_BYTES, bloom_tolerance=PAPER_CACHE_BLOOM_TOLERANCE):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.bloom_tolerance = bloom_tolerance
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.metrics = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0, "reused": 0, "topped_up": 0}
+
+    # Exact match first, otherwise the closest fresh paper for the same subject
+    # and units within the Bloom's tolerance, preferring fewer missing questions.
+    def lookup(self, request):
+        now = time.time()
+        oldest = now - self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        with self._lock:
+            self.metrics["lookups"] += 1
+            rows = self._conn.execute(
+                "SELECT p.cache_key, p.part_counts, p.bloom, p.paper FROM papers p "
+                "LEFT JOIN ingestions i ON i.subject = p.subject "
+                "WHERE p.group_key = ? AND p.created_at >= ? "
+                "AND (i.completed_at IS NULL OR i.completed_at < p.created_at)",
+                (request.group_key, oldest)
+            ).fetchall()
+
+            best_key, best = None, None
+            for cache_key, part_counts, bloom, paper in rows:
+                part_counts, bloom = json.loads(part_counts), json.loads(bloom)
+                distance = sum(abs(a - b) for a, b in zip(bloom, request.bloom))
+                if distance > self.bloom_tolerance:
+                    continue
+                missing = {
+                    part: max(0, request.part_counts[part] - part_counts.get(part, 0)) for part in PART_ORDER
+                }
+                match = PaperMatch(paper, part_counts, bloom, distance, missing, exact=cache_key == request.cache_key)
+                rank = (sum(missing.values()), distance)
+                if match.exact or best is None or rank < (sum(best.missing.values()), best.bloom_distance):
+                    best_key, best = cache_key, match
+                if match.exact:
+                    break
+
+            if best is None:
+                self.metrics["misses"] += 1
+                return None
+            self.metrics["exact_hits" if best.exact else "near_hits"] += 1
+            with self._conn:
+                self._conn.execute("UPDATE papers SET last_access = ? WHERE cache_key = ?", (now, best_key))
+            return best
+
+    # Only papers that match the request's part counts are stored, since an exact
+    # hit is served as is. Returns whether the paper was stored.
+    def set(self, request, paper):
+        if not paper_fits(paper, request.part_counts):
+            return False
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO papers "
+                "(cache_key, group_key, subject, part_counts, bloom, paper, size_bytes, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (request.cache_key, request.group_key, request.subject, json.dumps(request.part_counts),
+                 json.dumps(request.bloom), paper, len(paper.encode("utf-8")), now, now)
+            )
+            self._evict(now)
+        return True
+
+    def _evict(self, now):
+        if self.ttl_seconds > 0:
+            self._conn.execute("DELETE FROM papers WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_bytes > 0:
+            # Keep the most recently used papers that fit in the byte budget
+            self._conn.execute(
+                "DELETE FROM papers WHERE cache_key IN ("
+                "SELECT cache_key FROM (SELECT cache_key, SUM(size_bytes) OVER (ORDER BY last_access DESC) AS used "
+                "FROM papers) WHERE used > ?)",
+                (self.max_bytes,)
+            )
+
+    # Count what the user did with a near hit
+    def record_reuse(self, topped_up):
+        with self._lock:
+            self.metrics["topped_up" if topped_up else "reused"] += 1
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM papers").fetchone()
+            metrics = dict(self.metrics)
+        lookups = metrics["lookups"]
+        metrics.update(
+            entries=entries,
+            bytes=size,
+            exact_hit_rate=metrics["exact_hits"] / lookups if lookups else 0.0,
+            hit_rate=(metrics["exact_hits"] + metrics["near_hits"]) / lookups if lookups else 0.0,
+        )
+        return metrics
+
+def describe_match(match, request):
+    changes = []
+    for part in PART_ORDER:
+        cached, wanted = match.part_counts.get(part, 0), request.part_counts[part]
+        if cached != wanted:
+            changes.append(f"Part {part}: {cached} cached, {wanted} requested")
+    if match.bloom_distance:
+        changes.append(f"Bloom's distribution differs by {match.bloom_distance} points")
+    return "; ".join(changes)
@@ -0,0 +1,65 @@
+import re
+
+# ---------- Question Paper Layout ----------
+PART_MARKS = {"A": 2, "B": 6, "C": 10}
+PART_ORDER = ["A", "B", "C"]
+BLOOM_LEVELS = ["Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create"]
+
+PART_HEADER_RE = re.compile(r"^[\s*#]*Part\s+([ABC])\b", re.IGNORECASE)
+QUESTION_RE = re.compile(r"^\s*(\d+)[.)]\s+(.*\S)\s*$")
+BLOOM_LINE_RE = re.compile(r"^\s*(\w+)\s*:\s*(\d+)\s*%?\s*$")
+
+def part_header(part):
+    return f"Part {part} ({PART_MARKS[part]} marks each)"
+
+# Split generated text into numbered questions. Unnumbered lines are kept as
+# continuations of the question above them (sub-parts, LaTeX blocks, options).
+def split_numbered_questions(text):
+    questions = []
+    for line in text.splitlines():
+        if PART_HEADER_RE.match(line):
+            continue
+        match = QUESTION_RE.match(line)
+        if match:
+            questions.append(match.group(2))
+        elif questions and line.strip():
+            questions[-1] += "\n" + line.rstrip()
+    return questions
+
+# Parse a full paper into {"A": [...], "B": [...], "C": [...]}, ignoring any
+# preamble before the first part header.
+def parse_paper(text):
+    parts = {}
+    current = None
+    lines = []
+    for line in text.splitlines():
+        header = PART_HEADER_RE.match(line)
+        if header:
+            if current is not None:
+                parts.setdefault(current, []).extend(split_numbered_questions("\n".join(lines)))
+            current = header.group(1).upper()
+            lines = []
+        elif current is not None:
+            lines.append(line)
+    if current is not None:
+        parts.setdefault(current, []).extend(split_numbered_questions("\n".join(lines)))
+    return parts
+
+def format_paper(parts):
+    sections = []
+    for part in PART_ORDER:
+        questions = parts.get(part)
+        if not questions:
+            continue
+        body = "\n\n".join(f"{number}. {question}" for number, question in enumerate(questions, start=1))
+        sections.append(f"{part_header(part)}\n{body}")
+    return "\n\n".join(sections)
+
+# Bloom's distribution text ("Remember: 20%" per line) as a vector in BLOOM_LEVELS order
+def parse_bloom_distribution(text):
+    percentages = {}
+    for line in text.splitlines():
+        match = BLOOM_LINE_RE.match(line)
+        if match:
+            percentages[match.group(1).capitalize()] = int(match.group(2))
+    return [percentages.get(level, 0) for level in BLOOM_LEVELS]
@@ -0,0 +1,66 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from paper_format import PART_ORDER, format_paper, split_numbered_questions
+
+# ---------- Parallel Generation Configuration ----------
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "3"))
+# Maximum questions per request; 0 sends each part as a single request
+PART_SLICE_SIZE = int(os.getenv("PART_SLICE_SIZE", "0"))
+
+# A unit of work: `count` questions for `part`, drawn from `units`.
+# `index` orders slices of the same part when they are merged back together.
+class PartSlice:
+    def __init__(self, part, index, count, units):
+        self.part = part
+        self.index = index
+        self.count = count
+        self.units = units
+
+    def __repr__(self):
+        return f"PartSlice(part={self.part!r}, index={self.index}, count={self.count}, units={self.units!r})"
+
+# Split each part's question count into slices of at most slice_size questions.
+# When a part is sliced, units are dealt round-robin so slices do not overlap.
+def plan_slices(part_counts, units, slice_size=PART_SLICE_SIZE):
+    slices = []
+    for part in PART_ORDER:
+        count = int(part_counts.get(part, 0))
+        if count <= 0:
+            continue
+        size = slice_size if slice_size > 0 else count
+        sizes = [min(size, count - start) for start in range(0, count, size)]
+        for index, slice_count in enumerate(sizes):
+            if len(sizes) > 1 and len(units) >= len(sizes):
+                slice_units = units[index::len(sizes)]
+            else:
+                slice_units = list(units)
+            slices.append(PartSlice(part, index, slice_count, slice_units))
+    return slices
+
+# Merge generated slice texts back into the standard paper layout, keeping
+# part order and slice order regardless of completion order. Each slice
+# contributes at most the number of questions it was asked for.
+def merge_slices(slices, results):
+    parts = {}
+    for part_slice, text in sorted(zip(slices, results), key=lambda item: (PART_ORDER.index(item[0].part), item[0].index)):
+        if text is None:
+            continue
+        questions = split_numbered_questions(text)[:part_slice.count]
+        parts.setdefault(part_slice.part, []).extend(questions)
+    return format_paper(parts)
+
+# Run generate_slice(part_slice) for every slice concurrently. on_progress, if
+# given, receives the merged paper so far each time a slice completes; it is
+# called from the calling thread so it may update Streamlit elements.
+def generate_parts_in_parallel(generate_slice, slices, max_workers=GENERATION_CONCURRENCY, on_progress=None):
+    results = [None] * len(slices)
+    if not slices:
+        return ""
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(slices)))) as executor:
+        futures = {executor.submit(generate_slice, part_slice): i for i, part_slice in enumerate(slices)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_progress is not None:
+                on_progress(merge_slices(slices, results))
+    return merge_slices(slices, results)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from fpdf import FPDF
+
+from tracing import span
+
+# ---------- PDF Rendering Configuration ----------
+# A TrueType font with wide Unicode coverage; without one, text is mapped to Latin-1
+PDF_UNICODE_FONT = os.getenv("PDF_UNICODE_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "64"))
+
+# Typographic characters the core Latin-1 fonts cannot show, mapped in one translate() pass
+LATIN1_TRANSLATION = str.maketrans({
+    "•": "-", "–": "-", "—": "-", "−": "-",
+    "“": "\"", "”": "\"", "„": "\"",
+    "‘": "'", "’": "'", "‚": "'",
+    "…": "...", "≤": "<=", "≥": ">=", "≠": "!=", "→": "->", "←": "<-",
+    "\u00a0": " ", "\u200b": "",
+})
+
+def _font_variants(path):
+    # DejaVu ships bold and oblique files next to the regular one
+    base, ext = os.path.splitext(path)
+    bold = f"{base}-Bold{ext}"
+    italic = f"{base}-Oblique{ext}"
+    return {
+        "": path,
+        "B": bold if os.path.exists(bold) else path,
+        "I": italic if os.path.exists(italic) else path,
+    }
+
+class PDF(FPDF):
+    font_family_name = "Arial"
+
+    def header(self):
+        self.set_font(self.font_family_name, 'B', 14)
+        self.cell(0, 10, self.title, align="C", ln=True)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font(self.font_family_name, "I", 8)
+        self.cell(0, 10, f"Page {self.page_no()}", align="C")
+
+    def use_unicode_font(self, path):
+        for style, font_path in _font_variants(path).items():
+            self.add_font("Unicode", style, font_path, uni=True)
+        self.font_family_name = "Unicode"
+
+def _pdf_bytes(pdf):
+    output = pdf.output(dest='S')
+    # PyFPDF returns a Latin-1 str, fpdf2 returns a bytearray
+    return output.encode('latin-1') if isinstance(output, str) else bytes(output)
+
+def render_pdf(text, title="Document", unicode_font=PDF_UNICODE_FONT):
+    pdf = PDF()
+    unicode = bool(unicode_font) and os.path.exists(unicode_font)
+    if unicode:
+        pdf.use_unicode_font(unicode_font)
+    else:
+        text = text.translate(LATIN1_TRANSLATION).encode('latin-1', errors='replace').decode('latin-1')
+        title = title.translate(LATIN1_TRANSLATION).encode('latin-1', errors='replace').decode('latin-1')
+    pdf.set_title(title)
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.set_font(pdf.font_family_name, size=12)
+    pdf.multi_cell(0, 10, text)
+    return _pdf_bytes(pdf)
+
+# ---------- Rendered PDF Cache ----------
+# Streamlit reruns the script on every interaction; keeping the rendered bytes
+# per (subject, title, text) means a rerun never renders the same document twice.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def pdf_cache_key(subject, text, title):
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return subject, title, digest
+
+def render_pdf_cached(subject, text, title="Document"):
+    key = pdf_cache_key(subject, text, title)
+    with span("pdf.render", title=title) as render:
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                render.set("cache_hit", True)
+                render.set("bytes", len(_cache[key]))
+                return _cache[key]
+        pdf_bytes = render_pdf(text, title)
+        render.set("cache_hit", False)
+        render.set("bytes", len(pdf_bytes))
+    with _cache_lock:
+        _cache[key] = pdf_bytes
+        while len(_cache) > PDF_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return pdf_bytes
+
+def convert_text_to_pdf(subject, text, title="Document"):
+    return BytesIO(render_pdf_cached(subject, text, title))
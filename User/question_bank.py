@@ -0,0 +1,270 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from paper_format import BLOOM_LEVELS, PART_ORDER
+from response_cache import CACHE_DB_PATH, normalize_subject
+
+logger = logging.getLogger(__name__)
+
+# ---------- Question Bank Configuration ----------
+# Lives in the response cache file, so ingestions recorded by the Admin app are visible.
+# Off by default: warming makes model calls for every unit of every ingested subject.
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK", "false").lower() in ("1", "true", "yes")
+BANK_QUESTIONS_PER_LEVEL = int(os.getenv("BANK_QUESTIONS_PER_LEVEL", "2"))
+BANK_WARM_CONCURRENCY = int(os.getenv("BANK_WARM_CONCURRENCY", "2"))
+BANK_POLL_SECONDS = float(os.getenv("BANK_POLL_SECONDS", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bank_questions (
+    id INTEGER PRIMARY KEY,
+    subject TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    part TEXT NOT NULL,
+    bloom_level TEXT NOT NULL,
+    text TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    UNIQUE (subject, text_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_bank_lookup ON bank_questions(subject, part, bloom_level, unit, uses);
+CREATE TABLE IF NOT EXISTS bank_warmups (
+    subject TEXT PRIMARY KEY,
+    units TEXT NOT NULL,
+    warmed_at REAL NOT NULL,
+    display_name TEXT,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS ingestions (
+    subject TEXT PRIMARY KEY,
+    completed_at REAL NOT NULL
+);
+"""
+
+_LEVELS = "|".join(BLOOM_LEVELS)
+# "[Apply] text" or "Apply: text", optionally numbered
+TAGGED_QUESTION_RE = re.compile(
+    rf"^\s*(?:\d+[.)]\s*)?(?:\[({_LEVELS})\]\s*[:|\-]?|({_LEVELS})\s*[:|\-])\s*(.*\S)\s*$",
+    re.IGNORECASE
+)
+
+# Case, punctuation and spacing differences do not make a question new
+def question_hash(text):
+    canonical = " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+# Parse "[Level] question" lines from a warm-up generation
+def parse_tagged_questions(text):
+    questions = []
+    for line in text.splitlines():
+        match = TAGGED_QUESTION_RE.match(line)
+        if match:
+            questions.append(((match.group(1) or match.group(2)).capitalize(), match.group(3)))
+    return questions
+
+# Split count across Bloom's levels in proportion to the percentages (largest remainder)
+def apportion(count, bloom):
+    total = sum(bloom) or 1
+    shares = [count * pct / total for pct in bloom]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in by_remainder[:count - sum(counts)]:
+        counts[i] += 1
+    return dict(zip(BLOOM_LEVELS, counts))
+
+class QuestionBank:
+    def __init__(self, path=CACHE_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.metrics = {"papers": 0, "bank_questions": 0, "gap_questions": 0}
+
+    # A question already in the bank is refreshed rather than duplicated.
+    # Returns the number of questions stored.
+    def add(self, subject, unit, part, questions):
+        subject = normalize_subject(subject)
+        now = time.time()
+        rows = [(subject, unit, part, level, text, question_hash(text), now) for level, text in questions]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO bank_questions (subject, unit, part, bloom_level, text, text_hash, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (subject, text_hash) DO UPDATE SET created_at = excluded.created_at",
+                rows
+            )
+            return self._conn.total_changes - before
+
+    # Pick questions for a paper. For each part the count is split across Bloom's
+    # levels, and each level is filled round-robin across the units, least used
+    # questions first. Returns the chosen questions per part and how many each
+    # part is still short of.
+    def assemble(self, subject, units, part_counts, bloom):
+        subject = normalize_subject(subject)
+        placeholders = ",".join("?" * len(units))
+        parts, missing, chosen_ids = {}, {}, []
+        with self._lock:
+            for part in PART_ORDER:
+                wanted = int(part_counts.get(part, 0))
+                parts[part] = []
+                for level, target in apportion(wanted, bloom).items():
+                    if target <= 0:
+                        continue
+                    rows = self._conn.execute(
+                        f"SELECT id, unit, text FROM bank_questions WHERE subject = ? AND part = ? "
+                        f"AND bloom_level = ? AND unit IN ({placeholders}) ORDER BY uses, RANDOM() LIMIT ?",
+                        (subject, part, level, *units, target * len(units))
+                    ).fetchall()
+                    for row in _round_robin_by_unit(rows)[:target]:
+                        chosen_ids.append(row[0])
+                        parts[part].append(row[2])
+                missing[part] = wanted - len(parts[part])
+            if chosen_ids:
+                with self._conn:
+                    self._conn.executemany("UPDATE bank_questions SET uses = uses + 1 WHERE id = ?", [(i,) for i in chosen_ids])
+            self.metrics["papers"] += 1
+            self.metrics["bank_questions"] += len(chosen_ids)
+            self.metrics["gap_questions"] += sum(missing.values())
+        return parts, missing
+
+    # True once a warm-up covered every unit and part of the subject and no
+    # ingestion has completed since it started
+    def has_subject(self, subject):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM bank_warmups w LEFT JOIN ingestions i ON i.subject = w.subject "
+                "WHERE w.subject = ? AND w.complete = 1 AND (i.completed_at IS NULL OR w.warmed_at >= i.completed_at)",
+                (normalize_subject(subject),)
+            ).fetchone()
+        return row is not None
+
+    def record_warmup(self, subject, units, warmed_at, complete=False):
+        display_name = subject
+        subject = normalize_subject(subject)
+        with self._lock, self._conn:
+            # Questions not regenerated since the subject's latest ingestion are dropped
+            self._conn.execute(
+                "DELETE FROM bank_questions WHERE subject = ? AND created_at < ("
+                "SELECT completed_at FROM ingestions WHERE subject = ?)",
+                (subject, subject)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO bank_warmups (subject, units, warmed_at, display_name, complete) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (subject, json.dumps(units), warmed_at, display_name, int(complete))
+            )
+
+    # Subjects ingested since they were last warmed, with their known units (None
+    # if never warmed). Subjects are named as the user typed them when warmed
+    # before, otherwise as the Admin app recorded them.
+    def stale_subjects(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT COALESCE(w.display_name, i.subject), w.units FROM ingestions i LEFT JOIN bank_warmups w ON w.subject = i.subject "
+                "WHERE w.warmed_at IS NULL OR w.warmed_at < i.completed_at"
+            ).fetchall()
+        return [(subject, json.loads(units) if units else None) for subject, units in rows]
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM bank_questions").fetchone()[0]
+            subjects = self._conn.execute("SELECT COUNT(DISTINCT subject) FROM bank_questions").fetchone()[0]
+            metrics = dict(self.metrics)
+        served = metrics["bank_questions"] + metrics["gap_questions"]
+        metrics.update(
+            questions=entries,
+            subjects=subjects,
+            bank_fill_rate=metrics["bank_questions"] / served if served else 0.0,
+        )
+        return metrics
+
+def _round_robin_by_unit(rows):
+    by_unit = {}
+    for row in rows:
+        by_unit.setdefault(row[1], []).append(row)
+    ordered = []
+    while by_unit:
+        for unit in list(by_unit):
+            ordered.append(by_unit[unit].pop(0))
+            if not by_unit[unit]:
+                del by_unit[unit]
+    return ordered
+
+# Fills the bank in the background. Subjects are queued explicitly (after unit
+# extraction) or picked up by polling for ingestions completed since the last
+# warm-up. generate(subject, unit, part) returns [(bloom_level, text), ...] and
+# list_units(subject) returns the subject's units; both make model calls.
+class BankWarmer:
+    def __init__(self, bank, generate, list_units, concurrency=BANK_WARM_CONCURRENCY, poll_seconds=BANK_POLL_SECONDS):
+        self.bank = bank
+        self.generate = generate
+        self.list_units = list_units
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="question-bank-warmer", daemon=True)
+        self._thread.start()
+
+    # subject is the display name used in prompts; one warm-up per normalised subject
+    def submit(self, subject, units=None):
+        key = normalize_subject(subject)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._queue.put((subject, units))
+
+    def _run(self):
+        while True:
+            try:
+                subject, units = self._queue.get(timeout=self.poll_seconds)
+            except queue.Empty:
+                for subject, units in self.bank.stale_subjects():
+                    self.submit(subject, units)
+                continue
+            try:
+                self.warm(subject, units)
+            except Exception:
+                logger.exception("Question bank warm-up failed for %s", subject)
+            finally:
+                with self._lock:
+                    self._pending.discard(normalize_subject(subject))
+
+    # One failed (unit, part) leaves a gap (None) rather than failing the whole
+    # warm-up; the subject is then not marked complete
+    def _generate(self, subject, unit, part):
+        try:
+            return self.generate(subject, unit, part)
+        except Exception:
+            logger.exception("Question bank generation failed for %s / %s / Part %s", subject, unit, part)
+            return None
+
+    def warm(self, subject, units=None):
+        started = time.time()
+        units = units or self.list_units(subject)
+        if not units:
+            # Recorded anyway so the poller does not retry the subject until its next ingestion
+            self.bank.record_warmup(subject, [], started)
+            return 0
+        work = [(unit, part) for unit in units for part in PART_ORDER]
+        stored, gaps = 0, 0
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as executor:
+            for (unit, part), questions in zip(work, executor.map(lambda item: self._generate(subject, *item), work)):
+                if not questions:
+                    gaps += 1
+                    continue
+                stored += self.bank.add(subject, unit, part, questions)
+        self.bank.record_warmup(subject, units, started, complete=gaps == 0)
+        logger.info("Question bank warmed for %s: %d questions over %d units, %d gaps", subject, stored, len(units), gaps)
+        return stored
@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------- Rate Limiter Configuration ----------
+MODEL_RATE_PER_SECOND = float(os.getenv("MODEL_RATE_PER_SECOND", "2"))
+MODEL_BURST = int(os.getenv("MODEL_BURST", "4"))
+MODEL_MIN_RATE_PER_SECOND = float(os.getenv("MODEL_MIN_RATE_PER_SECOND", "0.1"))
+THROTTLE_RETRIES = int(os.getenv("THROTTLE_RETRIES", "4"))
+THROTTLE_BACKOFF_SECONDS = float(os.getenv("THROTTLE_BACKOFF_SECONDS", "1"))
+
+# Lower numbers are served first
+INTERACTIVE = 0
+BATCH = 1
+
+THROTTLING_CODES = ("ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException", "Throttling")
+
+# Server-side and connection failures worth another attempt
+TRANSIENT_CODES = ("InternalServerException", "ServiceUnavailableException", "ModelNotReadyException")
+TRANSIENT_ERRORS = ("EndpointConnectionError", "ConnectionClosedError", "ConnectTimeoutError", "ReadTimeoutError")
+
+def _error_code(error):
+    return getattr(error, "response", {}).get("Error", {}).get("Code")
+
+def is_throttling(error):
+    return _error_code(error) in THROTTLING_CODES or type(error).__name__ in THROTTLING_CODES
+
+def is_transient(error):
+    return _error_code(error) in TRANSIENT_CODES or type(error).__name__ in TRANSIENT_ERRORS
+
+# Token bucket for one model, shared by every session in the process.
+# Waiters are served strictly by (priority, arrival), so interactive requests
+# overtake queued batch work. The refill rate halves on each throttle and
+# recovers additively on success, back up to the configured rate.
+class TokenBucketLimiter:
+    def __init__(self, rate=MODEL_RATE_PER_SECOND, burst=MODEL_BURST, min_rate=MODEL_MIN_RATE_PER_SECOND):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self.metrics = {
+            "acquired": 0, "throttles": 0, "queue_depth": 0, "peak_queue_depth": 0,
+            "total_wait_seconds": 0.0, "max_wait_seconds": 0.0,
+        }
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        started = time.monotonic()
+        ticket = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            self.metrics["queue_depth"] = len(self._waiters)
+            self.metrics["peak_queue_depth"] = max(self.metrics["peak_queue_depth"], len(self._waiters))
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] == ticket and self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    if timeout is not None and now - started >= timeout:
+                        raise TimeoutError("Timed out waiting for model capacity")
+                    wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.05
+                    if timeout is not None:
+                        wait = min(wait, timeout - (now - started))
+                    self._cond.wait(timeout=max(0.001, wait))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self.metrics["queue_depth"] = len(self._waiters)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            self.metrics["acquired"] += 1
+            self.metrics["total_wait_seconds"] += waited
+            self.metrics["max_wait_seconds"] = max(self.metrics["max_wait_seconds"], waited)
+        return waited
+
+    def set_rate(self, rate, burst):
+        with self._cond:
+            self._refill(time.monotonic())
+            self.max_rate = self.rate = rate
+            self.burst = burst
+            self._tokens = min(self._tokens, float(burst))
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self.metrics["throttles"] += 1
+        logger.warning("Model throttled; rate lowered to %.2f req/s", self.rate)
+
+    def on_success(self):
+        with self._cond:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def snapshot(self):
+        with self._cond:
+            metrics = dict(self.metrics)
+            metrics["rate_per_second"] = self.rate
+            acquired = metrics["acquired"]
+            metrics["mean_wait_seconds"] = metrics["total_wait_seconds"] / acquired if acquired else 0.0
+        return metrics
+
+# One limiter per model ARN
+class LimiterRegistry:
+    def __init__(self, rate=MODEL_RATE_PER_SECOND, burst=MODEL_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    # Change the rate and burst of every model's limiter, current and future
+    def configure(self, rate, burst):
+        with self._lock:
+            self.rate, self.burst = rate, burst
+            limiters = list(self._limiters.values())
+        for limiter in limiters:
+            limiter.set_rate(rate, burst)
+
+    def get(self, model_arn):
+        with self._lock:
+            if model_arn not in self._limiters:
+                self._limiters[model_arn] = TokenBucketLimiter(self.rate, self.burst)
+            return self._limiters[model_arn]
+
+    def snapshot(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {arn.rsplit("/", 1)[-1]: limiter.snapshot() for arn, limiter in limiters.items()}
+
+# Call fn() through the limiter, retrying throttling and transient errors with
+# jittered exponential backoff; throttling also lowers the limiter's rate. Other
+# errors are raised straight away. This is the only retry layer for model calls:
+# their clients make a single attempt, so throttles reach the limiter.
+def call_with_limiter(limiter, fn, priority=INTERACTIVE, retries=THROTTLE_RETRIES, backoff=THROTTLE_BACKOFF_SECONDS):
+    attempt = 0
+    while True:
+        limiter.acquire(priority)
+        try:
+            result = fn()
+        except Exception as e:
+            throttled = is_throttling(e)
+            if not (throttled or is_transient(e)) or attempt >= retries:
+                raise
+            if throttled:
+                limiter.on_throttle()
+            attempt += 1
+            time.sleep(random.uniform(0, backoff * (2 ** attempt)))
+            continue
+        limiter.on_success()
+        return result
@@ -0,0 +1,134 @@
+# Canonical copy: User/response_cache.py. Admin/ carries a byte-identical copy
+# to record completed ingestions in the shared cache file; edit this file and
+# copy it over.
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# ---------- Cache Configuration ----------
+# The cache file can be placed on a volume shared with the Admin container so that
+# completed ingestions invalidate the entries for that subject.
+CACHE_DB_PATH = os.getenv("RESPONSE_CACHE_PATH", "/tmp/au_ai_response_cache.db")
+CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_subject ON responses(subject);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+CREATE TABLE IF NOT EXISTS ingestions (
+    subject TEXT PRIMARY KEY,
+    completed_at REAL NOT NULL
+);
+"""
+
+def normalize_subject(subject):
+    # Same sanitisation the Admin uploader applies to subject names, case-folded
+    return re.sub(r"[^a-zA-Z0-9_-]", "_", subject.strip()).lower()
+
+def make_cache_key(subject, knowledge_base_id, model_arn, prompt):
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    raw = "\x1f".join([normalize_subject(subject), knowledge_base_id, model_arn, prompt_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    def __init__(self, path=CACHE_DB_PATH, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        return self.get_any([key])
+
+    # The value of the first of keys with a live entry, counted as one hit or miss
+    def get_any(self, keys):
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                value = self._lookup(key, now)
+                if value is not None:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def _lookup(self, key, now):
+        row = self._conn.execute(
+            "SELECT r.value, r.created_at, i.completed_at FROM responses r "
+            "LEFT JOIN ingestions i ON i.subject = r.subject WHERE r.cache_key = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, created_at, completed_at = row
+        expired = self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+        stale = completed_at is not None and completed_at >= created_at
+        if expired or stale:
+            with self._conn:
+                self._conn.execute("DELETE FROM responses WHERE cache_key = ?", (key,))
+            return None
+
+        with self._conn:
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (now, key))
+        return value
+
+    def set(self, key, subject, value):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, subject, value, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, normalize_subject(subject), value, now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl_seconds > 0:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries > 0:
+            # Least recently used entries go first once the store is over capacity
+            self._conn.execute(
+                "DELETE FROM responses WHERE cache_key IN ("
+                "SELECT cache_key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def invalidate_subject(self, subject, completed_at=None):
+        subject = normalize_subject(subject)
+        completed_at = completed_at if completed_at is not None else time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingestions (subject, completed_at) VALUES (?, ?)",
+                (subject, completed_at)
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE subject = ? AND created_at <= ?",
+                (subject, completed_at)
+            )
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
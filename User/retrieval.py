@@ -0,0 +1,342 @@
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from bedrock_models import invoke_claude, prompt_with_context, stream_claude
+from response_cache import normalize_subject
+from tracing import add_to_current_span, span
+
+logger = logging.getLogger(__name__)
+
+# ---------- Local Retrieval Configuration ----------
+# "knowledge_base" sends every query through the managed retrieve_and_generate;
+# "local" searches a prebuilt FAISS index and only sends generation to Bedrock.
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "knowledge_base")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "/tmp/au_ai_faiss")
+LOCAL_INDEX_S3_PREFIX = "faiss_index"
+LOCAL_TOP_K = int(os.getenv("LOCAL_TOP_K", "5"))
+# How often a loaded index checks for a newer build (its manifest version)
+INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", "300"))
+EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v1")
+
+# Files making up one subject's index (written by the Admin app):
+#   index.json        - {"version", "dimension", "chunks", "shards": [{"file", "count"}, ...]}
+#   index.NNNN.faiss  - inner-product index shards over L2-normalised embeddings,
+#                       numbering vector ids consecutively in manifest order
+#   chunks.jsonl      - one {"text", "source", "page"} object per vector id
+#   chunks.offsets    - little-endian uint64 byte offset of each line in chunks.jsonl
+# Indexes built before sharding have a single index.faiss and no index.json.
+MANIFEST_FILE = "index.json"
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "chunks.offsets"
+
+# ---------- Embedders ----------
+class TitanEmbedder:
+    def __init__(self, client, model_id=EMBEDDING_MODEL_ID):
+        self.client = client
+        self.model_id = model_id
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            response = self.client.invoke_model(modelId=self.model_id, body=json.dumps({"inputText": text}))
+            vectors.append(json.loads(response["body"].read())["embedding"])
+        return vectors
+
+# Deterministic bag-of-words embedder for offline tests and benchmarks
+class HashingEmbedder:
+    def __init__(self, dimension=256):
+        self.dimension = dimension
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimension
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimension
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            vectors.append([v / norm for v in vector])
+        return vectors
+
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# ---------- FAISS Index ----------
+# One subject's index. The FAISS shards and chunk texts are memory-mapped, so
+# opening is fast and every worker process shares the same page cache.
+class SubjectIndex:
+    def __init__(self, directory):
+        import faiss
+        import numpy as np
+
+        self._np = np
+        manifest = read_manifest(directory)
+        files = [entry["file"] for entry in manifest["shards"]] if manifest else [INDEX_FILE]
+        self.version = manifest["version"] if manifest else None
+        # (first vector id, shard) pairs
+        self.shards = []
+        base = 0
+        for name in files:
+            shard = faiss.read_index(os.path.join(directory, name), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self.shards.append((base, shard))
+            base += shard.ntotal
+        self._chunks_file = open(os.path.join(directory, CHUNKS_FILE), "rb")
+        self._chunks = mmap.mmap(self._chunks_file.fileno(), 0, access=mmap.ACCESS_READ)
+        offsets_path = os.path.join(directory, OFFSETS_FILE)
+        if os.path.exists(offsets_path):
+            self._offsets = np.memmap(offsets_path, dtype="<u8", mode="r")
+        else:
+            self._offsets = self._scan_offsets()
+
+    def _scan_offsets(self):
+        offsets = [0]
+        position = self._chunks.find(b"\n")
+        while position != -1 and position + 1 < len(self._chunks):
+            offsets.append(position + 1)
+            position = self._chunks.find(b"\n", position + 1)
+        return offsets
+
+    def chunk(self, vector_id):
+        start = int(self._offsets[vector_id])
+        end = self._chunks.find(b"\n", start)
+        return json.loads(self._chunks[start:end if end != -1 else len(self._chunks)])
+
+    # Top passages across all shards, best first
+    def search(self, vector, top_k):
+        query = self._np.asarray([vector], dtype="float32")
+        hits = []
+        for base, shard in self.shards:
+            scores, ids = shard.search(query, top_k)
+            hits += [(float(score), base + int(vector_id)) for score, vector_id in zip(scores[0], ids[0]) if vector_id >= 0]
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        results = []
+        for score, vector_id in hits[:top_k]:
+            chunk = self.chunk(vector_id)
+            chunk["score"] = score
+            results.append(chunk)
+        return results
+
+# Loaded indexes are checked for a newer build every refresh_seconds: the
+# manifest in S3 (or, without S3, on disk) is compared with the loaded version
+# and the index is reloaded when it changed. Each downloaded version gets its
+# own directory, so a loaded index's files are never overwritten; searches
+# already running keep using the old files, which stay mapped until they finish.
+# Loads and version checks hold a lock per subject, never one for all subjects.
+class LocalFaissRetriever:
+    def __init__(self, embedder, index_dir=LOCAL_INDEX_DIR, top_k=LOCAL_TOP_K, s3_client=None, bucket=None,
+                 refresh_seconds=INDEX_REFRESH_SECONDS):
+        self.embedder = embedder
+        self.index_dir = index_dir
+        self.top_k = top_k
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.refresh_seconds = refresh_seconds
+        # subject -> (SubjectIndex, its directory, monotonic time of the last version check)
+        self._indexes = {}
+        self._subject_locks = {}
+        self._lock = threading.Lock()
+
+    def _subject_lock(self, subject):
+        with self._lock:
+            return self._subject_locks.setdefault(subject, threading.Lock())
+
+    def _remote_manifest(self, subject):
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=f"{LOCAL_INDEX_S3_PREFIX}/{subject}/{MANIFEST_FILE}")
+        return json.loads(response["Body"].read())
+
+    # Download one version of the subject's index to index_dir/<subject>.<version>
+    # and return that directory. Files land in a staging directory that is renamed
+    # into place once complete; a version already downloaded is reused.
+    def _download(self, subject, manifest):
+        version = manifest.get("version") if manifest else None
+        directory = os.path.join(self.index_dir, f"{subject}.{version or 'legacy'}")
+        if os.path.exists(os.path.join(directory, MANIFEST_FILE if manifest else INDEX_FILE)):
+            return directory
+        os.makedirs(self.index_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{subject}.", dir=self.index_dir)
+        try:
+            prefix = f"{LOCAL_INDEX_S3_PREFIX}/{subject}"
+            files = [entry["file"] for entry in manifest["shards"]] if manifest else [INDEX_FILE]
+            for name in files + [CHUNKS_FILE, OFFSETS_FILE]:
+                try:
+                    self.s3_client.download_file(self.bucket, f"{prefix}/{name}", os.path.join(staging, name))
+                except Exception:
+                    if name != OFFSETS_FILE:
+                        raise
+            if manifest:
+                with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                    json.dump(manifest, f)
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                # Another process put the same version in place first
+                shutil.rmtree(staging, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return directory
+
+    # First load: an index built on this disk at index_dir/<subject>, else the
+    # current build from S3. Returns (SubjectIndex, directory).
+    def _open(self, subject):
+        directory = os.path.join(self.index_dir, subject)
+        built = os.path.exists(os.path.join(directory, MANIFEST_FILE)) or os.path.exists(os.path.join(directory, INDEX_FILE))
+        if not built and self.s3_client and self.bucket:
+            try:
+                manifest = self._remote_manifest(subject)
+            except Exception:
+                manifest = None  # built before sharding
+            directory = self._download(subject, manifest)
+        return SubjectIndex(directory), directory
+
+    # (SubjectIndex, directory) of a newer build, or None if the loaded one is current
+    def _newer_index(self, subject, directory, index):
+        if self.s3_client and self.bucket:
+            try:
+                manifest = self._remote_manifest(subject)
+            except Exception:
+                logger.warning("Could not check the index version for %s", subject, exc_info=True)
+                return None
+            if manifest.get("version") == index.version:
+                return None
+            directory = self._download(subject, manifest)
+        else:
+            manifest = read_manifest(directory)
+            if manifest is None or manifest.get("version") == index.version:
+                return None
+        logger.info("Reloading the local index for %s (version %s -> %s)", subject, index.version, manifest.get("version"))
+        return SubjectIndex(directory), directory
+
+    def _load(self, subject):
+        subject = normalize_subject(subject)
+        with self._subject_lock(subject):
+            now = time.monotonic()
+            with self._lock:
+                entry = self._indexes.get(subject)
+            if entry is None:
+                entry = (*self._open(subject), now)
+            index, directory, checked_at = entry
+            if now - checked_at >= self.refresh_seconds:
+                newer = self._newer_index(subject, directory, index)
+                if newer is not None:
+                    if newer[1] != directory and os.path.basename(directory) != subject:
+                        # A superseded download; open files stay readable until closed
+                        shutil.rmtree(directory, ignore_errors=True)
+                    index, directory = newer
+                checked_at = now
+            with self._lock:
+                self._indexes[subject] = (index, directory, checked_at)
+            return index
+
+    # Returns the top_k passages as {"text", "source", "page", "score"} dicts
+    def search(self, subject, text, top_k=None):
+        index = self._load(subject)
+        vector = self.embedder.embed([text])[0]
+        return index.search(vector, top_k or self.top_k)
+
+# ---------- Local Generation Backend ----------
+# Drop-in replacement for retrieve_and_generate: retrieves locally, then sends
+# the prompt and passages to the model named in the query.
+class LocalRetrievalBackend:
+    def __init__(self, retriever, runtime_client):
+        self.retriever = retriever
+        self.runtime_client = runtime_client
+
+    def _prepare(self, query, subject, retrieval_text):
+        prompt = query["input"]["text"]
+        model = query["retrieveAndGenerateConfiguration"]["knowledgeBaseConfiguration"]["modelArn"]
+        with span("local.retrieve", subject=subject) as retrieve_span:
+            passages = self.retriever.search(subject, retrieval_text or prompt)
+            retrieve_span.set("citations", len(passages))
+        add_to_current_span("citations", len(passages))
+        return model, prompt_with_context(prompt, passages)
+
+    def generate(self, query, subject, retrieval_text=None):
+        model, full_prompt = self._prepare(query, subject, retrieval_text)
+        text, usage = invoke_claude(self.runtime_client, model, full_prompt)
+        add_to_current_span("prompt_tokens", usage.get("input_tokens", 0))
+        add_to_current_span("output_tokens", usage.get("output_tokens", 0))
+        return text
+
+    def stream(self, query, subject, retrieval_text=None):
+        model, full_prompt = self._prepare(query, subject, retrieval_text)
+        yield from stream_claude(self.runtime_client, model, full_prompt)
+
+    # A stream backend (see streaming.py) fixed to one subject and retrieval text
+    def bind(self, subject, retrieval_text=None):
+        return _BoundLocalStream(self, subject, retrieval_text)
+
+class _BoundLocalStream:
+    def __init__(self, backend, subject, retrieval_text):
+        self.backend = backend
+        self.subject = subject
+        self.retrieval_text = retrieval_text
+
+    def stream(self, query):
+        return self.backend.stream(query, self.subject, self.retrieval_text)
+
+# ---------- Knowledge Base Retrieval ----------
+# Retrieve-only queries against the managed knowledge base, returning passages
+# in the same shape as LocalFaissRetriever.search
+class KnowledgeBaseRetriever:
+    def __init__(self, client, knowledge_base_id, top_k=LOCAL_TOP_K):
+        self.client = client
+        self.knowledge_base_id = knowledge_base_id
+        self.top_k = top_k
+
+    def search(self, subject, text, top_k=None):
+        with span("bedrock.retrieve", subject=subject) as retrieve_span:
+            response = self.client.retrieve(
+                knowledgeBaseId=self.knowledge_base_id,
+                retrievalQuery={"text": text},
+                retrievalConfiguration={"vectorSearchConfiguration": {"numberOfResults": top_k or self.top_k}}
+            )
+            passages = [
+                {
+                    "text": result.get("content", {}).get("text", ""),
+                    "source": result.get("location", {}).get("s3Location", {}).get("uri", ""),
+                    "page": result.get("metadata", {}).get("x-amz-bedrock-kb-document-page-number"),
+                    "score": float(result.get("score", 0.0)),
+                }
+                for result in response.get("retrievalResults", [])
+            ]
+            retrieve_span.set("citations", len(passages))
+        return passages
+
+# Generates from passages retrieved beforehand, sending the prompt and passages
+# to the model named in the query. Usable as a stream backend.
+class PrefetchedContextBackend:
+    def __init__(self, passages, runtime_client):
+        self.passages = passages
+        self.runtime_client = runtime_client
+
+    def _prepare(self, query):
+        add_to_current_span("citations", len(self.passages))
+        model = query["retrieveAndGenerateConfiguration"]["knowledgeBaseConfiguration"]["modelArn"]
+        return model, prompt_with_context(query["input"]["text"], self.passages)
+
+    def generate(self, query):
+        model, full_prompt = self._prepare(query)
+        text, usage = invoke_claude(self.runtime_client, model, full_prompt)
+        add_to_current_span("prompt_tokens", usage.get("input_tokens", 0))
+        add_to_current_span("output_tokens", usage.get("output_tokens", 0))
+        return text
+
+    def stream(self, query):
+        model, full_prompt = self._prepare(query)
+        yield from stream_claude(self.runtime_client, model, full_prompt)
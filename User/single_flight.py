@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from tracing import span
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; coalescing stays in-process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ---------- Single-Flight Configuration ----------
+# Identical generation requests in flight at the same time share one model call
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+# Also coalesce across server processes through lock files in this directory
+# (empty for in-process only). Only calls whose result lands in a shared cache
+# take part, since a waiting process reads the result from there.
+SINGLE_FLIGHT_LOCK_DIR = os.getenv("SINGLE_FLIGHT_LOCK_DIR", "")
+# Longest a process waits for another one's call before making it itself
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "120"))
+LOCK_POLL_SECONDS = 0.05
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+# Runs at most one call per key at a time; callers arriving while it is in
+# flight wait and receive its result or exception.
+class SingleFlight:
+    def __init__(self, lock_dir=SINGLE_FLIGHT_LOCK_DIR, wait_seconds=SINGLE_FLIGHT_WAIT_SECONDS):
+        self.lock_dir = lock_dir if lock_dir and fcntl is not None else None
+        self.wait_seconds = wait_seconds
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._metrics = {}
+
+    def _count(self, kind, name):
+        series = self._metrics.setdefault(kind, {"requests": 0, "coalesced": 0, "cross_process_waits": 0, "cross_process_hits": 0})
+        series[name] += 1
+
+    # fn() makes the call. recheck(), when given, reads the result from the shared
+    # cache fn writes to (None on a miss) and enables cross-process coalescing.
+    def do(self, kind, key, fn, recheck=None):
+        key = f"{kind}:{key}"
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(kind, "requests")
+            if not leader:
+                self._count(kind, "coalesced")
+
+        if not leader:
+            with span("single_flight.wait", kind=kind):
+                call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(kind, key, fn, recheck)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run(self, kind, key, fn, recheck):
+        if self.lock_dir is None or recheck is None:
+            return fn()
+        path = os.path.join(self.lock_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".lock")
+        lock_file = self._try_lock(path)
+        if lock_file is None:
+            # Another process is making this call; wait for it, up to wait_seconds, and take its result
+            with self._lock:
+                self._count(kind, "cross_process_waits")
+            deadline = time.monotonic() + self.wait_seconds
+            with span("single_flight.wait", kind=kind, cross_process=True):
+                while lock_file is None and time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_SECONDS)
+                    lock_file = self._try_lock(path)
+            try:
+                result = recheck()
+            except Exception:
+                logger.exception("Single-flight recheck failed for %s", kind)
+                result = None
+            if result is not None:
+                with self._lock:
+                    self._count(kind, "cross_process_hits")
+                if lock_file is not None:
+                    self._release(path, lock_file)
+                return result
+            if lock_file is None:
+                logger.warning("Gave up waiting %.0fs for another process's %s call; making it here", self.wait_seconds, kind)
+                return fn()
+        try:
+            return fn()
+        finally:
+            self._release(path, lock_file)
+
+    # The lock file at path, opened and exclusively locked, or None if another
+    # process holds it. A holder removes the file on release, so a lock taken on
+    # a file no longer at path guards nothing and is retried on a fresh one.
+    @staticmethod
+    def _try_lock(path):
+        while True:
+            lock_file = open(path, "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return None
+            try:
+                current = os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                return lock_file
+            lock_file.close()
+
+    # Remove the lock file while still holding it, so no other process can lock it afterwards
+    @staticmethod
+    def _release(path, lock_file):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    def stats(self):
+        with self._lock:
+            metrics = {kind: dict(series) for kind, series in self._metrics.items()}
+            in_flight = len(self._calls)
+        for series in metrics.values():
+            shared = series["coalesced"] + series["cross_process_hits"]
+            series["model_calls"] = series["requests"] - shared
+            series["coalesced_rate"] = shared / series["requests"] if series["requests"] else 0.0
+        return {"in_flight": in_flight, "cross_process": self.lock_dir is not None, **metrics}
@@ -0,0 +1,110 @@
+import logging
+import math
+import os
+import time
+
+from tracing import add_to_current_span
+
+logger = logging.getLogger(__name__)
+
+# Shortest gap between two updates of the streamed text on the page
+STREAM_UPDATE_SECONDS = float(os.getenv("STREAM_UPDATE_SECONDS", "0.1"))
+
+# ---------- Stream Backends ----------
+# Streams generated text from retrieve_and_generate_stream
+class BedrockStreamBackend:
+    def __init__(self, client):
+        self.client = client
+
+    def stream(self, query):
+        response = self.client.retrieve_and_generate_stream(**query)
+        for event in response["stream"]:
+            citation = event.get("citation")
+            if citation:
+                add_to_current_span("citations", len(citation.get("citation", {}).get("retrievedReferences", [])))
+            text = event.get("output", {}).get("text")
+            if text:
+                yield text
+
+# Replays a fixed text in small chunks, for tests and offline demos
+class FakeStreamBackend:
+    def __init__(self, text, chunk_size=16, delay=0.0, first_chunk_delay=0.0):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.first_chunk_delay = first_chunk_delay
+        self.queries = []
+
+    def stream(self, query):
+        self.queries.append(query)
+        if self.first_chunk_delay:
+            time.sleep(self.first_chunk_delay)
+        for start in range(0, len(self.text), self.chunk_size):
+            if self.delay and start:
+                time.sleep(self.delay)
+            yield self.text[start:start + self.chunk_size]
+
+# ---------- Stream Metrics ----------
+def estimate_tokens(text):
+    # Rough Claude tokenisation: about four characters per token
+    return math.ceil(len(text) / 4)
+
+class StreamStats:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self.tokens = 0
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token_at is None or self.finished_at is None:
+            return 0.0
+        elapsed = self.finished_at - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else float(self.tokens)
+
+    def as_dict(self):
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens": self.tokens,
+            "chunks": self.chunks,
+            "tokens_per_second": self.tokens_per_second,
+            "total_seconds": (self.finished_at or time.perf_counter()) - self.started_at,
+        }
+
+# Consume a stream, calling on_text with the accumulated text at most every
+# `interval` seconds and once more with the full text at the end. The text is
+# only joined for those calls, so long generations stay linear in their length.
+# Returns the full text and the StreamStats for the request.
+def stream_generation(backend, query, on_text=None, interval=STREAM_UPDATE_SECONDS):
+    stats = StreamStats()
+    parts = []
+    last_update = None
+    for chunk in backend.stream(query):
+        now = time.perf_counter()
+        if stats.first_token_at is None:
+            stats.first_token_at = now
+        parts.append(chunk)
+        stats.chunks += 1
+        if on_text is not None and (last_update is None or now - last_update >= interval):
+            last_update = now
+            on_text("".join(parts))
+    stats.finished_at = time.perf_counter()
+
+    full_text = "".join(parts)
+    if on_text is not None and parts:
+        on_text(full_text)
+    stats.tokens = estimate_tokens(full_text)
+    ttft = stats.time_to_first_token
+    logger.info(
+        "stream finished: ttft=%s tokens=%d tokens/sec=%.1f",
+        f"{ttft:.3f}s" if ttft is not None else "n/a", stats.tokens, stats.tokens_per_second
+    )
+    return full_text, stats
@@ -0,0 +1,147 @@
+import json
+import os
+import re
+
+from paper_format import BLOOM_LEVELS, PART_MARKS, PART_ORDER
+
+# ---------- Structured Output Configuration ----------
+# Ask for JSON units and question sections instead of scraping numbered text
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+# Follow-up requests allowed for the questions a section is still missing
+STRUCTURED_REPAIR_ATTEMPTS = int(os.getenv("STRUCTURED_REPAIR_ATTEMPTS", "1"))
+
+UNITS_SCHEMA = '{"units": ["<exact chapter or unit title>", ...]}'
+QUESTIONS_SCHEMA = (
+    '{"questions": [{"question": "<question text>", "unit": "<one of the selected units>", '
+    '"bloom": "<' + "|".join(BLOOM_LEVELS) + '>", "marks": <marks>}, ...]}'
+)
+
+NUMBERED_UNIT_RE = re.compile(r"\d+\.\s+.+")
+
+# One backslash escape: \uXXXX, \b or \f before a letter, \n \r or \t before a
+# lowercase letter, or a backslash and any single character
+BACKSLASH_RE = re.compile(r"\\(?:u[0-9a-fA-F]{4}|[bf][a-zA-Z]|[nrt][a-z]|.)", re.DOTALL)
+JSON_ESCAPE_RE = re.compile(r'\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})')
+
+def _escape_backslash(match):
+    escape = match.group(0)
+    return escape if JSON_ESCAPE_RE.fullmatch(escape) else "\\" + escape
+
+# Models write LaTeX with single backslashes, which JSON cannot carry: "\alpha"
+# is invalid and "\frac" silently decodes to a form feed and "rac". Double every
+# backslash that does not start a JSON escape, treating \b, \f, \n, \r and \t
+# followed by more letters (\beta, \frac, \nabla, \rho, \times) as LaTeX.
+def escape_latex_backslashes(text):
+    return BACKSLASH_RE.sub(_escape_backslash, text)
+
+# The first JSON object in the text, skipping any preamble or code fence.
+# Returns None when there is none.
+def extract_json(text):
+    text = escape_latex_backslashes(text)
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+            return value
+        except ValueError:
+            start = text.find("{", start + 1)
+    return None
+
+# Units from a JSON reply, falling back to numbered lines for plain-text replies
+def parse_units(text):
+    data = extract_json(text)
+    if isinstance(data, dict) and isinstance(data.get("units"), list):
+        return [" ".join(str(unit).split()) for unit in data["units"] if str(unit).strip()]
+    return [unit.strip() for unit in NUMBERED_UNIT_RE.findall(text) if unit.strip()]
+
+def _canonical(text):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(text).lower()).split())
+
+def _match_unit(unit, units):
+    # Models shorten or renumber titles, so containment either way counts
+    wanted = _canonical(unit)
+    for candidate in units:
+        canonical = _canonical(candidate)
+        if wanted and (wanted == canonical or wanted in canonical or canonical in wanted):
+            return candidate
+    return None
+
+class SectionValidation:
+    def __init__(self, part, questions, missing, invalid, uncovered_units):
+        self.part = part
+        # Valid question texts, at most the requested count
+        self.questions = questions
+        self.missing = missing
+        # (question, reason) for every rejected entry
+        self.invalid = invalid
+        self.uncovered_units = uncovered_units
+
+    @property
+    def ok(self):
+        return self.missing == 0 and not self.uncovered_units
+
+# Check a JSON question section against the request: marks, unit, Bloom's level,
+# duplicates and count. existing holds questions the paper already has.
+def validate_section(data, part, count, units, existing=()):
+    items = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return SectionValidation(part, [], count, [(None, "no questions array")], list(units) if count >= len(units) else [])
+
+    seen = {_canonical(question) for question in existing}
+    questions, invalid, covered = [], [], set()
+    for item in items:
+        text = item.get("question") if isinstance(item, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            invalid.append((item, "no question text"))
+            continue
+        text = text.strip()
+        marks = item.get("marks", PART_MARKS[part])
+        if str(marks).strip() != str(PART_MARKS[part]):
+            invalid.append((text, f"{marks} marks instead of {PART_MARKS[part]}"))
+            continue
+        bloom = item.get("bloom")
+        if bloom is not None and str(bloom).capitalize() not in BLOOM_LEVELS:
+            invalid.append((text, f"unknown Bloom's level {bloom!r}"))
+            continue
+        unit = item.get("unit")
+        matched = _match_unit(unit, units) if unit else None
+        if unit and matched is None:
+            invalid.append((text, f"unit {unit!r} is not selected"))
+            continue
+        if _canonical(text) in seen:
+            invalid.append((text, "duplicate question"))
+            continue
+        seen.add(_canonical(text))
+        if len(questions) < count:
+            questions.append(text)
+            if matched:
+                covered.add(matched)
+
+    # Coverage is only expected when there are at least as many questions as units
+    uncovered = [unit for unit in units if unit not in covered] if count >= len(units) else []
+    return SectionValidation(part, questions, count - len(questions), invalid, uncovered)
+
+class PaperValidation:
+    def __init__(self, missing, surplus):
+        self.missing = missing
+        self.surplus = surplus
+
+    @property
+    def ok(self):
+        return not any(self.missing.values()) and not any(self.surplus.values())
+
+    def summary(self):
+        issues = [f"Part {part} is missing {n} question(s)" for part, n in self.missing.items() if n]
+        issues += [f"Part {part} has {n} extra question(s)" for part, n in self.surplus.items() if n]
+        return "; ".join(issues)
+
+# Check a parsed paper ({"A": [...], ...}) against the requested part counts
+def validate_paper(parts, part_counts):
+    missing, surplus = {}, {}
+    for part in PART_ORDER:
+        wanted = int(part_counts.get(part, 0))
+        have = len(parts.get(part, []))
+        missing[part] = max(0, wanted - have)
+        surplus[part] = max(0, have - wanted)
+    return PaperValidation(missing, surplus)
@@ -0,0 +1,36 @@
+import threading
+import time
+
+from answer_pipeline import answer_questions_in_parallel, parse_questions
+
+PAPER = "Part A (2 marks each)\n1. Define a stack.\n2. Define a queue."
+
+def test_errors_are_not_retried():
+    calls = []
+
+    def answer(question):
+        calls.append(question.number)
+        if question.number == 2:
+            raise RuntimeError("model error")
+        return f"Answer {question.number}"
+
+    key = answer_questions_in_parallel(answer, parse_questions(PAPER), retries=2, timeout=5)
+    assert sorted(calls) == [1, 2]
+    assert "1. Answer 1" in key
+    assert "2. [Answer unavailable: model error]" in key
+
+def test_timed_out_questions_are_retried():
+    attempts = {}
+    lock = threading.Lock()
+
+    def answer(question):
+        with lock:
+            attempts[question.number] = attempts.get(question.number, 0) + 1
+            first = attempts[question.number] == 1
+        if question.number == 2 and first:
+            time.sleep(1)
+        return f"Answer {question.number}"
+
+    key = answer_questions_in_parallel(answer, parse_questions(PAPER), retries=1, timeout=0.3)
+    assert attempts[2] == 2
+    assert "2. Answer 2" in key
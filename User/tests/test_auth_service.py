@@ -0,0 +1,60 @@
+import os
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def auth_service():
+    pytest.importorskip("bcrypt")
+    import auth_service
+    return auth_service
+
+def test_copies_match_the_canonical_auth_service():
+    with open(os.path.join(ROOT, "auth_service.py"), "rb") as f:
+        canonical = f.read()
+    for app_dir in ("User", "login"):
+        with open(os.path.join(ROOT, app_dir, "auth_service.py"), "rb") as f:
+            assert f.read() == canonical, f"{app_dir}/auth_service.py differs from the root copy"
+
+def test_correct_and_wrong_passwords(auth_service):
+    users = {"alice": {"username": "alice", "password": auth_service.hash_password("secret", rounds=4)}}
+    service = auth_service.AuthService(users.get)
+    assert service.authenticate("alice", "secret") == users["alice"]
+    assert service.authenticate("alice", "wrong") is None
+    assert service.authenticate("bob", "secret") is None
+
+def test_saturated_pool_returns_busy(auth_service):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_matches(stored, given):
+        started.set()
+        release.wait(5)
+        return stored == given
+
+    users = {"alice": {"password": "secret"}}
+    service = auth_service.AuthService(users.get, matches=slow_matches, workers=1, max_pending=1, verify_timeout=5)
+    first = []
+    thread = threading.Thread(target=lambda: first.append(service.authenticate("alice", "secret")))
+    thread.start()
+    started.wait(5)
+    assert service.authenticate("alice", "secret") == auth_service.BUSY
+    release.set()
+    thread.join()
+    assert first == [users["alice"]]
+    assert service.authenticate("alice", "secret") == users["alice"]
+
+def test_timed_out_check_returns_busy_and_frees_its_slot(auth_service):
+    release = threading.Event()
+
+    def slow_matches(stored, given):
+        release.wait(5)
+        return stored == given
+
+    users = {"alice": {"password": "secret"}}
+    service = auth_service.AuthService(users.get, matches=slow_matches, workers=1, max_pending=2, verify_timeout=0.1)
+    assert service.authenticate("alice", "secret") == auth_service.BUSY
+    release.set()
+    assert service.authenticate("alice", "secret") == users["alice"]
+    assert service.stats()["busy"] == 1
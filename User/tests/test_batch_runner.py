@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+# batch_runner drives the app's build functions, so it needs the app's dependencies
+pytest.importorskip("streamlit")
+pytest.importorskip("boto3")
+pytest.importorskip("fpdf")
+import batch_runner
+from batch_runner import load_checkpoint, normalize_job
+
+def test_manifest_row_is_normalized():
+    job = normalize_job({
+        "subject": " Data Structures ",
+        "units": "Trees; Graphs;",
+        "part_a": "4",
+        "bloom": "Remember:40;Understand:30;Apply:30",
+        "answers": "No",
+    })
+    assert job["subject"] == "Data Structures"
+    assert job["units"] == ["Trees", "Graphs"]
+    assert (job["part_a"], job["part_b"], job["part_c"]) == (4, 5, 2)
+    assert job["bloom"] == {"Remember": 40, "Understand": 30, "Apply": 30, "Analyze": 0, "Evaluate": 0, "Create": 0}
+    assert job["answers"] is False
+    # The default id is a hash of the normalized job, so a re-run maps to the same id
+    assert normalize_job({"subject": "Data Structures", "units": ["Trees", "Graphs"], "part_a": 4,
+                          "bloom": job["bloom"], "answers": False})["id"] == job["id"]
+
+def test_bloom_percentages_must_total_100():
+    with pytest.raises(ValueError, match="must total 100%"):
+        normalize_job({"subject": "Maths", "bloom": "Remember:50;Apply:30"})
+
+def test_rerun_resumes_after_the_jobs_already_done(tmp_path, monkeypatch):
+    jobs = [normalize_job({"subject": f"Subject {i}", "id": f"job-{i}"}) for i in range(3)]
+    ran, failing = [], {"job-1"}
+
+    def run_job(job, out_dir):
+        ran.append(job["id"])
+        if job["id"] in failing:
+            failing.discard(job["id"])
+            raise RuntimeError("Question paper generation failed")
+        return {"paper_pdf": f"{job['id']}.pdf", "seconds": 0.0}
+
+    monkeypatch.setattr(batch_runner, "run_job", run_job)
+    # run_batch switches the app to batch priority
+    monkeypatch.setattr(batch_runner.app, "call_priority", batch_runner.app.call_priority)
+    summary = batch_runner.run_batch(jobs, str(tmp_path), max_jobs=2, per_minute=0)
+    assert (summary["papers"], summary["failures"]) == (2, 1)
+    assert sorted(load_checkpoint(str(tmp_path / "checkpoint.jsonl"))) == ["job-0", "job-2"]
+
+    ran.clear()
+    summary = batch_runner.run_batch(jobs, str(tmp_path), max_jobs=2, per_minute=0)
+    assert ran == ["job-1"]
+    assert (summary["papers"], summary["failures"]) == (1, 0)
+    with open(tmp_path / "checkpoint.jsonl", encoding="utf-8") as f:
+        statuses = [(record["id"], record["status"]) for record in map(json.loads, f)]
+    assert statuses.count(("job-1", "ok")) == 1
@@ -0,0 +1,33 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from context_prefetch import UnitContextCache
+
+def test_units_share_one_deadline():
+    release = threading.Event()
+
+    def retrieve(subject, unit):
+        release.wait(5)
+        return [{"text": unit, "score": 1.0}]
+
+    contexts = UnitContextCache(retrieve, ThreadPoolExecutor(max_workers=3), timeout=0.2)
+    started = time.monotonic()
+    assert contexts.passages("Maths", ["Unit 1", "Unit 2", "Unit 3"]) is None
+    assert time.monotonic() - started < 0.5
+    release.set()
+
+def test_passages_are_merged_best_first_and_failed_units_are_retried():
+    calls = []
+
+    def retrieve(subject, unit):
+        calls.append(unit)
+        if unit == "Unit 2" and calls.count(unit) == 1:
+            raise RuntimeError("retrieval failed")
+        return [{"text": f"{unit} low", "score": 0.1}, {"text": f"{unit} high", "score": 0.9}]
+
+    contexts = UnitContextCache(retrieve, ThreadPoolExecutor(max_workers=2), timeout=5)
+    assert contexts.passages("Maths", ["Unit 1", "Unit 2"]) is None
+    passages = contexts.passages("Maths", ["Unit 1", "Unit 2"])
+    assert [p["text"] for p in passages] == ["Unit 1 high", "Unit 1 low", "Unit 2 high", "Unit 2 low"]
+    assert calls.count("Unit 1") == 1
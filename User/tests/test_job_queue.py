@@ -0,0 +1,53 @@
+import time
+
+from job_queue import DONE, FAILED, FINISHED_STATES, QUEUED, JobQueue, JobStore
+
+def wait_for(queue, job_id, user, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id, user)
+        if job["status"] in FINISHED_STATES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_job_result_and_failure_are_stored(tmp_path):
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=2)
+    ok = queue.submit("alice", "paper", {"subject": "Maths"}, lambda progress: "Part A")
+    failed = queue.submit("alice", "answers", {}, lambda progress: 1 / 0)
+    assert wait_for(queue, ok, "alice")["result"] == "Part A"
+    assert wait_for(queue, failed, "alice")["status"] == FAILED
+    assert queue.get(ok, "bob") is None
+
+def test_job_metadata_is_stored_with_the_result(tmp_path):
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=1)
+
+    def run(progress):
+        progress.metadata["from_context"] = True
+        return "Part A"
+
+    tagged = queue.submit("alice", "paper", {}, run)
+    plain = queue.submit("alice", "paper", {}, lambda progress: "Part A")
+    assert wait_for(queue, tagged, "alice")["metadata"] == {"from_context": True}
+    assert wait_for(queue, plain, "alice")["metadata"] == {}
+
+def test_a_new_store_leaves_other_processes_live_jobs_alone(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = JobStore(path)
+    job_id = first.create("alice", "paper", {})
+    second = JobStore(path)
+    assert second.get(job_id, "alice")["status"] == QUEUED
+    first.finish(job_id, "Part A")
+    assert second.get(job_id, "alice")["status"] == DONE
+
+def test_jobs_whose_lease_ran_out_are_failed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    owner = JobStore(path, lease_seconds=0.2)
+    live = JobStore(path, lease_seconds=0.2)
+    abandoned = owner.create("alice", "paper", {})
+    renewed = live.create("alice", "paper", {})
+    time.sleep(0.3)
+    live.heartbeat()
+    assert live.expire() == 1
+    assert live.get(abandoned, "alice")["status"] == FAILED
+    assert live.get(renewed, "alice")["status"] == QUEUED
@@ -0,0 +1,53 @@
+import time
+
+from model_router import ModelProfile, ModelRouter, expected_answer_tokens
+
+HAIKU = "arn:haiku"
+SONNET = "arn:sonnet"
+
+def make_router(latency_slo=30, penalty_seconds=60):
+    # Fastest first, as the app configures it
+    return ModelRouter([
+        ModelProfile("haiku", HAIKU, first_token_seconds=0.5, tokens_per_second=150),
+        ModelProfile("sonnet", SONNET, first_token_seconds=1.5, tokens_per_second=50),
+    ], latency_slo=latency_slo, penalty_seconds=penalty_seconds)
+
+def test_preferred_model_is_used_within_the_slo_with_the_fast_model_as_fallback():
+    decision = make_router().choose("questions", SONNET, prompt_tokens=1000, output_tokens=500)
+    assert (decision.model, decision.fallback) == (SONNET, HAIKU)
+    assert decision.reason == "within SLO"
+
+def test_requests_too_large_for_the_slo_go_to_the_fastest_model_first():
+    output_tokens = expected_answer_tokens({"A": 10, "B": 5, "C": 2})
+    decision = make_router().choose("answers", SONNET, prompt_tokens=1000, output_tokens=output_tokens)
+    assert (decision.model, decision.fallback) == (HAIKU, SONNET)
+    assert "exceeds" in decision.reason
+
+def test_throttled_model_is_skipped_until_its_penalty_expires():
+    router = make_router(penalty_seconds=0.05)
+    router.record(SONNET, 1.0, 1000, 100, throttled=True)
+    decision = router.choose("questions", SONNET, prompt_tokens=1000, output_tokens=500)
+    assert (decision.model, decision.fallback) == (HAIKU, SONNET)
+
+    time.sleep(0.06)
+    assert router.choose("questions", SONNET, prompt_tokens=1000, output_tokens=500).model == SONNET
+
+def test_with_every_model_penalised_the_fastest_is_tried_first():
+    router = make_router()
+    router.record(SONNET, 1.0, 1000, 100, throttled=True)
+    router.record(HAIKU, 1.0, 1000, 100, throttled=True)
+    decision = router.choose("questions", SONNET, prompt_tokens=1000, output_tokens=500)
+    assert (decision.model, decision.fallback) == (HAIKU, SONNET)
+
+def test_slow_calls_penalise_the_model_and_update_its_rate():
+    router = make_router()
+    router.record(SONNET, 40.0, 0, 500)
+    snapshot = router.snapshot()["sonnet"]
+    assert snapshot["calls"] == 1
+    assert snapshot["tokens_per_second"] < 50
+    assert snapshot["penalised_for_seconds"] > 0
+    assert router.choose("questions", SONNET, prompt_tokens=0, output_tokens=100).model == HAIKU
+
+def test_unknown_models_are_not_routed():
+    decision = make_router().choose("questions", "arn:other", prompt_tokens=0, output_tokens=100)
+    assert (decision.model, decision.fallback) == ("arn:other", None)
@@ -0,0 +1,55 @@
+from paper_cache import PaperCache, PaperRequest, reuse_paper
+from paper_format import format_paper
+from response_cache import ResponseCache
+
+BLOOM = "Remember: 20%\nUnderstand: 20%\nApply: 20%\nAnalyze: 20%\nEvaluate: 10%\nCreate: 10%"
+NEAR_BLOOM = "Remember: 30%\nUnderstand: 10%\nApply: 20%\nAnalyze: 20%\nEvaluate: 10%\nCreate: 10%"
+FAR_BLOOM = "Remember: 60%\nUnderstand: 0%\nApply: 0%\nAnalyze: 20%\nEvaluate: 10%\nCreate: 10%"
+
+def request(part_a=2, part_b=1, part_c=1, bloom=BLOOM, units=("Trees", "Graphs"), subject="Data Structures"):
+    return PaperRequest.from_inputs(subject, list(units), part_a, part_b, part_c, bloom)
+
+def paper(part_a=2, part_b=1, part_c=1):
+    counts = {"A": part_a, "B": part_b, "C": part_c}
+    return format_paper({part: [f"Part {part} question {n}" for n in range(1, count + 1)] for part, count in counts.items()})
+
+def test_exact_request_is_served_regardless_of_unit_order_and_subject_case(tmp_path):
+    cache = PaperCache(str(tmp_path / "cache.db"))
+    assert cache.set(request(), paper())
+    match = cache.lookup(request(units=(" Graphs", "Trees"), subject="data structures"))
+    assert match.exact
+    assert match.paper == paper()
+    assert cache.stats()["exact_hits"] == 1
+
+def test_near_request_reports_the_questions_it_is_missing(tmp_path):
+    cache = PaperCache(str(tmp_path / "cache.db"), bloom_tolerance=20)
+    cache.set(request(), paper())
+    match = cache.lookup(request(part_a=4, bloom=NEAR_BLOOM))
+    assert not match.exact
+    assert match.missing == {"A": 2, "B": 0, "C": 0}
+    assert match.bloom_distance == 20
+
+    parts, missing = reuse_paper(match.paper, {"A": 4, "B": 1, "C": 0})
+    assert [len(parts[part]) for part in "ABC"] == [2, 1, 0]
+    assert missing == {"A": 2, "B": 0, "C": 0}
+
+def test_requests_beyond_the_bloom_tolerance_or_for_other_units_miss(tmp_path):
+    cache = PaperCache(str(tmp_path / "cache.db"), bloom_tolerance=20)
+    cache.set(request(), paper())
+    assert cache.lookup(request(bloom=FAR_BLOOM)) is None
+    assert cache.lookup(request(units=("Trees",))) is None
+    assert cache.stats()["misses"] == 2
+
+def test_papers_that_do_not_match_the_request_are_not_stored(tmp_path):
+    cache = PaperCache(str(tmp_path / "cache.db"))
+    assert not cache.set(request(), paper(part_a=1))
+    assert not cache.set(request(), paper(part_a=3))
+    assert cache.lookup(request()) is None
+    assert cache.stats()["entries"] == 0
+
+def test_papers_are_invalidated_by_a_later_ingestion(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = PaperCache(path)
+    cache.set(request(), paper())
+    ResponseCache(path).invalidate_subject("Data Structures")
+    assert cache.lookup(request()) is None
@@ -0,0 +1,38 @@
+import threading
+
+from paper_format import parse_paper
+from parallel_generation import generate_parts_in_parallel, merge_slices, plan_slices
+
+UNITS = ["Trees", "Graphs", "Sorting", "Hashing"]
+
+def test_sliced_parts_deal_units_round_robin():
+    slices = plan_slices({"A": 5, "B": 2, "C": 0}, UNITS, slice_size=2)
+    assert [(s.part, s.index, s.count) for s in slices] == [("A", 0, 2), ("A", 1, 2), ("A", 2, 1), ("B", 0, 2)]
+    assert [s.units for s in slices[:3]] == [["Trees", "Hashing"], ["Graphs"], ["Sorting"]]
+    assert slices[3].units == UNITS
+
+def slice_text(part_slice):
+    return "\n".join(f"{n}. {part_slice.part}{part_slice.index}-{n}" for n in range(1, part_slice.count + 1))
+
+def test_slices_are_merged_in_part_and_slice_order_whatever_finishes_first():
+    slices = plan_slices({"A": 4, "B": 2, "C": 1}, UNITS, slice_size=2)
+    # Later slices finish first: each waits for the slice after it
+    done = [threading.Event() for _ in slices]
+
+    def generate(part_slice):
+        position = slices.index(part_slice)
+        if position + 1 < len(slices):
+            assert done[position + 1].wait(5)
+        done[position].set()
+        return slice_text(part_slice)
+
+    progress = []
+    paper = generate_parts_in_parallel(generate, slices, max_workers=len(slices), on_progress=progress.append)
+    assert parse_paper(paper) == {"A": ["A0-1", "A0-2", "A1-1", "A1-2"], "B": ["B0-1", "B0-2"], "C": ["C0-1"]}
+    assert len(progress) == len(slices)
+    assert progress[-1] == paper
+
+def test_slices_contribute_at_most_the_questions_they_asked_for():
+    slices = plan_slices({"A": 2}, UNITS)
+    paper = merge_slices(slices, ["1. first\n2. second\n3. extra"])
+    assert parse_paper(paper) == {"A": ["first", "second"]}
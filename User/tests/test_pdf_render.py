@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+pytest.importorskip("fpdf")
+import pdf_render
+from pdf_render import PDF_UNICODE_FONT, render_pdf, render_pdf_cached
+
+TEXT = "1. Prove that Σ 1/n² → π²/6 — “Basel problem” (தமிழ், Ελληνικά)\n2. Explain x ≤ y ≠ z…"
+
+@pytest.mark.skipif(not os.path.exists(PDF_UNICODE_FONT), reason="Unicode font not installed")
+def test_non_ascii_text_renders_with_the_unicode_font():
+    pdf_bytes = render_pdf(TEXT, title="Maths – Question Paper")
+    assert pdf_bytes.startswith(b"%PDF")
+    # The TrueType font is embedded rather than falling back to a core font
+    assert b"FontFile2" in pdf_bytes
+
+def test_non_ascii_text_renders_without_a_unicode_font():
+    pdf_bytes = render_pdf(TEXT, title="Maths – Question Paper", unicode_font=None)
+    assert pdf_bytes.startswith(b"%PDF")
+
+def test_rerenders_of_the_same_document_come_from_the_cache(monkeypatch):
+    monkeypatch.setattr(pdf_render, "_cache", type(pdf_render._cache)())
+    first = render_pdf_cached("maths", TEXT, "Question Paper")
+    assert render_pdf_cached("maths", TEXT, "Question Paper") is first
+    assert render_pdf_cached("maths", TEXT, "Answer Key") is not first
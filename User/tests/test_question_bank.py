@@ -0,0 +1,50 @@
+import sqlite3
+import time
+
+from question_bank import BankWarmer, QuestionBank
+
+def make_bank(tmp_path):
+    return QuestionBank(str(tmp_path / "cache.db"))
+
+def make_warmer(bank, generate):
+    # A long poll interval keeps the background thread from picking up work itself
+    return BankWarmer(bank, generate, list_units=lambda subject: [], poll_seconds=3600)
+
+def record_ingestion(tmp_path, subject, completed_at):
+    conn = sqlite3.connect(str(tmp_path / "cache.db"))
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO ingestions (subject, completed_at) VALUES (?, ?)", (subject, completed_at))
+    conn.close()
+
+def test_partial_warmup_is_not_used(tmp_path):
+    bank = make_bank(tmp_path)
+
+    def generate(subject, unit, part):
+        if part == "C":
+            raise RuntimeError("throttled")
+        return [("Remember", f"Define {unit} for part {part}")]
+
+    make_warmer(bank, generate).warm("Data Structures", ["Unit 1 Lists"])
+    assert bank.stats()["questions"] == 2
+    assert not bank.has_subject("Data Structures")
+
+def test_complete_warmup_is_used_until_next_ingestion(tmp_path):
+    bank = make_bank(tmp_path)
+    make_warmer(bank, lambda subject, unit, part: [("Apply", f"Use {unit} in part {part}")]).warm(
+        "Data Structures", ["Unit 1 Lists"]
+    )
+    assert bank.has_subject("data structures")
+    record_ingestion(tmp_path, "data_structures", time.time() + 1)
+    assert not bank.has_subject("Data Structures")
+    assert bank.stale_subjects() == [("Data Structures", ["Unit 1 Lists"])]
+
+def test_prompts_get_the_display_name(tmp_path):
+    bank = make_bank(tmp_path)
+    subjects = []
+
+    def generate(subject, unit, part):
+        subjects.append(subject)
+        return [("Remember", f"Define {unit} for part {part}")]
+
+    make_warmer(bank, generate).warm("Data Structures", ["Unit 1 Lists"])
+    assert set(subjects) == {"Data Structures"}
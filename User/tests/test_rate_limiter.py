@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+
+import pytest
+
+from rate_limiter import BATCH, INTERACTIVE, LimiterRegistry, TokenBucketLimiter, call_with_limiter
+
+# Raises a ClientError-shaped error with the given code on the first `failures`
+# calls (or with probability `ratio`), then delegates to `fn`
+class ThrottlingFake:
+    def __init__(self, fn, failures=0, ratio=0.0, seed=None, code="ThrottlingException"):
+        self.fn = fn
+        self.failures = failures
+        self.ratio = ratio
+        self.code = code
+        self.calls = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            throttle = self.calls <= self.failures or self._random.random() < self.ratio
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            error = Exception("Rate exceeded")
+            error.response = {"Error": {"Code": self.code, "Message": "Rate exceeded"}}
+            raise error
+        return self.fn(*args, **kwargs)
+
+def test_interactive_waiters_overtake_queued_batch_work():
+    limiter = TokenBucketLimiter(rate=5, burst=1)
+    limiter.acquire()
+    order = []
+
+    def acquire(priority, name):
+        limiter.acquire(priority)
+        order.append(name)
+
+    threads = [threading.Thread(target=acquire, args=(BATCH, f"batch-{i}")) for i in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    interactive = threading.Thread(target=acquire, args=(INTERACTIVE, "interactive"))
+    interactive.start()
+    for thread in threads + [interactive]:
+        thread.join(timeout=5)
+    assert order == ["interactive", "batch-0", "batch-1"]
+
+def test_throttling_is_retried_and_lowers_the_rate():
+    limiter = TokenBucketLimiter(rate=100, burst=10)
+    fake = ThrottlingFake(lambda: "ok", failures=2)
+    assert call_with_limiter(limiter, fake, retries=3, backoff=0.001) == "ok"
+    assert fake.calls == 3
+    snapshot = limiter.snapshot()
+    assert snapshot["throttles"] == 2
+    # Halved twice, then raised by a tenth of the configured rate on success
+    assert snapshot["rate_per_second"] == pytest.approx(35)
+
+def test_transient_errors_are_retried_without_lowering_the_rate():
+    limiter = TokenBucketLimiter(rate=100, burst=10)
+    fake = ThrottlingFake(lambda: "ok", failures=1, code="ServiceUnavailableException")
+    assert call_with_limiter(limiter, fake, retries=3, backoff=0.001) == "ok"
+    assert fake.calls == 2
+    assert limiter.snapshot()["throttles"] == 0
+
+def test_retries_stop_after_the_limit_and_other_errors_are_not_retried():
+    limiter = TokenBucketLimiter(rate=100, burst=10)
+    fake = ThrottlingFake(lambda: "ok", failures=10)
+    with pytest.raises(Exception, match="Rate exceeded"):
+        call_with_limiter(limiter, fake, retries=2, backoff=0.001)
+    assert fake.calls == 3
+
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        call_with_limiter(limiter, fail, retries=2, backoff=0.001)
+    assert len(calls) == 1
+
+def test_queue_depth_and_wait_metrics():
+    limiter = TokenBucketLimiter(rate=20, burst=1)
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    snapshot = limiter.snapshot()
+    assert snapshot["acquired"] == 4
+    assert snapshot["queue_depth"] == 0
+    assert snapshot["peak_queue_depth"] >= 2
+    # Three of the four waited for a refill at 20 tokens/s
+    assert snapshot["max_wait_seconds"] >= 0.1
+    assert snapshot["mean_wait_seconds"] > 0
+
+def test_registry_configure_applies_to_existing_and_new_limiters():
+    registry = LimiterRegistry(rate=2, burst=4)
+    existing = registry.get("model-a")
+    registry.configure(0.5, 1)
+    assert existing.snapshot()["rate_per_second"] == 0.5
+    assert existing.burst == 1
+    assert registry.get("model-b").snapshot()["rate_per_second"] == 0.5
@@ -0,0 +1,22 @@
+from response_cache import ResponseCache, make_cache_key
+
+SONNET = "arn:aws:bedrock:us-east-1::foundation-model/anthropic.claude-3-sonnet-20240229-v1:0"
+HAIKU = "arn:aws:bedrock:us-east-1::foundation-model/anthropic.claude-3-haiku-20240307-v1:0"
+
+def test_entries_are_keyed_by_the_model_that_served_them(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    sonnet_key = make_cache_key("Maths", "kb", SONNET, "prompt")
+    haiku_key = make_cache_key("maths", "kb", HAIKU, "prompt")
+    assert sonnet_key != haiku_key
+    cache.set(haiku_key, "Maths", "1. Algebra")
+
+    assert cache.get(sonnet_key) is None
+    assert cache.get_any([sonnet_key, haiku_key]) == "1. Algebra"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_lookup_prefers_the_first_key(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    cache.set("preferred", "Maths", "from sonnet")
+    cache.set("other", "Maths", "from haiku")
+    assert cache.get_any(["preferred", "other"]) == "from sonnet"
+    assert cache.get_any(["missing", "other"]) == "from haiku"
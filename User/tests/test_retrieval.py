@@ -0,0 +1,131 @@
+import json
+import math
+import os
+import threading
+
+import retrieval
+from retrieval import HashingEmbedder, LocalFaissRetriever, normalize_subject
+
+def cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+def test_hashing_embedder_is_deterministic_and_normalised():
+    embedder = HashingEmbedder(dimension=64)
+    first, second = embedder.embed(["Binary search trees", "binary SEARCH trees!"])
+    assert len(first) == 64
+    assert first == second
+    assert math.isclose(math.sqrt(sum(v * v for v in first)), 1.0)
+    assert HashingEmbedder(dimension=64).embed(["Binary search trees"])[0] == first
+
+def test_hashing_embedder_ranks_overlapping_text_higher():
+    embedder = HashingEmbedder()
+    query, related, unrelated = embedder.embed([
+        "stack push pop operations", "push and pop on a stack", "photosynthesis in green plants"
+    ])
+    assert cosine(query, related) > cosine(query, unrelated)
+
+def test_empty_text_embeds_to_zero_vector():
+    assert HashingEmbedder(dimension=8).embed([""])[0] == [0.0] * 8
+
+def test_subjects_are_case_folded_like_the_response_cache():
+    assert normalize_subject(" Data Structures ") == "data_structures"
+
+# Stands in for the FAISS-backed index: records the manifest version it loaded
+class VersionedIndex:
+    def __init__(self, directory):
+        manifest = retrieval.read_manifest(directory)
+        self.version = manifest["version"] if manifest else None
+
+def write_manifest(directory, version):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, retrieval.MANIFEST_FILE), "w") as f:
+        json.dump({"version": version, "shards": []}, f)
+
+def test_loaded_index_is_reloaded_when_its_manifest_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "SubjectIndex", VersionedIndex)
+    directory = str(tmp_path / "data_structures")
+    write_manifest(directory, "v1")
+    retriever = LocalFaissRetriever(HashingEmbedder(), index_dir=str(tmp_path), refresh_seconds=0)
+    assert retriever._load("Data Structures").version == "v1"
+
+    write_manifest(directory, "v2")
+    assert retriever._load("Data Structures").version == "v2"
+
+def test_index_is_not_rechecked_within_the_refresh_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "SubjectIndex", VersionedIndex)
+    directory = str(tmp_path / "maths")
+    write_manifest(directory, "v1")
+    retriever = LocalFaissRetriever(HashingEmbedder(), index_dir=str(tmp_path), refresh_seconds=3600)
+    index = retriever._load("maths")
+    write_manifest(directory, "v2")
+    assert retriever._load("maths") is index
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.downloads = []
+
+    def get_object(self, Bucket, Key):
+        return {"Body": _Body(self.objects[Key])}
+
+    def download_file(self, bucket, key, path):
+        self.downloads.append(key)
+        with open(path, "wb") as f:
+            f.write(self.objects[key])
+
+class _Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+def publish(s3, subject, version):
+    prefix = f"{retrieval.LOCAL_INDEX_S3_PREFIX}/{subject}"
+    manifest = {"version": version, "shards": [{"file": "index.0000.faiss", "count": 1}]}
+    s3.objects[f"{prefix}/{retrieval.MANIFEST_FILE}"] = json.dumps(manifest).encode()
+    for name in ("index.0000.faiss", retrieval.CHUNKS_FILE, retrieval.OFFSETS_FILE):
+        s3.objects[f"{prefix}/{name}"] = version.encode()
+
+def test_newer_build_in_s3_is_downloaded_and_loaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "SubjectIndex", VersionedIndex)
+    s3 = FakeS3()
+    publish(s3, "maths", "v1")
+    retriever = LocalFaissRetriever(HashingEmbedder(), index_dir=str(tmp_path), s3_client=s3, bucket="b", refresh_seconds=0)
+    assert retriever._load("Maths").version == "v1"
+
+    s3.downloads.clear()
+    assert retriever._load("Maths").version == "v1"
+    assert s3.downloads == []
+
+    publish(s3, "maths", "v2")
+    assert retriever._load("Maths").version == "v2"
+    assert len(s3.downloads) == 3
+    # Each version is downloaded to its own directory; the superseded one is removed
+    with open(tmp_path / "maths.v2" / retrieval.CHUNKS_FILE) as f:
+        assert f.read() == "v2"
+    assert sorted(os.listdir(tmp_path)) == ["maths.v2"]
+
+def test_a_slow_download_does_not_block_other_subjects(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "SubjectIndex", VersionedIndex)
+    write_manifest(str(tmp_path / "physics"), "v1")
+    started, release = threading.Event(), threading.Event()
+
+    class SlowS3(FakeS3):
+        def download_file(self, bucket, key, path):
+            started.set()
+            release.wait(5)
+            super().download_file(bucket, key, path)
+
+    s3 = SlowS3()
+    publish(s3, "maths", "v1")
+    retriever = LocalFaissRetriever(HashingEmbedder(), index_dir=str(tmp_path), s3_client=s3, bucket="b")
+    thread = threading.Thread(target=retriever._load, args=("maths",))
+    thread.start()
+    started.wait(5)
+    try:
+        assert retriever._load("physics").version == "v1"
+    finally:
+        release.set()
+        thread.join()
+    assert retriever._load("maths").version == "v1"
@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+from single_flight import SingleFlight
+
+def test_concurrent_identical_calls_share_one_result():
+    flight = SingleFlight(lock_dir="")
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "paper"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("paper", "k", fn))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["paper"] * 3
+    assert len(calls) == 1
+
+def test_cross_process_waiter_reads_the_other_process_result(tmp_path):
+    # Two instances on one lock directory stand in for two server processes
+    cache = {}
+    started, release = threading.Event(), threading.Event()
+
+    def leader_call():
+        started.set()
+        release.wait(5)
+        cache["k"] = "paper"
+        return "paper"
+
+    leader = SingleFlight(lock_dir=str(tmp_path))
+    thread = threading.Thread(target=lambda: leader.do("paper", "k", leader_call, recheck=lambda: cache.get("k")))
+    thread.start()
+    started.wait(5)
+    threading.Timer(0.1, release.set).start()
+    waiter = SingleFlight(lock_dir=str(tmp_path), wait_seconds=5)
+    assert waiter.do("paper", "k", lambda: "own call", recheck=lambda: cache.get("k")) == "paper"
+    thread.join()
+    assert waiter.stats()["paper"]["cross_process_hits"] == 1
+    assert os.listdir(tmp_path) == []
+
+def test_cross_process_wait_is_bounded(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def stuck_call():
+        started.set()
+        release.wait(5)
+        return "paper"
+
+    leader = SingleFlight(lock_dir=str(tmp_path))
+    thread = threading.Thread(target=lambda: leader.do("paper", "k", stuck_call, recheck=lambda: None))
+    thread.start()
+    started.wait(5)
+    waiter = SingleFlight(lock_dir=str(tmp_path), wait_seconds=0.2)
+    began = time.monotonic()
+    assert waiter.do("paper", "k", lambda: "own call", recheck=lambda: None) == "own call"
+    assert time.monotonic() - began < 1
+    release.set()
+    thread.join()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,31 @@
+from streaming import FakeStreamBackend, estimate_tokens, stream_generation
+
+TEXT = "Part A (2 marks each)\n1. Define a stack.\n2. Define a queue.\n" * 4
+
+def test_fake_backend_replays_text_in_chunks():
+    backend = FakeStreamBackend(TEXT, chunk_size=10)
+    chunks = list(backend.stream({"input": {"text": "prompt"}}))
+    assert "".join(chunks) == TEXT
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert backend.queries == [{"input": {"text": "prompt"}}]
+
+def test_stream_generation_returns_text_and_stats():
+    backend = FakeStreamBackend(TEXT, chunk_size=8, first_chunk_delay=0.05)
+    text, stats = stream_generation(backend, {"input": {"text": "prompt"}})
+    assert text == TEXT
+    assert stats.chunks == len(range(0, len(TEXT), 8))
+    assert stats.tokens == estimate_tokens(TEXT)
+    assert stats.time_to_first_token >= 0.05
+    assert stats.as_dict()["tokens_per_second"] > 0
+
+def test_updates_are_throttled_and_end_with_the_full_text():
+    updates = []
+    backend = FakeStreamBackend(TEXT, chunk_size=4)
+    text, stats = stream_generation(backend, {}, on_text=updates.append, interval=60)
+    # The first chunk, then the full text
+    assert updates == [TEXT[:4], TEXT]
+
+    updates.clear()
+    stream_generation(backend, {}, on_text=updates.append, interval=0)
+    assert len(updates) == stats.chunks + 1
+    assert all(TEXT.startswith(update) for update in updates)
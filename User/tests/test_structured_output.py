@@ -0,0 +1,24 @@
+from structured_output import escape_latex_backslashes, extract_json, validate_section
+
+def test_single_backslash_latex_survives():
+    data = extract_json(r'{"questions": [{"question": "Show \alpha < \beta", "marks": 2}]}')
+    assert data["questions"][0]["question"] == r"Show \alpha < \beta"
+
+def test_latex_command_starting_with_a_json_escape_is_not_decoded():
+    data = extract_json(r'{"text": "Compute \frac{1}{2} and \nabla f \times \theta"}')
+    assert data["text"] == r"Compute \frac{1}{2} and \nabla f \times \theta"
+    assert "\x0c" not in data["text"]
+
+def test_double_escaped_latex_and_json_escapes_are_kept():
+    text = r'{"text": "Line\nNext \\frac{1}{2} \"q\" é"}'
+    assert extract_json(text)["text"] == 'Line\nNext \\frac{1}{2} "q" é'
+    assert escape_latex_backslashes(text) == text
+
+def test_latex_section_is_valid():
+    data = extract_json(
+        '```json\n{"questions": [{"question": "Evaluate \\int_0^1 \\frac{x}{2} dx", "unit": "Calculus",'
+        ' "bloom": "Apply", "marks": 2}]}\n```'
+    )
+    section = validate_section(data, "A", 1, ["Unit 1 Calculus"])
+    assert section.ok
+    assert section.questions == [r"Evaluate \int_0^1 \frac{x}{2} dx"]
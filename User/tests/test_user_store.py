@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from user_store import SqliteUserStore, UserStore, migrate_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def test_copies_match_the_canonical_user_store():
+    with open(os.path.join(ROOT, "user_store.py"), "rb") as f:
+        canonical = f.read()
+    for app_dir in ("User", "login"):
+        with open(os.path.join(ROOT, app_dir, "user_store.py"), "rb") as f:
+            assert f.read() == canonical, f"{app_dir}/user_store.py differs from the root copy"
+
+def test_user_store_is_abstract():
+    with pytest.raises(TypeError):
+        UserStore()
+
+def test_sqlite_store_create_is_atomic_and_upsert_replaces(tmp_path):
+    store = SqliteUserStore(str(tmp_path / "users.db"))
+    assert store.create({"username": "alice", "password": "h1", "role": "admin", "email": "a@x"})
+    assert not store.create({"username": "alice", "password": "h2"})
+    store.upsert({"username": "alice", "password": "h3"})
+    assert store.get("alice") == {"username": "alice", "password": "h3", "role": "user"}
+    assert store.get("bob") is None
+
+def test_json_users_are_migrated_once(tmp_path):
+    path = tmp_path / "credentials.json"
+    path.write_text('{"alice": {"password": "h1", "role": "user"}, "bob": {"password": "h2"}}')
+    store = SqliteUserStore(str(tmp_path / "users.db"))
+    assert migrate_json(str(path), store) == (2, 0)
+    assert migrate_json(str(path), store) == (0, 2)
+    assert store.count() == 2
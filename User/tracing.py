@@ -0,0 +1,287 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# ---------- Tracing Configuration ----------
+# Comma-separated exporters: log, otlp_file, prometheus (spans are always aggregated in memory)
+TRACE_EXPORTERS = [name.strip() for name in os.getenv("TRACE_EXPORTERS", "").split(",") if name.strip()]
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "/tmp/au_ai_traces.log")
+TRACE_OTLP_PATH = os.getenv("TRACE_OTLP_PATH", "/tmp/au_ai_traces.otlp.jsonl")
+TRACE_PROMETHEUS_PORT = int(os.getenv("TRACE_PROMETHEUS_PORT", "9464"))
+
+# Span duration histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Numeric attributes summed per span name and exported as counters
+COUNTED_ATTRIBUTES = ("prompt_tokens", "output_tokens", "citations", "bytes")
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def new_trace_id():
+    return os.urandom(16).hex()
+
+# Make trace_id the trace for spans started in this context (one per Streamlit session)
+def set_trace(trace_id):
+    _trace_id.set(trace_id)
+
+def current_trace():
+    return _trace_id.get()
+
+# Wrap fn so it runs under the caller's trace when called on a worker thread
+def propagate(fn):
+    trace_id = _trace_id.get()
+
+    def run(*args, **kwargs):
+        token = _trace_id.set(trace_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _trace_id.reset(token)
+    return run
+
+class Span:
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def seconds(self):
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent is not None else (_trace_id.get() or new_trace_id())
+        self.parent_id = parent.span_id if parent is not None else None
+        self.span_id = os.urandom(8).hex()
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = type(exc).__name__
+        self.tracer.finish(self)
+        return False
+
+# Add to a counter on the innermost open span, if any
+def add_to_current_span(key, amount=1):
+    span = _current_span.get()
+    if span is not None:
+        span.add(key, amount)
+
+# ---------- Aggregation ----------
+class SpanMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def record(self, span):
+        seconds = span.seconds
+        with self._lock:
+            series = self._series.get(span.name)
+            if series is None:
+                series = self._series[span.name] = {
+                    "count": 0, "errors": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS),
+                    "totals": dict.fromkeys(COUNTED_ATTRIBUTES, 0),
+                }
+            series["count"] += 1
+            series["sum"] += seconds
+            if span.error:
+                series["errors"] += 1
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+                    break
+            for key in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(key)
+                if isinstance(value, (int, float)):
+                    series["totals"][key] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    "count": s["count"], "errors": s["errors"],
+                    "mean_seconds": s["sum"] / s["count"] if s["count"] else 0.0,
+                    **{key: value for key, value in s["totals"].items() if value},
+                }
+                for name, s in self._series.items()
+            }
+
+    # Prometheus text exposition format
+    def render_prometheus(self, service):
+        with self._lock:
+            series = {name: {**s, "buckets": list(s["buckets"]), "totals": dict(s["totals"])} for name, s in self._series.items()}
+        lines = [
+            "# TYPE au_ai_span_duration_seconds histogram",
+        ]
+        for name, s in sorted(series.items()):
+            labels = f'service="{service}",span="{name}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, s["buckets"]):
+                cumulative += count
+                lines.append(f'au_ai_span_duration_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'au_ai_span_duration_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+            lines.append(f"au_ai_span_duration_seconds_sum{{{labels}}} {s['sum']:.6f}")
+            lines.append(f"au_ai_span_duration_seconds_count{{{labels}}} {s['count']}")
+        lines.append("# TYPE au_ai_span_errors_total counter")
+        for name, s in sorted(series.items()):
+            lines.append(f'au_ai_span_errors_total{{service="{service}",span="{name}"}} {s["errors"]}')
+        for key in COUNTED_ATTRIBUTES:
+            lines.append(f"# TYPE au_ai_{key}_total counter")
+            for name, s in sorted(series.items()):
+                if s["totals"][key]:
+                    lines.append(f'au_ai_{key}_total{{service="{service}",span="{name}"}} {s["totals"][key]}')
+        return "\n".join(lines) + "\n"
+
+# ---------- Exporters ----------
+# One JSON object per finished span
+class LogFileExporter:
+    def __init__(self, path=TRACE_LOG_PATH):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span, service):
+        record = {
+            "service": service, "trace_id": span.trace_id, "span_id": span.span_id, "parent_id": span.parent_id,
+            "name": span.name, "start": span.start_ns / 1e9, "seconds": round(span.seconds, 6),
+            "error": span.error, **span.attributes,
+        }
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+# OTLP/JSON trace requests, one per line, as written by the OpenTelemetry
+# Collector file exporter, so the file can be replayed into any OTLP backend
+class OtlpFileExporter:
+    def __init__(self, path=TRACE_OTLP_PATH):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span, service):
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 3,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+            "scopeSpans": [{"scope": {"name": "au_ai.tracing"}, "spans": [otlp_span]}],
+        }]}
+        line = json.dumps(request, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+# Serves the aggregated metrics at http://<host>:<port>/metrics
+class PrometheusExporter:
+    def __init__(self, tracer, port=TRACE_PROMETHEUS_PORT):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = tracer.metrics.render_prometheus(tracer.service).encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=self.server.serve_forever, name="prometheus-exporter", daemon=True).start()
+
+    def export(self, span, service):
+        # Scraped from the shared aggregate instead of pushed per span
+        pass
+
+# ---------- Tracer ----------
+class Tracer:
+    def __init__(self, service, exporters=()):
+        self.service = service
+        self.metrics = SpanMetrics()
+        self.exporters = list(exporters)
+
+    def span(self, name, **attributes):
+        return Span(self, name, attributes)
+
+    def finish(self, span):
+        self.metrics.record(span)
+        for exporter in self.exporters:
+            try:
+                exporter.export(span, self.service)
+            except Exception:
+                logger.exception("Trace exporter %s failed", type(exporter).__name__)
+
+_tracer = Tracer("au_ai")
+_init_lock = threading.Lock()
+_initialised = False
+
+# Name the service and start the configured exporters; later calls are no-ops,
+# so it is safe to call on every Streamlit rerun
+def init_tracing(service, exporters=None):
+    global _initialised
+    with _init_lock:
+        if _initialised:
+            return _tracer
+        _tracer.service = service
+        for name in exporters if exporters is not None else TRACE_EXPORTERS:
+            try:
+                if name == "log":
+                    _tracer.exporters.append(LogFileExporter())
+                elif name == "otlp_file":
+                    _tracer.exporters.append(OtlpFileExporter())
+                elif name == "prometheus":
+                    _tracer.exporters.append(PrometheusExporter(_tracer))
+                else:
+                    logger.warning("Unknown trace exporter %r", name)
+            except OSError as e:
+                logger.warning("Trace exporter %s could not start: %s", name, e)
+        _initialised = True
+        return _tracer
+
+def get_tracer():
+    return _tracer
+
+# Time a block: `with span("pdf.render", bytes=n) as s: ...`
+def span(name, **attributes):
+    return Span(_tracer, name, attributes)
+
+def trace_stats():
+    return _tracer.metrics.snapshot()
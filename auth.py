@@ -1,26 +1,20 @@
 import streamlit as st
-import json
-import bcrypt
-import os
+from auth_service import BUSY, AuthService, hash_password
+from user_store import SqliteUserStore, migrate_json
 
 CREDENTIALS_FILE = "credentials.json"
 
-def load_credentials():
-    if not os.path.exists(CREDENTIALS_FILE):
-        with open(CREDENTIALS_FILE, "w") as f:
-            json.dump({"users": []}, f)
-    with open(CREDENTIALS_FILE, "r") as f:
-        return json.load(f)
+# Users live in SQLite; the first start imports any existing credentials.json
+@st.cache_resource
+def get_user_store():
+    store = SqliteUserStore()
+    if store.count() == 0:
+        migrate_json(CREDENTIALS_FILE, store)
+    return store
 
-def save_credentials(creds):
-    with open(CREDENTIALS_FILE, "w") as f:
-        json.dump(creds, f, indent=4)
-
-def hash_password(password):
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-
-def verify_password(password, hashed):
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+@st.cache_resource
+def get_auth_service():
+    return AuthService(get_user_store().get)
 
 def register():
     st.subheader("📝 Register")
@@ -28,16 +22,15 @@ def register():
     password = st.text_input("Password", type="password")
     role = st.selectbox("Role", ["admin", "user"])
     if st.button("Register"):
-        creds = load_credentials()
-        if any(u["username"] == username for u in creds["users"]):
-            st.warning("🚫 Username already exists.")
-            return
-        creds["users"].append({
+        created = get_user_store().create({
             "username": username,
             "password": hash_password(password),
             "role": role
         })
-        save_credentials(creds)
+        if not created:
+            st.warning("🚫 Username already exists.")
+            return
+        get_auth_service().invalidate(username)
         st.success("✅ Registered! Please login.")
 
 def login():
@@ -45,9 +38,10 @@ def login():
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
     if st.button("Login"):
-        creds = load_credentials()
-        user = next((u for u in creds["users"] if u["username"] == username), None)
-        if user and verify_password(password, user["password"]):
+        user = get_auth_service().authenticate(username, password)
+        if user == BUSY:
+            st.warning("⏳ Too many logins right now. Please try again in a moment.")
+        elif user:
             st.session_state.logged_in = True
             st.session_state.username = username
             st.session_state.role = user["role"]
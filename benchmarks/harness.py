@@ -0,0 +1,239 @@
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# ---------- Injected Latency ----------
+# Sleeps mean ± jitter milliseconds per call, seeded so runs are comparable
+class Latency:
+    def __init__(self, mean_ms, jitter_ms=0.0, seed=0):
+        self.mean = mean_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            delay = self.mean + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+# ---------- Replay Clients ----------
+# Stand-ins for the boto3 clients the apps use, answering from recorded responses
+class ReplayCounter:
+    def __init__(self):
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def count(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+
+class ReplayBedrockAgentRuntime(ReplayCounter):
+    def __init__(self, latency, fixtures=None):
+        super().__init__()
+        self.latency = latency
+        fixtures = fixtures or load_fixture("bedrock_agent_runtime.json")
+        self.fixtures = fixtures["retrieve_and_generate"]
+        self.retrieval = fixtures["retrieve"]
+
+    def _match(self, prompt):
+        # First recorded response whose marker appears in the prompt
+        return next(f for f in self.fixtures if f["match"] in prompt)
+
+    def retrieve(self, **query):
+        self.count("retrieve")
+        self.latency.wait()
+        return self.retrieval
+
+    def retrieve_and_generate(self, **query):
+        self.count("retrieve_and_generate")
+        fixture = self._match(query["input"]["text"])
+        self.latency.wait()
+        return {"output": {"text": fixture["text"]}, "citations": fixture["citations"]}
+
+    def retrieve_and_generate_stream(self, **query):
+        self.count("retrieve_and_generate_stream")
+        fixture = self._match(query["input"]["text"])
+        self.latency.wait()
+        text = fixture["text"]
+        events = [{"output": {"text": text[i:i + 64]}} for i in range(0, len(text), 64)]
+        events += [{"citation": {"citation": c}} for c in fixture["citations"]]
+        return {"stream": iter(events)}
+
+# Direct model calls answer with the text recorded for the same prompt through
+# retrieve_and_generate; the prompt then also carries the retrieved passages
+class ReplayBedrockRuntime(ReplayCounter):
+    def __init__(self, latency, fixtures=None, responses=None):
+        super().__init__()
+        self.latency = latency
+        self.usage = (fixtures or load_fixture("bedrock_runtime.json"))["invoke_model_usage"]
+        self.responses = responses or load_fixture("bedrock_agent_runtime.json")["retrieve_and_generate"]
+
+    def _text(self, body):
+        prompt = json.loads(body)["messages"][0]["content"][0]["text"]
+        return next(f for f in self.responses if f["match"] in prompt)["text"]
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self.count("invoke_model")
+        text = self._text(body)
+        self.latency.wait()
+        payload = {"content": [{"type": "text", "text": text}], "usage": self.usage}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        self.count("invoke_model_with_response_stream")
+        text = self._text(body)
+        self.latency.wait()
+        chunks = [{"type": "content_block_delta", "delta": {"text": text[i:i + 64]}} for i in range(0, len(text), 64)]
+        return {"body": iter({"chunk": {"bytes": json.dumps(chunk).encode("utf-8")}} for chunk in chunks)}
+
+class ReplayBedrockAgent(ReplayCounter):
+    def __init__(self, latency, fixtures=None):
+        super().__init__()
+        self.latency = latency
+        self.fixtures = fixtures or load_fixture("bedrock_agent.json")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def list_ingestion_jobs(self, **kwargs):
+        self.count("list_ingestion_jobs")
+        self.latency.wait()
+        return self.fixtures["list_ingestion_jobs"]
+
+    def start_ingestion_job(self, **kwargs):
+        self.count("start_ingestion_job")
+        self.latency.wait()
+        with self._lock:
+            self._next_id += 1
+            job_id = f"{self.fixtures['start_ingestion_job']['ingestionJob']['ingestionJobId']}-{self._next_id}"
+            self._jobs[job_id] = 0
+        return {"ingestionJob": {"ingestionJobId": job_id, "status": "STARTING"}}
+
+    # Each poll of a job advances it through the recorded status sequence
+    def get_ingestion_job(self, ingestionJobId, **kwargs):
+        self.count("get_ingestion_job")
+        self.latency.wait()
+        statuses = self.fixtures["get_ingestion_job_statuses"]
+        with self._lock:
+            step = self._jobs.get(ingestionJobId, len(statuses) - 1)
+            self._jobs[ingestionJobId] = step + 1
+        return {"ingestionJob": {"ingestionJobId": ingestionJobId, "status": statuses[min(step, len(statuses) - 1)]}}
+
+class ReplayS3(ReplayCounter):
+    def __init__(self, latency, fixtures=None):
+        super().__init__()
+        self.latency = latency
+        self.fixtures = fixtures or load_fixture("s3.json")
+
+    def head_object(self, **kwargs):
+        self.count("head_object")
+        self.latency.wait()
+        raise ClientError(self.fixtures["head_object_missing"], "HeadObject")
+
+    def put_object(self, **kwargs):
+        self.count("put_object")
+        self.latency.wait()
+        return self.fixtures["put_object"]
+
+    def create_multipart_upload(self, **kwargs):
+        self.count("create_multipart_upload")
+        self.latency.wait()
+        return self.fixtures["create_multipart_upload"]
+
+    def upload_part(self, **kwargs):
+        self.count("upload_part")
+        self.latency.wait()
+        return self.fixtures["upload_part"]
+
+    def list_parts(self, **kwargs):
+        self.count("list_parts")
+        self.latency.wait()
+        return {"Parts": [], "IsTruncated": False}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.count("complete_multipart_upload")
+        self.latency.wait()
+        return self.fixtures["complete_multipart_upload"]
+
+# ---------- Measurement ----------
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+# Run operation(i) for i in range(iterations) on `concurrency` threads and
+# summarise throughput and latency. An operation fails by raising or by
+# returning a falsy value.
+def run_scenario(operation, concurrency, iterations):
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def timed(i):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            ok = bool(operation(i))
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(iterations)))
+    elapsed = time.perf_counter() - started
+    return {
+        "iterations": iterations,
+        "failures": failures,
+        "throughput_per_second": iterations / elapsed if elapsed > 0 else 0.0,
+        "p50_seconds": percentile(latencies, 50),
+        "p95_seconds": percentile(latencies, 95),
+        "p99_seconds": percentile(latencies, 99),
+    }
+
+# ---------- Baseline ----------
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+# Results worse than the baseline by more than `tolerance` (a fraction):
+# lower throughput or higher p95 latency. Returns a list of messages.
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for key, result in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["throughput_per_second"] < base["throughput_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: throughput {result['throughput_per_second']:.2f}/s "
+                f"vs baseline {base['throughput_per_second']:.2f}/s"
+            )
+        if result["p95_seconds"] > base["p95_seconds"] * (1 + tolerance):
+            regressions.append(
+                f"{key}: p95 {result['p95_seconds'] * 1000:.0f}ms vs baseline {base['p95_seconds'] * 1000:.0f}ms"
+            )
+        if result["failures"] > base.get("failures", 0):
+            regressions.append(f"{key}: {result['failures']} failure(s) vs baseline {base.get('failures', 0)}")
+    return regressions
@@ -0,0 +1,198 @@
+# Offline benchmarks for the generation and ingestion paths, replaying recorded
+# Bedrock and S3 responses with injected latency.
+#
+#   python benchmarks/run_benchmarks.py --concurrency 1,4,16,64 --save-baseline benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --concurrency 1,4,16,64 --baseline benchmarks/baseline.json
+#
+# With --baseline the run exits 1 when a scenario's throughput drops or its p95
+# latency rises by more than --tolerance against the stored results.
+#
+# Each suite runs in its own subprocess: User/ and Admin/ have modules of the
+# same name (tracing, aws_clients), so they cannot share one sys.path.
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+import harness
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER_SCENARIOS = ["units", "questions", "answers", "pdf", "retrieve", "questions_context"]
+ADMIN_SCENARIOS = ["upload", "sync"]
+
+BLOOM_TEXT = "Remember: 20%\nUnderstand: 20%\nApply: 20%\nAnalyze: 20%\nEvaluate: 10%\nCreate: 10%"
+
+# The apps read their configuration at import time, so state goes to a scratch
+# directory and background work that would add unreplayed calls is switched off
+def configure_environment(args, scratch):
+    os.environ.update({
+        "BUCKET_NAME": "benchmark-bucket",
+        "RESPONSE_CACHE_PATH": os.path.join(scratch, "response_cache.db"),
+        "UPLOAD_MANIFEST_PATH": os.path.join(scratch, "upload_manifest.json"),
+        "UPLOAD_STATE_DIR": os.path.join(scratch, "uploads"),
+        "JOB_DB_PATH": os.path.join(scratch, "jobs.db"),
+        "TRACE_LOG_PATH": os.path.join(scratch, "traces.log"),
+        "TRACE_OTLP_PATH": os.path.join(scratch, "traces.otlp.jsonl"),
+        "LOCAL_INDEX_DIR": os.path.join(scratch, "faiss"),
+        "QUESTION_BANK": "false",
+        "RETRIEVAL_BACKEND": "knowledge_base",
+        "MODEL_RATE_PER_SECOND": str(args.model_rate),
+        "MODEL_BURST": str(max(1, int(args.model_rate))),
+    })
+    # Streamlit warns on every call made outside `streamlit run`
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+def user_scenarios(args):
+    sys.path.insert(0, os.path.join(ROOT, "User"))
+    import app
+    from pdf_render import convert_text_to_pdf
+
+    runtime = harness.ReplayBedrockAgentRuntime(
+        harness.Latency(args.model_latency_ms, args.jitter_ms, seed=args.seed)
+    )
+    model_runtime = harness.ReplayBedrockRuntime(harness.Latency(args.model_latency_ms, args.jitter_ms, seed=args.seed))
+    app.bedrock_agent_runtime = runtime
+    app.generation_agent_runtime = runtime
+    app.get_generation_runtime = lambda: model_runtime
+
+    units = app.extract_units_from_knowledge_base("benchmark_warmup")
+    paper = app.generate_exam_questions("benchmark", units, 10, 5, 2, BLOOM_TEXT)
+    passages = app.retrieve_unit_passages("benchmark", units[0])
+
+    return [runtime, model_runtime], {
+        # A new subject each time, so the unit cache never answers
+        "units": lambda i: app.extract_units_from_knowledge_base(f"benchmark_{args.run_id}_{i}"),
+        "questions": lambda i: app.generate_exam_questions(f"benchmark_{i}", units, 10, 5, 2, BLOOM_TEXT),
+        "answers": lambda i: app.generate_answers_for_questions(f"benchmark_{i}", paper, app.knowledge_base_id, app.model_arn),
+        # Distinct text each time, so the rendered-PDF cache never answers
+        "pdf": lambda i: convert_text_to_pdf(f"benchmark_{i}", f"{paper}\n\n{args.run_id}-{i}", "Question Paper").getbuffer().nbytes,
+        # The CONTEXT_PREFETCH path: retrieve-only queries, then direct model calls
+        "retrieve": lambda i: app.retrieve_unit_passages(f"benchmark_{i}", units[i % len(units)]),
+        "questions_context": lambda i: app.generate_exam_questions(
+            f"benchmark_context_{i}", units, 10, 5, 2, BLOOM_TEXT, context=passages
+        ),
+    }
+
+def admin_scenarios(args):
+    sys.path.insert(0, os.path.join(ROOT, "Admin"))
+    import admin
+    from job_tracker import JobTracker
+
+    s3 = harness.ReplayS3(harness.Latency(args.s3_latency_ms, args.jitter_ms, seed=args.seed))
+    agent = harness.ReplayBedrockAgent(harness.Latency(args.kb_latency_ms, args.jitter_ms, seed=args.seed))
+    admin.s3_client = s3
+    admin.bedrock_agent_client = agent
+    tracker = JobTracker(admin.fetch_ingestion_status, min_interval=args.poll_seconds, max_interval=args.poll_seconds * 4)
+    admin.get_job_tracker = lambda: tracker
+
+    payload = os.urandom(int(args.upload_mb * 1024 * 1024))
+
+    def upload(i):
+        # Distinct content and key each time, so nothing is skipped as unchanged
+        data = f"{args.run_id}-{i}".encode() + payload
+        return admin.upload_if_changed(f"knowledgebase/benchmark_{args.run_id}_{i}/benchmark.pdf", data)
+
+    def sync(i):
+        job_id = admin.sync_knowledge_base()
+        if not job_id:
+            return False
+        for status in admin.track_ingestion_job(job_id):
+            if status in ("COMPLETE", "FAILED"):
+                return status == "COMPLETE"
+        return False
+
+    return [s3, agent], {"upload": upload, "sync": sync}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded Bedrock/S3 responses through the app code paths")
+    parser.add_argument("--suite", choices=["user", "admin", "all"], default="all")
+    parser.add_argument("--scenarios", default=None, help=f"comma-separated subset of {USER_SCENARIOS + ADMIN_SCENARIOS}")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma-separated concurrency levels")
+    parser.add_argument("--iterations", type=int, default=64, help="operations per scenario and level (at least the concurrency)")
+    parser.add_argument("--model-latency-ms", type=float, default=800.0, help="injected model call latency")
+    parser.add_argument("--kb-latency-ms", type=float, default=100.0, help="injected ingestion API latency")
+    parser.add_argument("--s3-latency-ms", type=float, default=30.0, help="injected S3 call latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform ± jitter added to every injected latency")
+    parser.add_argument("--upload-mb", type=float, default=1.0, help="upload size; above S3_PART_SIZE_MB uses multipart")
+    parser.add_argument("--poll-seconds", type=float, default=0.05, help="ingestion status poll interval")
+    parser.add_argument("--model-rate", type=float, default=1000.0,
+                        help="per-model limiter rate (req/s); the high default measures the app, not the limiter")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=None, help="fail on regressions against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression as a fraction (default 0.2)")
+    parser.add_argument("--save-baseline", default=None, help="write this run's results as the new baseline")
+    # Set by the parent process for each suite's subprocess
+    parser.add_argument("--worker", choices=["user", "admin"], default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--run-id", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--scratch", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--results-file", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+# Runs one suite's scenarios in this process, printing a row per result, and
+# writes the results to args.results_file
+def run_worker(args):
+    configure_environment(args, args.scratch)
+    clients, operations = user_scenarios(args) if args.worker == "user" else admin_scenarios(args)
+
+    wanted = set(args.scenarios.split(",")) if args.scenarios else None
+    results = {}
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    for name, operation in operations.items():
+        if wanted and name not in wanted:
+            continue
+        for concurrency in levels:
+            result = harness.run_scenario(operation, concurrency, max(args.iterations, concurrency))
+            key = f"{args.worker}/{name}@{concurrency}"
+            results[key] = result
+            print(
+                f"{args.worker + '/' + name:<24}{concurrency:>5}{result['throughput_per_second']:>10.2f}"
+                f"{result['p50_seconds'] * 1000:>10.0f}{result['p95_seconds'] * 1000:>10.0f}"
+                f"{result['p99_seconds'] * 1000:>10.0f}{result['failures']:>6}",
+                flush=True
+            )
+
+    for client in clients:
+        print(f"Replayed {type(client).__name__}: {client.calls}", flush=True)
+    with open(args.results_file, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+def main():
+    args = parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    run_id = os.urandom(4).hex()
+    scratch = tempfile.mkdtemp(prefix="au_ai_bench_")
+    suites = ["user", "admin"] if args.suite == "all" else [args.suite]
+
+    results = {}
+    print(f"{'scenario':<24}{'conc':>5}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fail':>6}", flush=True)
+    for suite in suites:
+        results_file = os.path.join(scratch, f"{suite}_results.json")
+        command = [
+            sys.executable, os.path.abspath(__file__), *sys.argv[1:],
+            "--worker", suite, "--run-id", run_id, "--scratch", scratch, "--results-file", results_file,
+        ]
+        if subprocess.run(command).returncode != 0:
+            raise SystemExit(f"The {suite} suite failed")
+        with open(results_file, "r", encoding="utf-8") as f:
+            results.update(json.load(f))
+
+    if args.save_baseline:
+        harness.save_baseline(args.save_baseline, results)
+        print(f"Baseline written to {args.save_baseline}")
+    if args.baseline:
+        regressions = harness.find_regressions(results, harness.load_baseline(args.baseline), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,19 @@
 import streamlit as st
-import boto3
 from botocore.exceptions import ClientError
-import bcrypt
+from aws_clients import get_resource
+from auth_service import BUSY, AuthService, hash_password
+from user_store import DynamoUserStore
 
 # AWS DynamoDB Setup
-dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+dynamodb = get_resource('dynamodb', region_name='us-east-1')
 users_table = dynamodb.Table('users')
+user_store = DynamoUserStore(users_table)
 
-# Password utilities
-def hash_password(password):
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
-
-def check_password(stored_password, input_password):
-    return bcrypt.checkpw(input_password.encode('utf-8'), stored_password.encode('utf-8'))
+# Login verification with cached user records and pooled bcrypt checks,
+# shared by every session in this process
+@st.cache_resource
+def get_auth_service():
+    return AuthService(user_store.get)
 
 # Inject refined CSS
 def set_business_ui():
@@ -92,16 +92,16 @@ def register():
                 st.warning("All fields are required.")
                 return
             try:
-                response = users_table.get_item(Key={'email': email, 'role': role})
-                if 'Item' in response:
-                    st.error("User already exists with this email and role.")
-                    return
-                users_table.put_item(Item={
+                created = user_store.create({
                     'email': email,
                     'role': role,
                     'name': name,
                     'password': hash_password(password)
                 })
+                if not created:
+                    st.error("User already exists with this email and role.")
+                    return
+                get_auth_service().invalidate((email, role))
                 st.success("Registration successful. Please log in.")
             except ClientError as e:
                 st.error(f"DynamoDB error: {e.response['Error']['Message']}")
@@ -121,9 +121,10 @@ def login():
 
         if submit:
             try:
-                response = users_table.get_item(Key={'email': email, 'role': role})
-                user = response.get('Item')
-                if user and check_password(user['password'], password):
+                user = get_auth_service().authenticate((email, role), password)
+                if user == BUSY:
+                    st.warning("Too many logins right now. Please try again in a moment.")
+                elif user:
                     st.success(f"Welcome, {user['name']} ({role})")
                     # Set the session state
                     st.session_state.user = {
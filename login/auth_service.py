@@ -0,0 +1,127 @@
+# Canonical copy: auth_service.py at the repository root. User/ and login/ are
+# deployed on their own, so each carries a byte-identical copy; edit this file
+# and copy it over both.
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+# ---------- Auth Service Configuration ----------
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+VERIFY_TIMEOUT_SECONDS = float(os.getenv("VERIFY_TIMEOUT_SECONDS", "10"))
+# Password checks queued or running at once; further logins are turned away at once
+MAX_PENDING_VERIFICATIONS = int(os.getenv("MAX_PENDING_VERIFICATIONS", "64"))
+
+# Returned by authenticate when the password check could not run in time; the
+# page should ask the user to try again
+BUSY = "BUSY"
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+def bcrypt_matches(stored_password, input_password):
+    return bcrypt.checkpw(input_password.encode("utf-8"), stored_password.encode("utf-8"))
+
+# For stores that keep passwords unhashed; constant-time to avoid timing leaks
+def plain_matches(stored_password, input_password):
+    return hmac.compare_digest(stored_password.encode("utf-8"), input_password.encode("utf-8"))
+
+# Sits between the login forms and the user store:
+#   - user records are cached in memory for a bounded time, and dropped on register
+#   - password checks run on a bounded worker pool, so a burst of logins queues
+#     there instead of on the Streamlit script threads (bcrypt releases the GIL,
+#     so the pool verifies in parallel). At most max_pending checks wait there;
+#     beyond that, or after verify_timeout, authenticate returns BUSY.
+#
+#   fetch_user(key) -> user record dict, or None if there is no such user
+class AuthService:
+    def __init__(self, fetch_user, matches=bcrypt_matches, password_field="password",
+                 ttl_seconds=USER_CACHE_TTL_SECONDS, max_entries=USER_CACHE_MAX_ENTRIES,
+                 workers=BCRYPT_WORKERS, verify_timeout=VERIFY_TIMEOUT_SECONDS,
+                 max_pending=MAX_PENDING_VERIFICATIONS):
+        self.fetch_user = fetch_user
+        self.matches = matches
+        self.password_field = password_field
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.verify_timeout = verify_timeout
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="auth-verify")
+        self._pending = threading.BoundedSemaphore(max(1, max_pending))
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.busy = 0
+
+    def get_user(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self.cache_hits += 1
+                return entry[1]
+            self.cache_misses += 1
+
+        user = self.fetch_user(key)
+        # Only existing users are cached, so a new registration is visible at once
+        if user is not None:
+            with self._lock:
+                if len(self._cache) >= self.max_entries:
+                    self._evict(now)
+                self._cache[key] = (now + self.ttl_seconds, user)
+        return user
+
+    def _evict(self, now):
+        expired = [k for k, (expires, _user) in self._cache.items() if expires <= now]
+        for k in expired:
+            del self._cache[k]
+        if len(self._cache) >= self.max_entries:
+            oldest = min(self._cache, key=lambda k: self._cache[k][0])
+            del self._cache[oldest]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    # Returns the user record when the password matches, BUSY when the check
+    # could not run in time, otherwise None
+    def authenticate(self, key, password):
+        user = self.get_user(key)
+        if user is None or not user.get(self.password_field):
+            return None
+        if not self._pending.acquire(blocking=False):
+            return self._busy()
+        try:
+            future = self._pool.submit(self.matches, user[self.password_field], password)
+        except Exception:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _future: self._pending.release())
+        try:
+            matched = future.result(timeout=self.verify_timeout)
+        except TimeoutError:
+            # A check still queued is dropped; one already running finishes on its own
+            future.cancel()
+            return self._busy()
+        return user if matched else None
+
+    def _busy(self):
+        with self._lock:
+            self.busy += 1
+        return BUSY
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cached_users": len(self._cache),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "busy": self.busy,
+                "verify_queue": self._pool._work_queue.qsize(),
+            }
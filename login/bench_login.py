@@ -0,0 +1,74 @@
+# Login load benchmark: many concurrent login attempts against an in-memory
+# user store with simulated DynamoDB latency, comparing the old inline path
+# (fetch + bcrypt on the caller's thread) with AuthService.
+#
+#   python bench_login.py --users 200 --attempts 1000 --concurrency 64 --rounds 10
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from auth_service import BUSY, AuthService, bcrypt_matches, hash_password
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def make_store(users, rounds, fetch_latency):
+    password_hash = hash_password("secret", rounds=rounds)
+    records = {f"user{i}@example.edu": {"email": f"user{i}@example.edu", "password": password_hash} for i in range(users)}
+
+    def fetch_user(key):
+        time.sleep(fetch_latency)
+        return records.get(key)
+
+    return records, fetch_user
+
+def run(label, login, keys, concurrency):
+    latencies = []
+
+    def attempt(key):
+        started = time.perf_counter()
+        ok = login(key, "secret")
+        latencies.append(time.perf_counter() - started)
+        return ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(attempt, keys))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{label:<12} logins={len(keys)} ok={sum(1 for r in results if r)} "
+        f"p50={percentile(latencies, 50) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms "
+        f"mean={statistics.mean(latencies) * 1000:.1f}ms throughput={len(keys) / elapsed:.1f}/s"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent login latency")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--attempts", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=None, help="bcrypt worker pool size")
+    parser.add_argument("--fetch-latency-ms", type=float, default=8.0)
+    args = parser.parse_args()
+
+    records, fetch_user = make_store(args.users, args.rounds, args.fetch_latency_ms / 1000)
+    keys = [random.choice(list(records)) for _ in range(args.attempts)]
+
+    def inline_login(key, password):
+        user = fetch_user(key)
+        return user is not None and bcrypt_matches(user["password"], password)
+
+    kwargs = {"workers": args.workers} if args.workers else {}
+    service = AuthService(fetch_user, **kwargs)
+
+    run("inline", inline_login, keys, args.concurrency)
+    run("service", lambda key, password: service.authenticate(key, password) not in (None, BUSY), keys, args.concurrency)
+    print(f"service stats: {service.stats()}")
+
+if __name__ == "__main__":
+    main()
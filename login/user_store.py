@@ -0,0 +1,155 @@
+# Canonical copy: user_store.py at the repository root. User/ and login/ are
+# deployed on their own, so each carries a byte-identical copy; edit this file
+# and copy it over both.
+import json
+import os
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+
+# ---------- User Store Configuration ----------
+USER_DB_PATH = os.getenv("USER_DB_PATH", "users.db")
+
+# Interface shared by the user stores. Records are plain dicts.
+#   get(key)        -> record, or None
+#   create(record)  -> True if added, False if the key is already taken (atomic)
+#   upsert(record)  -> insert or replace the record
+class UserStore(ABC):
+    @abstractmethod
+    def get(self, key):
+        ...
+
+    @abstractmethod
+    def create(self, record):
+        ...
+
+    @abstractmethod
+    def upsert(self, record):
+        ...
+
+# ---------- SQLite Store ----------
+# Users keyed by username in a WAL-mode SQLite file. The primary key index gives
+# O(log n) lookups, readers never block the writer, and concurrent registrations
+# are serialised by SQLite instead of overwriting each other's JSON rewrites.
+class SqliteUserStore(UserStore):
+    def __init__(self, path=USER_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "username TEXT PRIMARY KEY, password TEXT NOT NULL, role TEXT NOT NULL, "
+                "extra TEXT NOT NULL DEFAULT '{}')"
+            )
+
+    # One connection per thread; sqlite3 connections must not be shared across threads
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(record):
+        extra = {k: v for k, v in record.items() if k not in ("username", "password", "role")}
+        return record["username"], record["password"], record.get("role", "user"), json.dumps(extra)
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT username, password, role, extra FROM users WHERE username = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[3])
+        record.update({"username": row[0], "password": row[1], "role": row[2]})
+        return record
+
+    def create(self, record):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO users (username, password, role, extra) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(username) DO NOTHING",
+                self._row(record)
+            )
+            return cursor.rowcount == 1
+
+    def upsert(self, record):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO users (username, password, role, extra) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET password = excluded.password, "
+                "role = excluded.role, extra = excluded.extra",
+                self._row(record)
+            )
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+# ---------- DynamoDB Store ----------
+# The login app's users table, keyed by (email, role)
+class DynamoUserStore(UserStore):
+    def __init__(self, table, key_fields=("email", "role")):
+        self.table = table
+        self.key_fields = key_fields
+
+    def _key(self, key):
+        values = key if isinstance(key, tuple) else (key,)
+        return dict(zip(self.key_fields, values))
+
+    def get(self, key):
+        return self.table.get_item(Key=self._key(key)).get("Item")
+
+    def create(self, record):
+        from botocore.exceptions import ClientError
+        try:
+            self.table.put_item(
+                Item=record,
+                ConditionExpression=f"attribute_not_exists({self.key_fields[0]})"
+            )
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    def upsert(self, record):
+        self.table.put_item(Item=record)
+
+# ---------- JSON Migration ----------
+# Accepts both credential file layouts used so far:
+#   {"users": [{"username": ..., "password": ..., "role": ...}, ...]}
+#   {"<username>": {"password": ..., "role": ...}, ...}
+def iter_json_users(path):
+    with open(path, "r") as f:
+        content = f.read().strip()
+    data = json.loads(content) if content else {}
+    if isinstance(data.get("users"), list):
+        yield from data["users"]
+        return
+    for username, record in data.items():
+        if isinstance(record, dict):
+            yield dict(record, username=username)
+
+# Copy users from a JSON credentials file into a store. Existing users are kept.
+# Returns (migrated, skipped).
+def migrate_json(path, store):
+    migrated = skipped = 0
+    if not os.path.exists(path):
+        return migrated, skipped
+    for record in iter_json_users(path):
+        if record.get("username") and record.get("password") and store.create(record):
+            migrated += 1
+        else:
+            skipped += 1
+    return migrated, skipped
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python user_store.py <credentials.json> <users.db>")
+        sys.exit(1)
+    migrated, skipped = migrate_json(sys.argv[1], SqliteUserStore(sys.argv[2]))
+    print(f"Migrated {migrated} user(s), skipped {skipped}.")